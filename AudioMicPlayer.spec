@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('config', 'config')],
-    hiddenimports=['pydub.utils', 'customtkinter', 'ffmpeg_utils', 'wave', 'PIL._tkinter_finder', 'numpy.random.common', 'numpy.random.bounded_integers', 'numpy.random.entropy'],
+    hiddenimports=['customtkinter', 'ffmpeg_utils', 'wave', 'PIL._tkinter_finder', 'numpy.random.common', 'numpy.random.bounded_integers', 'numpy.random.entropy'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,264 @@
+import numpy as np
+from wav_reader import read_wav, read_wav_info
+from cache_metadata import update_metadata
+from ffmpeg_utils import decode_audio
+from flac_reader import build_seek_index
+
+# BS.1770 K-weighting: a high shelf followed by a high pass
+SHELF_GAIN_DB = 3.99984385397
+SHELF_Q = 0.7071752369554193
+SHELF_FREQ = 1681.974450955533
+HIGHPASS_Q = 0.5003270373253953
+HIGHPASS_FREQ = 38.13547087613982
+
+# Gating blocks are 400 ms long, stepped by 100 ms
+SEGMENT_SECONDS = 0.1
+SEGMENTS_PER_BLOCK = 4
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+# Windows quieter than this RMS level count as silence for trimming
+SILENCE_THRESHOLD_DB = -50.0
+SILENCE_WINDOW_SECONDS = 0.01
+
+# Playback targets for voice mode
+TARGET_LOUDNESS_LUFS = -16.0
+PEAK_CEILING_DBTP = -1.0
+
+# Rows of FFT segments processed per batch, to bound memory on long tracks
+FFT_BATCH_ROWS = 512
+# Block size used to skip quiet regions when oversampling for true peak
+TRUE_PEAK_BLOCK = 4096
+
+def _biquad_power_response(b, a, frequencies, sample_rate):
+    """|H|^2 of a biquad evaluated at the given frequencies"""
+    z = np.exp(-2j * np.pi * frequencies / sample_rate)
+    numerator = b[0] + b[1] * z + b[2] * z * z
+    denominator = a[0] + a[1] * z + a[2] * z * z
+    return np.abs(numerator / denominator) ** 2
+
+def k_weighting_power(frequencies, sample_rate):
+    """Squared magnitude of the K-weighting filter at the given frequencies"""
+    # High shelf pre-filter, re-derived for any sample rate from the 48 kHz reference design
+    K = np.tan(np.pi * SHELF_FREQ / sample_rate)
+    Vh = 10 ** (SHELF_GAIN_DB / 20)
+    Vb = Vh ** 0.4996667741545416
+    shelf_b = (Vh + Vb * K / SHELF_Q + K * K, 2 * (K * K - Vh), Vh - Vb * K / SHELF_Q + K * K)
+    shelf_a = (1 + K / SHELF_Q + K * K, 2 * (K * K - 1), 1 - K / SHELF_Q + K * K)
+    
+    # RLB high pass
+    K = np.tan(np.pi * HIGHPASS_FREQ / sample_rate)
+    highpass_b = (1.0, -2.0, 1.0)
+    highpass_a = (1 + K / HIGHPASS_Q + K * K, 2 * (K * K - 1), 1 - K / HIGHPASS_Q + K * K)
+    # The reference high pass has a unity leading denominator coefficient
+    highpass_b = tuple(coefficient * highpass_a[0] for coefficient in highpass_b)
+    
+    return (_biquad_power_response(shelf_b, shelf_a, frequencies, sample_rate) *
+            _biquad_power_response(highpass_b, highpass_a, frequencies, sample_rate))
+
+def _segment_mean_squares(samples, sample_rate, segment_length):
+    """K-weighted mean square of each non-overlapping segment.
+    
+    Filtering is done in the frequency domain: by Parseval's theorem the mean
+    square of a filtered segment is the |H|^2-weighted sum of its power spectrum.
+    """
+    segment_count = len(samples) // segment_length
+    segments = samples[:segment_count * segment_length].reshape(segment_count, segment_length)
+    
+    frequencies = np.fft.rfftfreq(segment_length, 1.0 / sample_rate)
+    weights = k_weighting_power(frequencies, sample_rate)
+    # Bins other than DC (and Nyquist for even lengths) stand for two conjugate bins
+    weights[1:(segment_length + 1) // 2] *= 2
+    weights /= float(segment_length) ** 2
+    
+    mean_squares = np.empty(segment_count)
+    for start in range(0, segment_count, FFT_BATCH_ROWS):
+        spectrum = np.fft.rfft(segments[start:start + FFT_BATCH_ROWS], axis=1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        mean_squares[start:start + FFT_BATCH_ROWS] = power @ weights
+    return mean_squares
+
+def integrated_loudness(samples, sample_rate):
+    """
+    Gated integrated loudness of a mono signal in LUFS (BS.1770 style).
+    
+    Returns:
+        Loudness in LUFS, or -inf for silence
+    """
+    segment_length = max(1, int(sample_rate * SEGMENT_SECONDS))
+    if len(samples) < segment_length * SEGMENTS_PER_BLOCK:
+        # Shorter than one gating block: treat the whole clip as a single block
+        segment_length = len(samples)
+        if segment_length == 0:
+            return float("-inf")
+        block_powers = _segment_mean_squares(samples, sample_rate, segment_length)
+    else:
+        segment_powers = _segment_mean_squares(samples, sample_rate, segment_length)
+        # Each 400 ms block is the mean of four consecutive 100 ms segments
+        block_powers = np.convolve(segment_powers, np.full(SEGMENTS_PER_BLOCK, 1.0 / SEGMENTS_PER_BLOCK), mode="valid")
+    
+    with np.errstate(divide="ignore"):
+        block_loudness = -0.691 + 10 * np.log10(block_powers)
+    
+    gated = block_powers[block_loudness > ABSOLUTE_GATE_LUFS]
+    if len(gated) == 0:
+        return float("-inf")
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+    
+    gated = block_powers[(block_loudness > ABSOLUTE_GATE_LUFS) & (block_loudness > relative_gate)]
+    if len(gated) == 0:
+        return float("-inf")
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+def _oversampling_phases(factor=4, taps_per_phase=12):
+    """Polyphase windowed-sinc interpolation filter, one row per output phase"""
+    length = factor * taps_per_phase
+    n = np.arange(length) - (length - 1) / 2
+    prototype = np.sinc(n / factor) * np.hanning(length)
+    phases = prototype.reshape(taps_per_phase, factor).T
+    # Each phase should pass DC at unity gain
+    return phases / phases.sum(axis=1, keepdims=True)
+
+def true_peak(samples):
+    """
+    Estimated true peak of a mono signal in dBTP using 4x oversampling.
+    
+    Returns:
+        Peak in dBTP, or -inf for silence
+    """
+    if len(samples) == 0:
+        return float("-inf")
+    
+    phases = _oversampling_phases()
+    overlap = phases.shape[1] - 1
+    # No interpolated value can exceed the largest input in its window times this
+    max_overshoot = float(np.abs(phases).sum(axis=1).max())
+    
+    magnitudes = np.abs(samples)
+    peak = float(magnitudes.max())
+    
+    # Only blocks loud enough to possibly beat the sample peak need oversampling
+    block_count = -(-len(samples) // TRUE_PEAK_BLOCK)
+    padded = np.zeros(block_count * TRUE_PEAK_BLOCK, dtype=magnitudes.dtype)
+    padded[:len(magnitudes)] = magnitudes
+    block_peaks = padded.reshape(block_count, TRUE_PEAK_BLOCK).max(axis=1)
+    for block in np.flatnonzero(block_peaks * max_overshoot > peak):
+        start = block * TRUE_PEAK_BLOCK
+        chunk = samples[max(0, start - overlap):start + TRUE_PEAK_BLOCK + overlap]
+        if len(chunk) <= overlap:
+            continue
+        for phase in phases:
+            peak = max(peak, float(np.max(np.abs(np.convolve(chunk, phase, mode="valid")))))
+    
+    if peak <= 0:
+        return float("-inf")
+    return float(20 * np.log10(peak))
+
+def detect_silence_bounds(samples, sample_rate, threshold_db=SILENCE_THRESHOLD_DB,
+                          window_seconds=SILENCE_WINDOW_SECONDS):
+    """
+    Find the audible region of a mono signal with a windowed RMS scan.
+    
+    Returns:
+        (start_sample, end_sample); the whole signal if it is entirely silent
+    """
+    window = max(1, int(sample_rate * window_seconds))
+    window_count = -(-len(samples) // window)
+    if window_count == 0:
+        return 0, 0
+    
+    padded = np.zeros(window_count * window, dtype=np.float32)
+    padded[:len(samples)] = samples
+    windows = padded.reshape(window_count, window)
+    mean_squares = np.einsum("ij,ij->i", windows, windows) / window
+    
+    threshold = 10 ** (threshold_db / 10)  # compared against mean square, so /10
+    audible = np.flatnonzero(mean_squares > threshold)
+    if len(audible) == 0:
+        return 0, len(samples)
+    return int(audible[0] * window), int(min(len(samples), (audible[-1] + 1) * window))
+
+def analyze_samples(samples, sample_rate):
+    """Loudness and trim fields to store in a cache entry's metadata"""
+    loudness = integrated_loudness(samples, sample_rate)
+    peak = true_peak(samples)
+    trim_start, trim_end = detect_silence_bounds(samples, sample_rate)
+    return {
+        "loudness_lufs": loudness if np.isfinite(loudness) else None,
+        "true_peak_dbtp": peak if np.isfinite(peak) else None,
+        # Stored in seconds so they apply at whatever rate the file is decoded at
+        "trim_start_seconds": trim_start / sample_rate,
+        "trim_end_seconds": trim_end / sample_rate,
+    }
+
+def needs_analysis(metadata):
+    """Whether a cache entry is missing any import-time analysis"""
+    return "loudness_lufs" not in metadata or "trim_start_seconds" not in metadata
+
+def trim_bounds(metadata, sample_rate, frame_count):
+    """Sample range to play after skipping leading and trailing silence"""
+    start = int(round((metadata.get("trim_start_seconds") or 0) * sample_rate))
+    end = metadata.get("trim_end_seconds")
+    end = frame_count if end is None else int(round(end * sample_rate))
+    start = min(max(0, start), frame_count)
+    end = min(max(start, end), frame_count)
+    if end <= start:
+        return 0, frame_count
+    return start, end
+
+def playback_gain(metadata, target_lufs=TARGET_LOUDNESS_LUFS, ceiling_dbtp=PEAK_CEILING_DBTP):
+    """
+    Linear gain that brings a clip to the target loudness without its true peak
+    exceeding the ceiling. Returns 1.0 when the clip hasn't been analyzed.
+    """
+    loudness = metadata.get("loudness_lufs")
+    if loudness is None:
+        return 1.0
+    gain_db = target_lufs - loudness
+    peak = metadata.get("true_peak_dbtp")
+    if peak is not None:
+        gain_db = min(gain_db, ceiling_dbtp - peak)
+    return float(10 ** (gain_db / 20))
+
+def analyze_cached_file(cache_path, samples=None, sample_rate=None):
+    """
+    Analyze a cached file once and store the results in its metadata.
+    
+    Args:
+        cache_path: Path of the cached WAV
+        samples, sample_rate: Already decoded mono samples, to skip reading the file
+    
+    Returns:
+        The updated metadata dict
+    """
+    if samples is None:
+        info = read_wav_info(cache_path)
+        samples = read_wav(cache_path, info=info, mono=True)
+        sample_rate = info.sample_rate
+    
+    fields = analyze_samples(samples, sample_rate)
+    print(f"[DEBUG] Analyzed {cache_path}: {fields}")
+    return update_metadata(cache_path, **fields)
+
+def prepare_cached_file(cache_path, format):
+    """
+    Analyze a freshly converted cache file, for process_audio_in_thread's post_process.
+    
+    Loudness and silence are stored once at import so playback only applies a
+    stored gain. FLAC files also get a seek index, which lets a seek restart
+    decoding near the target instead of decoding up to it.
+    """
+    try:
+        if format == "wav":
+            analyze_cached_file(cache_path)
+        else:
+            samples, sample_rate = decode_audio(cache_path, channels=1)
+            analyze_cached_file(cache_path, samples, sample_rate)
+    except Exception as e:
+        print(f"[ERROR] Analysis failed for {cache_path}: {e}")
+    
+    if format == "flac":
+        try:
+            update_metadata(cache_path, seek_index=build_seek_index(cache_path))
+        except Exception as e:
+            print(f"[ERROR] Seek index failed for {cache_path}: {e}")
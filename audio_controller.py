@@ -1,8 +1,185 @@
-import sounddevice as sd
 import numpy as np
-from pydub import AudioSegment
+import queue
 import threading
 import time
+from ffmpeg_utils import decode_audio, DecodeStream, CACHE_SAMPLE_RATE
+from wav_reader import is_wav_file, read_wav_info, read_wav, WavFormatError
+from flac_reader import is_flac_file, read_flac_info, build_seek_index, FlacFormatError
+from cache_metadata import load_metadata, update_metadata
+from audio_analysis import analyze_cached_file, needs_analysis, playback_gain
+from clip_regions import play_bounds
+from play_queue import TrackPrefetcher
+from output_sinks import OutputSink
+from audio_engine_process import AudioEngineProcess, render_clip, render_shifted, apply_voice_guard
+from time_stretch import TimePitchShifter
+from crossfade import Crossfader, build_loop_fade, read_looped
+from level_meter import LevelMeter
+
+class DecodedTrack:
+    """Samples ready to play plus what was derived from the track's metadata"""
+    
+    # A seek this far past the decoded audio restarts decoding at the target
+    # instead of waiting for the running decode to get there
+    SEEK_RESTART_SECONDS = 10
+    
+    def __init__(self, file_path, samples, sample_rate, gain, stream=None, stream_offset=0,
+                 flac_info=None, seek_index=None, buffer=None):
+        self.file_path = file_path
+        self.samples = samples
+        self.buffer = samples if buffer is None else buffer  # Whole decoded file; samples is a view into it
+        self.sample_rate = sample_rate
+        self.gain = gain
+        self.stream = stream  # DecodeStream still filling samples, if any
+        self.stream_offset = stream_offset  # Where samples starts in the stream's buffer
+        self.flac_info = flac_info
+        self.seek_index = seek_index  # [first_sample, byte_offset] points of the FLAC source
+        self.decoded_ranges = []  # (start, end) buffer ranges filled by cancelled streams
+        self.loop_fade = None  # (settings key, seam buffer) for crossfaded looping
+        self.settings_key = None  # Decode settings the buffer was made with
+        self._seek_lock = threading.Lock()
+    
+    def view(self, start, end):
+        """
+        The same decode played from buffer[start:end], for in/out points and regions.
+        
+        The new track slices the buffer and shares the running stream, so
+        nothing is decoded or copied again.
+        """
+        track = DecodedTrack(self.file_path, self.buffer[start:end], self.sample_rate, self.gain,
+                             self.stream, start, self.flac_info, self.seek_index, self.buffer)
+        track.decoded_ranges = list(self.decoded_ranges)
+        track.settings_key = self.settings_key
+        return track
+    
+    def _decoded_until(self, frame):
+        """End of the decoded run of the stream buffer containing frame, or None"""
+        stream = self.stream
+        ranges = self.decoded_ranges + [(stream.start_frame, stream.available)]
+        end = None
+        for range_start, range_end in sorted(ranges):
+            if range_start > (frame if end is None else end):
+                break
+            if range_end > (frame if end is None else end):
+                end = range_end
+        return end if end is not None and end > frame else None
+    
+    def is_decoded(self, start, end):
+        """Whether samples[start:end] can be played right now"""
+        if self.stream is None or end <= start:
+            return True
+        decoded = self._decoded_until(self.stream_offset + start)
+        return decoded is not None and decoded >= self.stream_offset + end
+    
+    def decoded_frames(self):
+        """Frames of samples from the start that can be played right now"""
+        if self.stream is None:
+            return len(self.samples)
+        decoded = self._decoded_until(self.stream_offset) or self.stream_offset
+        return min(len(self.samples), decoded - self.stream_offset)
+    
+    def fully_decoded(self):
+        """Whether all of the track is in samples, so it can be read anywhere"""
+        stream = self.stream
+        if stream is None:
+            return True
+        return stream.finished.is_set() and self.decoded_frames() >= self.playable_frames()
+    
+    def playable_frames(self):
+        """Length of the track, which shrinks to what was decoded if the stream ended early"""
+        stream = self.stream
+        if stream is None or not stream.finished.is_set() or stream.cancelled:
+            return len(self.samples)
+        # Every stream decodes through to the end of the file
+        return min(len(self.samples), max(0, stream.available - self.stream_offset))
+    
+    def prepare_seek(self, frame):
+        """
+        Make sure decoding will reach samples[frame] soon.
+        
+        If the running decode is far behind the target, or already past it
+        with a gap in between, it is cancelled and a new one starts from the
+        nearest seek index point, filling the same buffer.
+        """
+        if self.stream is None or not self.seek_index or self.flac_info is None:
+            return
+        with self._seek_lock:
+            stream = self.stream
+            target = self.stream_offset + frame
+            if target >= len(stream.samples) or self._decoded_until(target) is not None:
+                return
+            running = not stream.finished.is_set()
+            ahead = target - stream.available
+            if running and stream.start_frame <= target and ahead < self.SEEK_RESTART_SECONDS * self.sample_rate:
+                return
+            
+            # Seek index points are in source samples; the buffer may be resampled
+            ratio = self.sample_rate / self.flac_info.sample_rate
+            source_target = target / ratio
+            first_sample, byte_offset = self.seek_index[0]
+            for point_sample, point_offset in self.seek_index:
+                if point_sample > source_target:
+                    break
+                first_sample, byte_offset = point_sample, point_offset
+            start_frame = int(round(first_sample * ratio))
+            
+            stream.cancel()
+            if stream.available > stream.start_frame:
+                self.decoded_ranges.append((stream.start_frame, stream.available))
+            print(f"[DEBUG] Restarting decode at {first_sample / self.flac_info.sample_rate:.2f}s for seek")
+            self.stream = DecodeStream(
+                self.file_path, self.sample_rate, len(stream.samples),
+                samples=stream.samples, start_frame=start_frame,
+                source_range=(self.flac_info.audio_offset, byte_offset)
+            )
+    
+    def close(self):
+        """Stop a decode that is still running"""
+        if self.stream is not None:
+            self.stream.cancel()
+
+class TrackCrossfade:
+    """The previous track playing on under its fade-out while the new one fades in"""
+    
+    def __init__(self, track, position, fade_out, fade_in, shifter=None):
+        self.track = track
+        self.position = position  # Next frame of the outgoing track
+        self.fade_out = fade_out
+        self.fade_in = fade_in
+        self.shifter = shifter  # The outgoing track's shifter, if speed or pitch was changed
+        self.offset = 0
+    
+    def finished(self):
+        return self.offset >= len(self.fade_in)
+    
+    def close(self, current=None):
+        """Stop the outgoing track's decode, unless the current track shares its stream"""
+        if current is None or self.track.stream is not current.stream:
+            self.track.close()
+    
+    def mix(self, block, multiplier):
+        """Fade the incoming block in and add the next block of the outgoing track, scaled by multiplier"""
+        frames = len(block)
+        count = min(frames, len(self.fade_in) - self.offset)
+        curve = slice(self.offset, self.offset + count)
+        
+        track = self.track
+        total = track.playable_frames()
+        if self.shifter is not None:
+            first, last = self.shifter.input_range(frames)
+            outgoing = (self.shifter.render(track.samples, frames, total) if track.is_decoded(first, min(last, total))
+                        else np.zeros(frames, dtype=np.float32))
+        else:
+            end = min(self.position + frames, total)
+            # A stretch the decode hasn't reached yet plays as silence
+            outgoing = (render_clip(track.samples, self.position, end, frames, 1.0, False)
+                        if end > self.position and track.is_decoded(self.position, end)
+                        else np.zeros(frames, dtype=np.float32))
+            self.position += frames
+        
+        block[:count] *= self.fade_in[curve]
+        block[:count] += outgoing[:count] * self.fade_out[curve] * multiplier
+        self.offset += count
+        return block
 
 class AudioController:
     def __init__(self, device_manager):
@@ -21,10 +198,50 @@ class AudioController:
         self.last_volume = 1.0
         self.current_device = None
         self.active_file_path = None
+        self.region = None  # Named region of the active file being played, if any
         self.current_widget = None
         self.voice_mode = False
         self.voice_quality = "medium"  # low, medium, high
+        self.gain = 1.0  # Precomputed loudness gain for the loaded clip
+        self.track = None  # DecodedTrack being played
         self.playback_ended_callback = None
+        self.prefetcher = TrackPrefetcher(self.decode_track)
+        
+        # Live speed and pitch change, bypassed at 1x and 0 semitones
+        self.shifter = TimePitchShifter()
+        
+        # Crossfades between tracks and on loop wraparound
+        self.crossfader = Crossfader()
+        self._crossfade = None  # TrackCrossfade in progress
+        self._end_notified = False  # Auto-advance was already started one fade length early
+        self._render_lock = threading.Lock()  # Held while a render or a crossfade swap runs
+        
+        # Levels and spectrum of what is sent to the output, for the UI meters
+        self.meter = LevelMeter()
+        
+        # Full-duplex mic passthrough
+        self.passthrough = False
+        self.duplex_stream = None
+        self.input_device = None  # None uses the system default input
+        self.mic_gain = 1.0
+        self.duplex_xruns = 0
+        
+        # Monitor output: the same rendered blocks also go to a second device
+        self.monitor_device = None  # None turns the monitor off
+        self.monitor_gain = 1.0
+        self.sinks = None  # OutputSinks of the running fan-out, or the duplex monitor
+        
+        # Optional playback in a separate process, out of reach of UI stalls
+        self.engine = None
+        
+        # Hotkey triggers are mixed into the passthrough stream while it runs
+        self.trigger_bank = None
+        
+        # End-of-track notices (widget, handler) from audio threads, forwarded to Tk off the audio path
+        self._finished_widgets = queue.SimpleQueue()
+        events_thread = threading.Thread(target=self._forward_playback_events, name="playback-events")
+        events_thread.daemon = True
+        events_thread.start()
         
     def stop_previous_widget(self):
         """Safely stop previous widget without directly calling UI methods"""
@@ -43,8 +260,8 @@ class AudioController:
                 # Reset the current widget if it's invalid
                 self.current_widget = None
 
-    def load_audio(self, file_path, widget=None):
-        print(f"[DEBUG] Loading audio: {file_path}")
+    def load_audio(self, file_path, widget=None, region=None):
+        print(f"[DEBUG] Loading audio: {file_path}" + (f" region {region}" if region else ""))
         
         # Check if the widget is valid before setting it
         if widget:
@@ -61,6 +278,7 @@ class AudioController:
         
         self.current_widget = widget
         self.active_file_path = file_path
+        self.region = region
         
         # Check if file exists before loading
         try:
@@ -73,80 +291,266 @@ class AudioController:
         print(f"[DEBUG] Loading audio file from: {file_path}")
         
         try:
-            # Load audio with appropriate format for voice applications if needed
-            audio = AudioSegment.from_file(file_path)
-            
-            # When in voice mode, optimize for voice applications
-            if self.voice_mode:
-                print(f"[DEBUG] Processing for voice mode, quality: {self.voice_quality}")
-                # Convert to mono
-                if audio.channels > 1:
-                    audio = audio.set_channels(1)
-                    
-                # Set appropriate sample rate for voice applications
-                if self.voice_quality == "low":
-                    target_rate = 16000
-                elif self.voice_quality == "medium":
-                    target_rate = 24000
-                else:  # high
-                    target_rate = 48000
-                    
-                # Convert sample rate if needed
-                if audio.frame_rate != target_rate:
-                    audio = audio.set_frame_rate(target_rate)
-                    
-                # Normalize audio to prevent clipping
-                normalized_audio = audio.normalize()
-                
-                # Apply subtle compression for voice applications
-                compressed_audio = self._apply_compression(normalized_audio)
-                audio = compressed_audio
-            else:
-                print("[DEBUG] Processing for standard playback")
-                # For regular playback, just ensure it's mono
-                if audio.channels > 1:
-                    audio = audio.set_channels(1)
-            
-            print(f"[DEBUG] Audio loaded. Channels: {audio.channels}, Rate: {audio.frame_rate}, Duration: {len(audio)/1000:.2f}s")
+            track = self._take_track(file_path, region)
             
-            self.samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
-            self.samples = self.samples / np.iinfo(audio.array_type).max
-            self.sample_rate = audio.frame_rate
+            if self.track is not None and self.track.stream is not track.stream:
+                self.track.close()
+            self.track = track
+            self.samples = track.samples
+            self.sample_rate = track.sample_rate
+            self.gain = track.gain
             self.duration = len(self.samples) / self.sample_rate
             self.position = 0
             return self.duration
         except Exception as e:
             print(f"[ERROR] Failed to load audio: {e}")
             # Reset to prevent issues
+            self.track = None
             self.samples = None
             self.duration = 0
             return 0
     
-    def _apply_compression(self, audio):
-        """Apply gentle compression to make audio more suitable for voice applications"""
-        # This is a simple gain reduction for louder parts
-        # For more advanced compression, we'd need to use a proper DSP library
+    def _take_track(self, file_path, region=None):
+        """
+        Decoded track for file_path playing region, or the whole clip for None.
+        
+        A file that is already loaded is played as a new view over its
+        buffer; otherwise the prefetched decode is used when the queue already
+        prepared it, and the file is decoded when not.
+        """
+        settings_key = self.decode_settings()
+        track = self.track
+        if (track is not None and track.file_path == file_path and track.settings_key == settings_key
+                and (track.stream is None or not track.stream.cancelled)):
+            print("[DEBUG] Reusing the loaded buffer")
+        else:
+            track = self.prefetcher.take(file_path, settings_key)
+            if track is not None:
+                print("[DEBUG] Using prefetched track")
+            else:
+                track = self.decode_track(file_path, settings_key)
+            if region is None:
+                return track
+        # In/out points may have changed since the track was decoded, so bounds are read again
+        start, end = play_bounds(load_metadata(file_path), track.sample_rate, len(track.buffer), region)
+        return track.view(start, end)
+    
+    def release_track(self, file_path):
+        """Forget the stopped track's decode of a file replaced on disk, so it is read again"""
+        if self.track is not None and self.track.file_path == file_path and not self.is_playing:
+            self.track.close()
+            self.track = None
+            self.samples = None
+    
+    def crossfade_to(self, file_path, widget=None, loop=False, region=None):
+        """
+        Start a track over the fade-out of the playing one, in the same stream.
+        
+        The fade uses the auto-advance length when the playing track already
+        reported its end early, and the manual length otherwise. Returns False
+        without changing anything when there is nothing to fade from or
+        crossfades are off; the caller then stops and loads as usual.
+        """
+        track = self.track
+        if not self.is_playing or self.is_paused or track is None or self.engine is not None:
+            return False
+        rate = track.sample_rate
+        auto = self._end_notified
+        length = self.crossfader.frames("auto" if auto else "manual", rate)
+        start = int(self.position * rate)
+        if auto:
+            # Only what is left of the outgoing track can fade out
+            remaining = max(0, track.playable_frames() - start)
+            if self.shifter.active:
+                remaining = int(remaining / self.shifter.speed)
+            length = min(length, remaining)
+        if length <= 0:
+            return False
+        
+        print(f"[DEBUG] Crossfading to {file_path} over {length / rate:.2f}s")
         try:
-            # Convert to numpy array for processing
-            samples = np.array(audio.get_array_of_samples())
-            sample_width = audio.sample_width
-            
-            # Calculate threshold (75% of max possible amplitude)
-            max_possible_amplitude = 2**(8 * sample_width - 1) - 1
-            threshold = 0.75 * max_possible_amplitude
-            
-            # Apply soft compression (gain reduction) above threshold
-            mask = abs(samples) > threshold
-            samples[mask] = np.sign(samples[mask]) * (
-                threshold + (abs(samples[mask]) - threshold) * 0.5
-            )
-            
-            # Convert back to AudioSegment
-            compressed_audio = audio._spawn(samples.tobytes())
-            return compressed_audio
+            new_track = self._take_track(file_path, region)
         except Exception as e:
-            print(f"[ERROR] Compression failed, using original audio: {e}")
-            return audio
+            print(f"[ERROR] Failed to load audio for crossfade: {e}")
+            return False
+        if new_track.sample_rate != rate:
+            # Decode settings changed under the open stream; it has to be reopened
+            if new_track.stream is not track.stream:
+                new_track.close()
+            return False
+        
+        fade_out, fade_in = self.crossfader.curves(length)
+        shifter = self.shifter if self.shifter.active else None
+        crossfade = TrackCrossfade(track, start, fade_out, fade_in, shifter)
+        
+        if self.current_widget and self.current_widget != widget:
+            self.stop_previous_widget()
+        with self._render_lock:
+            self.current_widget = widget
+            self.active_file_path = file_path
+            self.region = region
+            self.track = new_track
+            self.samples = new_track.samples
+            self.sample_rate = new_track.sample_rate
+            self.gain = new_track.gain
+            self.duration = len(self.samples) / self.sample_rate
+            self.position = 0
+            self.is_looping = loop
+            self.shifter = TimePitchShifter(self.shifter.speed, self.shifter.semitones)
+            self._end_notified = False
+            previous, self._crossfade = self._crossfade, crossfade
+        # The outgoing decode keeps running until the fade is over, so a
+        # partly decoded track fades out instead of dropping to silence
+        if previous is not None:
+            previous.close(new_track)
+        return True
+    
+    def set_crossfade(self, shape, **seconds):
+        """Set the crossfade shape (None for off) and manual/auto/loop lengths in seconds"""
+        self.crossfader.configure(shape, **seconds)
+        if self.sample_rate:
+            self.crossfader.prepare(self.sample_rate)
+        print(f"[DEBUG] Crossfade {shape or 'off'}: {self.crossfader.seconds}")
+        if self.engine is not None:
+            self.engine.send("crossfade", shape, self.crossfader.seconds["loop"])
+    
+    def decode_settings(self):
+        """Settings that change how a track is decoded, used to key prefetched tracks"""
+        return (self.voice_mode, self.voice_quality, self.passthrough)
+    
+    def decode_track(self, file_path, settings_key):
+        """
+        Decode a file into a DecodedTrack without touching playback state.
+        
+        Safe to call from the prefetch thread.
+        """
+        voice_mode, voice_quality, passthrough = settings_key
+        
+        # Decode straight into a float32 array at the rate we'll play at
+        target_rate = self._target_rate(voice_mode, voice_quality)
+        if passthrough and target_rate is None:
+            # The passthrough stream has one fixed rate
+            target_rate = CACHE_SAMPLE_RATE
+        
+        # Always decoded as mono; FLAC is streamed so playback can start before it's fully decoded
+        stream, flac_info = self._open_stream(file_path, target_rate)
+        if stream is not None:
+            samples, sample_rate = stream.samples, stream.sample_rate
+        else:
+            samples, sample_rate = self._read_samples(file_path, target_rate)
+        
+        metadata = load_metadata(file_path)
+        if needs_analysis(metadata):
+            # Imported before analysis existed: analyze once in the background for next time
+            self._analyze_in_background(file_path, samples, sample_rate, stream)
+        seek_index = metadata.get("seek_index")
+        if stream is not None and not seek_index:
+            # FLAC cached before seek indexes existed: index it for next time
+            self._index_in_background(file_path, flac_info)
+        
+        # When in voice mode, level clips with the gain computed from their import-time analysis
+        if voice_mode:
+            print(f"[DEBUG] Processing for voice mode, quality: {voice_quality}")
+            gain = playback_gain(metadata)
+            print(f"[DEBUG] Playback gain: {gain:.3f}")
+        else:
+            print("[DEBUG] Processing for standard playback")
+            gain = 1.0
+        
+        # Start at the in point (or first audible sample) and end at the out point
+        # (or last); slicing keeps this a view
+        buffer = samples
+        trim_start, trim_end = play_bounds(metadata, sample_rate, len(buffer))
+        if trim_start > 0 or trim_end < len(buffer):
+            print(f"[DEBUG] Playing {trim_start / sample_rate:.3f}s - {trim_end / sample_rate:.3f}s")
+        samples = buffer[trim_start:trim_end]
+        
+        print(f"[DEBUG] Audio loaded. Rate: {sample_rate}, Duration: {len(samples)/sample_rate:.2f}s")
+        track = DecodedTrack(file_path, samples, sample_rate, gain, stream, trim_start, flac_info, seek_index, buffer)
+        track.settings_key = settings_key
+        return track
+    
+    @staticmethod
+    def _target_rate(voice_mode, voice_quality):
+        """Decode rate for voice applications, or None to keep the file's rate"""
+        if not voice_mode:
+            return None
+        # Set appropriate sample rate for voice applications
+        if voice_quality == "low":
+            return 16000
+        elif voice_quality == "medium":
+            return 24000
+        return 48000  # high
+    
+    def _read_samples(self, file_path, target_rate):
+        """Read mono float32 samples, using the native WAV reader whenever no resampling is needed"""
+        if is_wav_file(file_path):
+            try:
+                info = read_wav_info(file_path)
+                if target_rate is None or info.sample_rate == target_rate:
+                    print("[DEBUG] Reading WAV directly")
+                    return read_wav(file_path, info=info, mono=True), info.sample_rate
+            except (WavFormatError, OSError) as e:
+                print(f"[DEBUG] Native WAV read failed, falling back to ffmpeg: {e}")
+        
+        # ffmpeg handles other formats, the downmix and resampling
+        return decode_audio(file_path, sample_rate=target_rate, channels=1, limit=False)
+    
+    def _open_stream(self, file_path, target_rate):
+        """
+        Start a progressive decode for FLAC files.
+        
+        Returns:
+            (DecodeStream, FlacInfo), or (None, None) to decode in one go
+        """
+        if not is_flac_file(file_path):
+            return None, None
+        try:
+            info = read_flac_info(file_path)
+        except (FlacFormatError, OSError) as e:
+            print(f"[DEBUG] Can't stream FLAC, decoding in one go: {e}")
+            return None, None
+        if info.frames == 0:
+            # Length unknown from STREAMINFO, so the buffer can't be sized up front
+            return None, None
+        
+        sample_rate = target_rate or info.sample_rate
+        frames = int(np.ceil(info.frames * sample_rate / info.sample_rate))
+        print(f"[DEBUG] Streaming FLAC decode: {frames} frames at {sample_rate} Hz")
+        return DecodeStream(file_path, sample_rate, frames), info
+    
+    def _analyze_in_background(self, file_path, samples, sample_rate, stream=None):
+        """Store import-time analysis for a file that was imported without it"""
+        def analysis_thread():
+            try:
+                if stream is not None:
+                    # Analyze the whole file, so wait for the streaming decode to finish
+                    stream.finished.wait()
+                    # A stream cancelled by a track switch or seek stops early with no
+                    # error; analyzing what it got would store results for a truncated file
+                    if stream.error is not None or stream.cancelled or stream.start_frame != 0:
+                        return
+                    analyze_cached_file(file_path, samples[:stream.available], sample_rate)
+                else:
+                    analyze_cached_file(file_path, samples, sample_rate)
+            except Exception as e:
+                print(f"[ERROR] Loudness analysis failed for {file_path}: {e}")
+        
+        thread = threading.Thread(target=analysis_thread)
+        thread.daemon = True
+        thread.start()
+    
+    def _index_in_background(self, file_path, flac_info):
+        """Store a seek index for a FLAC file that was cached without one"""
+        def index_thread():
+            try:
+                update_metadata(file_path, seek_index=build_seek_index(file_path, info=flac_info))
+            except Exception as e:
+                print(f"[ERROR] Seek index failed for {file_path}: {e}")
+        
+        thread = threading.Thread(target=index_thread)
+        thread.daemon = True
+        thread.start()
         
     def play(self, loop=False):
         print(f"[DEBUG] Play called, looping: {loop}, paused state: {self.is_paused}")
@@ -161,11 +565,27 @@ class AudioController:
             
         self.is_looping = loop
         self.stop()  # Ensure any previous playback is stopped
+        
+        # Fade curves and the loop seam are ready before the first transition
+        self.crossfader.prepare(self.sample_rate)
+        if loop and self.track is not None and self.track.fully_decoded() and self.track.playable_frames() > 0:
+            self._loop_fade(self.track, self.track.playable_frames())
+        
         self.is_playing = True
         self.is_paused = False
         
+        if self.duplex_stream is not None:
+            # The passthrough stream is already running; its callback picks the clip up next block
+            print(f"[DEBUG] Mixing {self.active_file_path} into the passthrough stream")
+            return
+        
+        if self.engine is not None and self.monitor_device is None:
+            self._play_in_engine()
+            return
+        
         print(f"[DEBUG] Starting play thread for {self.active_file_path}")
-        self.play_thread = threading.Thread(target=self._play_audio)
+        target = self._play_audio if self.monitor_device is None else self._play_fanout
+        self.play_thread = threading.Thread(target=target)
         self.play_thread.daemon = True
         self.play_thread.start()
     
@@ -173,24 +593,164 @@ class AudioController:
         """Resume playback after pausing"""
         print(f"[DEBUG] Resuming from position: {self.position:.2f}s")
         self.is_paused = False
+        if self.engine is not None:
+            self.engine.send("resume")
+    
+    def _block_size(self):
+        """Frames per stream block for the current mode"""
+        if self.voice_mode:
+            # Smaller buffer sizes for lower latency in voice applications
+            if self.voice_quality == "low":
+                return 256
+            elif self.voice_quality == "high":
+                return 1024
+            return 512
+        # Standard buffer size for regular music playback
+        return 1024
+    
+    def _render_block(self, frames):
+        """
+        Render the next block of the loaded clip and advance the position.
+        
+        Every output path renders through here so gain, looping, crossfades and
+        the voice-mode guard behave the same. Returns a float32 block, or None
+        when there is nothing to play right now (stopped, paused or waiting on a
+        streaming decode).
+        """
+        with self._render_lock:
+            track = self.track
+            if not self.is_playing or self.is_paused or track is None:
+                return None
+            
+            # Volume, mute and loudness gain in one multiply; voice mode also guards against clipping
+            multiplier, voice_guard = self._block_gain(track)
+            block = self._render_track(track, frames, multiplier)
+            if block is None:
+                return None
+            
+            crossfade = self._crossfade
+            if crossfade is not None:
+                crossfade.mix(block, self._block_gain(crossfade.track)[0])
+                if crossfade.finished():
+                    self._end_crossfade()
+            return apply_voice_guard(block, voice_guard)
+    
+    def _render_track(self, track, frames, multiplier):
+        """Next block of track scaled by multiplier, or None; advances the position"""
+        start = int(self.position * track.sample_rate)
+        total = track.playable_frames()
+        shifter = self.shifter
+        
+        if self.is_looping and not shifter.active and total > 0 and track.fully_decoded():
+            # Wrap inside the block so the seam has no gap, crossfaded when loop fades are on
+            block, end = read_looped(track.samples, self._loop_fade(track, total), start, frames, total)
+            block *= multiplier
+            self.position = end / track.sample_rate
+            return block
+        
+        if start >= total:
+            if self.is_looping:
+                print("[DEBUG] Looping playback - restarting from beginning")
+                start = 0
+            else:
+                print("[DEBUG] Reached end of audio - stopping playback")
+                self._finish_playback()
+                return None
+        if not self.is_looping:
+            self._notify_near_end(track, start, total)
+        
+        if shifter.active:
+            if abs(shifter.position - start) > 1:
+                # Started, seeked or looped since the last shifted block
+                shifter.reset(start)
+            first, last = shifter.input_range(frames)
+            if not track.is_decoded(first, min(last, total)):
+                return None
+            block = render_shifted(shifter, track.samples, total, frames, multiplier, False)
+            self.position = shifter.position / track.sample_rate
+            return block
+        
+        end = min(start + frames, total)
+        if not track.is_decoded(start, end):
+            # Streaming decode hasn't reached this block yet
+            return None
+        
+        block = render_clip(track.samples, start, end, frames, multiplier, False)
+        
+        self.position = end / track.sample_rate
+        return block
+    
+    def _loop_fade(self, track, total):
+        """Crossfaded loop seam of a fully decoded track, built once per track and setting"""
+        length = min(self.crossfader.frames("loop", track.sample_rate), total // 2)
+        if length <= 0:
+            return None
+        key = (self.crossfader.shape, length, total)
+        if track.loop_fade is None or track.loop_fade[0] != key:
+            fade_out, fade_in = self.crossfader.curves(length)
+            track.loop_fade = (key, build_loop_fade(track.samples, total, fade_out, fade_in))
+        return track.loop_fade[1]
+    
+    def _notify_near_end(self, track, start, total):
+        """
+        Tell the widget one auto crossfade before the end, so the next track
+        can fade in over this one's tail. The widget keeps playing; if nothing
+        takes over, the real end is still reported by _finish_playback.
+        """
+        widget = self.current_widget
+        if self._end_notified or not widget:
+            return
+        fade = self.crossfader.frames("auto", track.sample_rate)
+        remaining = total - start
+        if self.shifter.active:
+            remaining /= self.shifter.speed
+        if fade > 0 and remaining <= fade:
+            self._end_notified = True
+            self._finished_widgets.put((widget, widget.playback_near_end))
+    
+    def _end_crossfade(self):
+        """Drop the crossfade in progress and stop the outgoing track's decode"""
+        crossfade = self._crossfade
+        self._crossfade = None
+        if crossfade is not None:
+            crossfade.close(self.track)
+    
+    def _block_gain(self, track):
+        """Multiplier for the clip and whether the voice-mode clipping guard applies"""
+        volume_multiplier = 0.0 if self.muted else self.volume * track.gain
+        return volume_multiplier, self.voice_mode and not self.muted
+    
+    def _finish_playback(self):
+        """Natural end of the clip: reset state and tell the widget from the events thread"""
+        self.is_playing = False
+        self.is_paused = False
+        self.position = 0
+        self._end_crossfade()
+        widget = self.current_widget
+        if widget:
+            # Audio threads must not block on Tk, so the events thread forwards this.
+            # After a near-end notice the next track was already asked for
+            advance = not self._end_notified
+            self._finished_widgets.put((widget, lambda: widget.playback_finished(advance)))
+        self._end_notified = False
+    
+    def _forward_playback_events(self):
+        while True:
+            widget, handler = self._finished_widgets.get()
+            try:
+                print(f"[DEBUG] Notifying widget that playback is finished")
+                widget.after(0, handler)
+            except Exception as e:
+                print(f"[ERROR] Error notifying widget: {e}")
         
     def _play_audio(self):
+        stream = None
         try:
+            import sounddevice as sd
             device_id = self.device_manager.get_current_device()
             print(f"[DEBUG] Starting playback on device: {device_id}")
             
-            # Configure stream with appropriate parameters for voice if needed
-            if self.voice_mode:
-                # Smaller buffer sizes for lower latency in voice applications
-                buffer_size = 512
-                # Use appropriate sample rate based on quality setting
-                if self.voice_quality == "low":
-                    buffer_size = 256
-                elif self.voice_quality == "high":
-                    buffer_size = 1024
-            else:
-                # Standard buffer size for regular music playback
-                buffer_size = 1024
+            buffer_size = self._block_size()
             
             # Ensure we're not creating a stream if we already have one
             if self.current_stream is not None:
@@ -204,77 +764,183 @@ class AudioController:
             
             # Create stream with explicit settings
             print(f"[DEBUG] Creating new audio stream with rate={self.sample_rate}, device={device_id}")
-            self.current_stream = sd.OutputStream(
+            stream = sd.OutputStream(
                 samplerate=self.sample_rate,
                 channels=1,
                 device=device_id,
                 dtype=np.float32,
                 blocksize=buffer_size  # Use appropriate buffer size
             )
-            
-            self.current_stream.start()
+            self.current_stream = stream
+            stream.start()
             print("[DEBUG] Audio stream started successfully")
             
             while self.is_playing:
-                if not self.is_paused:
-                    chunk_size = buffer_size  # Use our configured buffer size
-                    start = int(self.position * self.sample_rate)
-                    end = start + chunk_size
-                    
-                    if end >= len(self.samples):
-                        if self.is_looping:
-                            print("[DEBUG] Looping playback - restarting from beginning")
-                            self.position = 0
-                            continue
-                        else:
-                            print("[DEBUG] Reached end of audio - stopping playback")
-                            self.stop()
-                            if self.current_widget:
-                                print(f"[DEBUG] Notifying widget that playback is finished")
-                                self.current_widget.after(0, self.current_widget.playback_finished)
-                            break
-                    
-                    # Apply volume control and mute
-                    volume_multiplier = 0.0 if self.muted else self.volume
-                    chunk = self.samples[start:end] * volume_multiplier
-                    
-                    # For voice mode, ensure we don't clip
-                    if self.voice_mode and not self.muted:
-                        # Simple peak normalization to prevent distortion
-                        max_val = np.max(np.abs(chunk))
-                        if max_val > 0.95:  # If we're close to clipping
-                            chunk = chunk * (0.95 / max_val)
-                    
-                    try:
-                        if self.current_stream:
-                            self.current_stream.write(chunk.astype(np.float32))
-                            self.position += chunk_size / self.sample_rate
-                        else:
-                            print("[ERROR] Stream was closed unexpectedly")
-                            break
-                    except Exception as e:
-                        print(f"[ERROR] Error writing to stream: {e}")
+                block = self._render_block(buffer_size)
+                if block is None:
+                    # Paused, or waiting for a streaming decode to catch up
+                    time.sleep(0.1 if self.is_paused else 0.005)
+                    continue
+                
+                self.meter.publish(block, self.sample_rate)
+                try:
+                    if self.current_stream is stream:
+                        stream.write(block)
+                    else:
+                        print("[ERROR] Stream was closed unexpectedly")
                         break
-                else:
-                    time.sleep(0.1)  # Sleep when paused to prevent CPU usage
+                except Exception as e:
+                    print(f"[ERROR] Error writing to stream: {e}")
+                    break
+            
+            # Close the stream here after a natural end; stop() closes it otherwise
+            if self.current_stream is stream:
+                self._close_output_stream()
                     
         except Exception as e:
             print(f"[ERROR] Stream error: {e}")
-            self.stop()
-            if self.current_widget:
-                self.current_widget.after(0, self.current_widget.playback_finished)
+            if stream is None or self.current_stream is stream:
+                self.stop()
+                if self.current_widget:
+                    self.current_widget.after(0, self.current_widget.playback_finished)
     
-    def pause(self):
-        print(f"[DEBUG] Pausing at position: {self.position:.2f}s")
-        self.is_paused = True
+    def _play_fanout(self):
+        """Render each block once and feed it to the output and monitor devices"""
+        sinks = []
+        try:
+            device_id = self.device_manager.get_current_device()
+            block_size = self._block_size()
+            self._close_sinks()
+            
+            sinks.append(OutputSink("output", device_id, self.sample_rate, block_size))
+            sinks[0].start()
+            try:
+                monitor = OutputSink("monitor", self.monitor_device, self.sample_rate, block_size,
+                                     self.monitor_gain, compensate_drift=True)
+                monitor.start()
+                sinks.append(monitor)
+            except Exception as e:
+                # Keep playing to the main output even if the monitor can't be opened
+                print(f"[ERROR] Could not open monitor device {self.monitor_device}: {e}")
+            self.sinks = sinks
+            primary = sinks[0]
+            
+            # The main output's fill level paces rendering
+            block_time = block_size / self.sample_rate
+            while self.is_playing and self.sinks is sinks:
+                if not primary.needs_data():
+                    time.sleep(block_time / 4)
+                    continue
+                block = self._render_block(block_size)
+                if block is None:
+                    time.sleep(0.1 if self.is_paused else 0.005)
+                    continue
+                self.meter.publish(block, self.sample_rate)
+                for sink in sinks:
+                    sink.push(block)
+            
+            if self.sinks is sinks:
+                # Natural end: let the queued blocks play out before closing
+                deadline = time.monotonic() + primary.ring.capacity / self.sample_rate
+                while primary.ring.available() > 0 and time.monotonic() < deadline and self.sinks is sinks:
+                    time.sleep(block_time)
+                self._close_sinks()
+        except Exception as e:
+            print(f"[ERROR] Stream error: {e}")
+            for sink in sinks:
+                sink.close()
+            if not sinks or self.sinks is sinks:
+                self.sinks = None
+                self.stop()
+                if self.current_widget:
+                    self.current_widget.after(0, self.current_widget.playback_finished)
+    
+    def _close_sinks(self):
+        sinks = self.sinks
+        self.sinks = None
+        for sink in sinks or ():
+            sink.close()
+    
+    def set_monitor_device(self, device_id):
+        """Send output to a second device as well (None for off), restarting playback on it"""
+        print(f"[DEBUG] Setting monitor device to: {device_id}")
+        self.monitor_device = device_id
+        self.restart_playback()
+    
+    def set_monitor_gain(self, gain):
+        self.monitor_gain = gain
+        for sink in self.sinks or ():
+            if sink.name == "monitor":
+                sink.gain = gain
+    
+    def set_engine_process(self, enabled):
+        """Run playback in a separate process (or back in this one), carrying playback over"""
+        if enabled == (self.engine is not None):
+            return True
+        was_playing = self.is_playing
+        was_paused = self.is_paused
+        current_position = self.position
+        self.stop()
         
-    def stop(self):
-        print("[DEBUG] Stopping playback")
-        self.is_playing = False
-        self.is_paused = False
-        self.position = 0
+        if enabled:
+            try:
+                self.engine = AudioEngineProcess()
+            except Exception as e:
+                print(f"[ERROR] Could not start the audio engine process: {e}")
+                self.engine = None
+        else:
+            engine = self.engine
+            self.engine = None
+            engine.close()
+        
+        if was_playing:
+            self.position = current_position
+            self.play(self.is_looping)
+            if was_paused:
+                self.pause()
+        return enabled == (self.engine is not None)
+    
+    def level_meters(self):
+        """Meters of every stream sending audio right now, for the UI to read"""
+        meters = [self.engine.meter if self.engine is not None else self.meter]
+        if self.trigger_bank is not None and self.trigger_bank.stream is not None:
+            meters.append(self.trigger_bank.meter)
+        return meters
+    
+    def _play_in_engine(self):
+        """Hand the loaded clip to the engine process and mirror its position here"""
+        engine = self.engine
+        device_id = self.device_manager.get_current_device()
+        engine.load(self.track)
+        engine.send("gain", *self._block_gain(self.track))
+        engine.send("time_pitch", self.shifter.speed, self.shifter.semitones)
+        engine.send("crossfade", self.crossfader.shape, self.crossfader.seconds["loop"])
+        engine.play(device_id, self.sample_rate, self._block_size(), self.is_looping,
+                    int(self.position * self.sample_rate))
         
-        # Close the stream
+        thread = threading.Thread(target=self._watch_engine, args=(engine, self.track), name="engine-watch")
+        thread.daemon = True
+        thread.start()
+    
+    def _watch_engine(self, engine, track):
+        """Sync position, end of clip, loop and gain with the engine while this clip plays"""
+        ended = engine.ended_count()
+        sent = (self._block_gain(track), self.is_looping)
+        while self.is_playing and self.engine is engine and self.track is track:
+            if engine.ended_count() != ended:
+                self._finish_playback()
+                return
+            self.position = engine.position() / track.sample_rate
+            
+            # Volume, mute and repeat mode are changed by plain attribute writes
+            current = (self._block_gain(track), self.is_looping)
+            if current != sent:
+                engine.send("gain", *current[0])
+                engine.send("loop", current[1])
+                sent = current
+            time.sleep(0.02)
+    
+    def _close_output_stream(self):
         if self.current_stream:
             try:
                 print("[DEBUG] Closing audio stream")
@@ -285,12 +951,179 @@ class AudioController:
             finally:
                 self.current_stream = None
                 print("[DEBUG] Stream closed and set to None")
+    
+    def set_passthrough(self, enabled):
+        """
+        Turn full-duplex mic passthrough on or off.
+        
+        While on, one sd.Stream captures input_device and writes to the output
+        device, and clips are mixed into the same callback block, so the mic and
+        clips share one clock and one buffer of latency. Returns whether the
+        requested state could be applied.
+        """
+        print(f"[DEBUG] Setting mic passthrough to: {enabled}")
+        self.passthrough = enabled
+        if not enabled:
+            self._close_duplex()
+            return True
+        return self._open_duplex()
+    
+    def set_input_device(self, device_id):
+        """Change the captured microphone, reopening the passthrough stream if it's running"""
+        self.input_device = device_id
+        self._refresh_duplex()
+    
+    def duplex_rate(self):
+        """Sample rate of the passthrough stream; clips are decoded at this rate while it runs"""
+        return self._target_rate(self.voice_mode, self.voice_quality) or CACHE_SAMPLE_RATE
+    
+    def _open_duplex(self):
+        import sounddevice as sd
+        
+        # Move any current playback over to the duplex stream at its rate
+        was_playing = self.is_playing
+        was_paused = self.is_paused
+        current_position = self.position
+        if was_playing:
+            self.stop()
+        self._close_duplex(resume=False)
+        
+        try:
+            output_device = self.device_manager.get_current_device()
+            rate = self.duplex_rate()
+            print(f"[DEBUG] Opening duplex stream: input={self.input_device}, output={output_device}, rate={rate}")
+            stream = sd.Stream(
+                samplerate=rate,
+                blocksize=self._block_size(),
+                device=(self.input_device, output_device),
+                channels=(1, 1),
+                dtype=np.float32,
+                latency="low",
+                callback=self._duplex_callback
+            )
+            if self.monitor_device is not None:
+                try:
+                    monitor = OutputSink("monitor", self.monitor_device, rate, self._block_size(),
+                                         self.monitor_gain, compensate_drift=True)
+                    monitor.start()
+                    self.sinks = [monitor]
+                except Exception as e:
+                    print(f"[ERROR] Could not open monitor device {self.monitor_device}: {e}")
+            stream.start()
+            self.duplex_stream = stream
+            print("[DEBUG] Duplex stream started successfully")
+        except Exception as e:
+            print(f"[ERROR] Failed to open duplex stream: {e}")
+            self._close_sinks()
+            self.passthrough = False
+            self.duplex_stream = None
+        
+        if was_playing and self.active_file_path:
+            self.load_audio(self.active_file_path, self.current_widget, self.region)
+            self.position = current_position
+            self.play(self.is_looping)
+            if was_paused:
+                self.pause()
+        return self.duplex_stream is not None
+    
+    def _close_duplex(self, resume=True):
+        if self.duplex_stream is None:
+            return
+        stream = self.duplex_stream
+        self.duplex_stream = None
+        try:
+            print("[DEBUG] Closing duplex stream")
+            stream.stop()
+            stream.close()
+        except Exception as e:
+            print(f"[ERROR] Error closing duplex stream: {e}")
+        self._close_sinks()
+        
+        if resume and self.is_playing and self.active_file_path:
+            # Continue the clip on a regular output stream
+            current_position = self.position
+            was_paused = self.is_paused
+            self.stop()
+            self.load_audio(self.active_file_path, self.current_widget, self.region)
+            self.position = current_position
+            self.play(self.is_looping)
+            if was_paused:
+                self.pause()
+    
+    def _refresh_duplex(self):
+        """Reopen the passthrough stream after a device, rate or block size change"""
+        if self.passthrough and self.duplex_stream is not None:
+            self._open_duplex()
+    
+    def _duplex_callback(self, indata, outdata, frames, time_info, status):
+        """Mix the microphone and the clip into one output block (runs on the PortAudio thread)"""
+        if status:
+            self.duplex_xruns += 1
+        out = outdata[:, 0]
+        np.multiply(indata[:, 0], self.mic_gain, out=out)
+        
+        block = self._render_block(frames)
+        if block is not None:
+            out += block
+            np.clip(out, -1.0, 1.0, out=out)
+        
+        if self.trigger_bank is not None:
+            stream = self.duplex_stream
+            self.trigger_bank.mix_into(
+                out, frames,
+                time_info.outputBufferDacTime - time_info.currentTime,
+                # A duplex stream reports (input, output) latency
+                stream.latency[1] if stream is not None else 0.0
+            )
+        self.meter.publish(out, self.duplex_rate())
+        
+        # The monitor hears exactly what is sent
+        sinks = self.sinks
+        if sinks:
+            for sink in sinks:
+                sink.push(out)
+    
+    def close(self):
+        """Stop playback and release every stream, including the passthrough stream"""
+        self.stop()
+        self._close_duplex(resume=False)
+        if self.engine is not None:
+            engine = self.engine
+            self.engine = None
+            engine.close()
+    
+    def pause(self):
+        print(f"[DEBUG] Pausing at position: {self.position:.2f}s")
+        self.is_paused = True
+        if self.engine is not None:
+            self.engine.send("pause")
+        
+    def stop(self):
+        print("[DEBUG] Stopping playback")
+        self.is_playing = False
+        self.is_paused = False
+        self.position = 0
+        self._end_crossfade()
+        self._end_notified = False
+        if self.engine is not None:
+            self.engine.send("stop")
+        
+        # Close the stream (the passthrough stream keeps running without the clip)
+        self._close_output_stream()
+        if self.duplex_stream is None:
+            self._close_sinks()
             
     def seek(self, position):
         if self.duration > 0:
             new_position = min(max(0, position), 1) * self.duration
             print(f"[DEBUG] Seeking to position: {new_position:.2f}s")
             self.position = new_position
+            self._end_notified = False
+            if self.engine is not None and self.sample_rate:
+                self.engine.send("seek", int(new_position * self.sample_rate))
+            elif self.track is not None:
+                # The engine copies audio in order, so only in-process playback jumps ahead
+                self.track.prepare_seek(int(new_position * self.track.sample_rate))
         else:
             print("[DEBUG] Can't seek - no duration information")
             self.position = 0
@@ -313,6 +1146,10 @@ class AudioController:
     def restart_playback(self):
         """Restart playback with new device settings"""
         print("[DEBUG] Restarting playback with new settings")
+        if self.duplex_stream is not None:
+            # Reopening the passthrough stream carries playback over to the new device
+            self._refresh_duplex()
+            return
         if self.active_file_path and self.is_playing:
             was_playing = True
             was_paused = self.is_paused
@@ -322,7 +1159,7 @@ class AudioController:
             self.stop()
             
             print(f"[DEBUG] Reloading audio: {self.active_file_path}")
-            self.load_audio(self.active_file_path, self.current_widget)
+            self.load_audio(self.active_file_path, self.current_widget, self.region)
             
             self.position = current_position
             
@@ -348,6 +1185,11 @@ class AudioController:
             
         self.voice_quality = quality
         
+        if self.duplex_stream is not None:
+            # New rate and block size for the passthrough stream; playback moves with it
+            self._refresh_duplex()
+            return
+        
         # Restart playback with new settings if in voice mode and playing
         if self.voice_mode and self.active_file_path and self.is_playing:
             print("[DEBUG] Restarting playback with new voice quality settings")
@@ -360,7 +1202,7 @@ class AudioController:
             self.stop()
             
             # Reload with new settings
-            self.load_audio(self.active_file_path, self.current_widget)
+            self.load_audio(self.active_file_path, self.current_widget, self.region)
             
             # Restore position
             self.position = current_position
@@ -371,11 +1213,24 @@ class AudioController:
                 if was_paused:
                     self.pause()
     
+    def set_time_pitch(self, speed, semitones):
+        """Change playback speed and pitch (in semitones); takes effect from the next block"""
+        # Not while a block is rendering: it sizes and resamples with the same settings
+        with self._render_lock:
+            self.shifter.set(speed, semitones)
+        print(f"[DEBUG] Speed {self.shifter.speed:.2f}x, pitch {self.shifter.semitones:+.0f} semitones")
+        if self.engine is not None:
+            self.engine.send("time_pitch", self.shifter.speed, self.shifter.semitones)
+    
     def set_voice_mode(self, enabled):
         """Enable or disable voice application mode"""
         print(f"[DEBUG] Setting voice mode to: {enabled}")
         self.voice_mode = enabled
         
+        if self.duplex_stream is not None:
+            self._refresh_duplex()
+            return
+        
         if self.active_file_path and self.is_playing:
             # Reload and restart playback with new settings
             was_playing = True
@@ -383,7 +1238,7 @@ class AudioController:
             was_paused = self.is_paused
             
             self.stop()
-            self.load_audio(self.active_file_path, self.current_widget)
+            self.load_audio(self.active_file_path, self.current_widget, self.region)
             self.position = current_position
             
             if was_playing:
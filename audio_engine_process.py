@@ -0,0 +1,332 @@
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from time_stretch import TimePitchShifter
+from crossfade import Crossfader, build_loop_fade, read_looped
+from level_meter import LevelMeter, ring_size
+
+# Slots of the shared status array (float64)
+POSITION = 0   # Engine: frames of the clip played so far
+ENDED = 1      # Engine: bumped each time a clip ends without looping
+AVAILABLE = 2  # UI: frames copied into the clip buffer so far
+LENGTH = 3     # UI: final clip length, or -1 while a streaming decode may still shorten it
+UNDERRUNS = 4  # Engine: blocks that had to wait for the clip buffer
+STATUS_SIZE = 5
+
+def render_clip(samples, start, end, frames, multiplier, voice_guard):
+    """
+    Scale samples[start:end] into a zero-padded block of frames.
+
+    With voice_guard the block is normalized down if it would come close to
+    clipping, which protects voice apps from distortion.
+    """
+    block = np.zeros(frames, dtype=np.float32)
+    np.multiply(samples[start:end], multiplier, out=block[:end - start])
+    return apply_voice_guard(block, voice_guard)
+
+def render_shifted(shifter, samples, total, frames, multiplier, voice_guard):
+    """Like render_clip, but read from shifter.position on through a TimePitchShifter"""
+    block = shifter.render(samples, frames, total)
+    block *= multiplier
+    return apply_voice_guard(block, voice_guard)
+
+def apply_voice_guard(block, voice_guard):
+    """Normalize block down in place if voice_guard is set and it comes close to clipping"""
+    if voice_guard:
+        max_val = np.max(np.abs(block))
+        if max_val > 0.95:
+            block *= 0.95 / max_val
+    return block
+
+def engine_main(commands, status_name, meter_name):
+    """
+    Playback loop of the engine process.
+
+    Owns its own PortAudio stream and reads clip audio straight from shared
+    memory, so layout work holding the GIL in the UI process can't delay it.
+    """
+    import sounddevice as sd
+
+    status_shm = shared_memory.SharedMemory(name=status_name)
+    status = np.ndarray(STATUS_SIZE, dtype=np.float64, buffer=status_shm.buf)
+    meter_shm = shared_memory.SharedMemory(name=meter_name)
+    meter = LevelMeter(meter_shm.buf)
+
+    clip_shm = None
+    samples = None
+    stream = None
+    block_size = 1024
+    multiplier = 1.0
+    voice_guard = False
+    looping = False
+    playing = False
+    paused = False
+    position = 0
+    shifter = TimePitchShifter()
+    crossfader = Crossfader(None)
+    loop_fade = None  # (settings key, seam buffer) of the loaded clip
+    sample_rate = None
+
+    def close_stream():
+        nonlocal stream
+        if stream is not None:
+            try:
+                stream.stop()
+                stream.close()
+            except Exception as e:
+                print(f"[ERROR] Engine: error closing stream: {e}")
+            stream = None
+
+    try:
+        while True:
+            # Block on the pipe while idle, only peek at it while playing
+            timeout = 0 if playing and not paused else 0.1
+            while commands.poll(timeout):
+                timeout = 0
+                command, *args = commands.recv()
+                if command == "quit":
+                    return
+                elif command == "load":
+                    name, frames = args
+                    close_stream()
+                    playing = False
+                    samples = None
+                    if clip_shm is not None:
+                        clip_shm.close()
+                    clip_shm = shared_memory.SharedMemory(name=name)
+                    samples = np.ndarray(frames, dtype=np.float32, buffer=clip_shm.buf)
+                    loop_fade = None
+                elif command == "play":
+                    device, sample_rate, block_size, looping, position = args
+                    crossfader.prepare(sample_rate)
+                    close_stream()
+                    try:
+                        stream = sd.OutputStream(
+                            samplerate=sample_rate,
+                            channels=1,
+                            device=device,
+                            dtype=np.float32,
+                            blocksize=block_size
+                        )
+                        stream.start()
+                        playing = samples is not None
+                        paused = False
+                    except Exception as e:
+                        print(f"[ERROR] Engine: stream error: {e}")
+                        playing = False
+                        status[ENDED] += 1
+                elif command == "pause":
+                    paused = True
+                elif command == "resume":
+                    paused = False
+                elif command == "stop":
+                    close_stream()
+                    playing = False
+                    position = 0
+                elif command == "seek":
+                    position = args[0]
+                elif command == "gain":
+                    multiplier, voice_guard = args
+                elif command == "loop":
+                    looping = args[0]
+                elif command == "time_pitch":
+                    shifter.set(*args)
+                elif command == "crossfade":
+                    shape, loop_seconds = args
+                    crossfader.configure(shape, loop=loop_seconds)
+                status[POSITION] = position
+
+            if not playing or paused:
+                continue
+
+            length = int(status[LENGTH])
+            total = length if length >= 0 else len(samples)
+            if position >= total:
+                if looping:
+                    position = 0
+                else:
+                    close_stream()
+                    playing = False
+                    position = 0
+                    status[ENDED] += 1
+                    continue
+
+            if looping and length > 0 and not shifter.active:
+                # The whole clip is in shared memory: wrap inside the block, crossfaded if set
+                fade_length = min(crossfader.frames("loop", sample_rate), length // 2)
+                key = (crossfader.shape, fade_length)
+                if fade_length > 0 and (loop_fade is None or loop_fade[0] != key):
+                    loop_fade = (key, build_loop_fade(samples, length, *crossfader.curves(fade_length)))
+                seam = loop_fade[1] if fade_length > 0 else None
+                raw, end = read_looped(samples, seam, position, block_size, length)
+                block = render_clip(raw, 0, block_size, block_size, multiplier, voice_guard)
+            else:
+                if shifter.active:
+                    if int(shifter.position) != position:
+                        # Started, seeked or looped since the last shifted block
+                        shifter.reset(position)
+                    end = min(shifter.input_range(block_size)[1], total)
+                else:
+                    end = min(position + block_size, total)
+                if end > status[AVAILABLE]:
+                    # The UI is still copying a streaming decode in
+                    status[UNDERRUNS] += 1
+                    time.sleep(0.002)
+                    continue
+
+                if shifter.active:
+                    block = render_shifted(shifter, samples, total, block_size, multiplier, voice_guard)
+                    end = int(shifter.position)
+                else:
+                    block = render_clip(samples, position, end, block_size, multiplier, voice_guard)
+            meter.publish(block, sample_rate)
+            try:
+                stream.write(block)
+            except Exception as e:
+                print(f"[ERROR] Engine: error writing to stream: {e}")
+                close_stream()
+                playing = False
+                status[ENDED] += 1
+                continue
+            position = end
+            status[POSITION] = position
+    finally:
+        close_stream()
+        samples = None
+        status = None
+        meter = None
+        if clip_shm is not None:
+            clip_shm.close()
+        status_shm.close()
+        meter_shm.close()
+
+class AudioEngineProcess:
+    """
+    UI-side handle of the engine process.
+
+    Commands go over a one-way pipe. Clip audio is copied once into a
+    shared-memory block the engine reads from, and position/end-of-clip and
+    output levels come back through small shared arrays, so nothing on the
+    audio path waits for the UI process.
+    """
+
+    def __init__(self):
+        context = multiprocessing.get_context("spawn")
+        self.status_shm = shared_memory.SharedMemory(create=True, size=STATUS_SIZE * 8)
+        self.status = np.ndarray(STATUS_SIZE, dtype=np.float64, buffer=self.status_shm.buf)
+        self.status[:] = 0
+        self.status[LENGTH] = -1
+        # Levels of the engine's output, read by the UI meters
+        self.meter_shm = shared_memory.SharedMemory(create=True, size=ring_size())
+        self.meter = LevelMeter(self.meter_shm.buf)
+        self.meter.reset()
+
+        receiver, self.commands = context.Pipe(duplex=False)
+        # The UI thread and the engine watcher both send; interleaved writes would corrupt the pipe
+        self._send_lock = threading.Lock()
+        self.process = context.Process(
+            target=engine_main,
+            args=(receiver, self.status_shm.name, self.meter_shm.name),
+            name="audio-engine",
+            daemon=True
+        )
+        self.process.start()
+        receiver.close()
+
+        self.clip_shm = None
+        self.track = None  # DecodedTrack whose audio is in clip_shm
+        self._feeder = None
+        print(f"[DEBUG] Audio engine process started (pid {self.process.pid})")
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def send(self, *command):
+        try:
+            with self._send_lock:
+                self.commands.send(command)
+        except (OSError, EOFError) as e:
+            print(f"[ERROR] Audio engine is not responding: {e}")
+
+    def load(self, track):
+        """Share a decoded track with the engine; a streaming decode is copied in as it arrives"""
+        if track is self.track:
+            return
+        old_shm = self.clip_shm
+        frames = len(track.samples)
+        self.clip_shm = shared_memory.SharedMemory(create=True, size=max(frames, 1) * 4)
+        clip = np.ndarray(frames, dtype=np.float32, buffer=self.clip_shm.buf)
+        self.track = track
+
+        self.status[AVAILABLE] = 0
+        self.status[LENGTH] = -1
+        if track.stream is None:
+            clip[:] = track.samples
+            self.status[AVAILABLE] = frames
+            self.status[LENGTH] = frames
+        else:
+            self._feeder = threading.Thread(target=self._feed, args=(track, clip), name="engine-feeder")
+            self._feeder.daemon = True
+            self._feeder.start()
+
+        self.send("load", self.clip_shm.name, frames)
+        if old_shm is not None:
+            # The engine drops its mapping on load; unlinking only removes the name
+            self._release(old_shm)
+
+    def _feed(self, track, clip):
+        copied = 0
+        while self.track is track:
+            decoded = track.decoded_frames()
+            if decoded > copied:
+                clip[copied:decoded] = track.samples[copied:decoded]
+                copied = decoded
+                self.status[AVAILABLE] = copied
+            if track.stream.finished.is_set() and copied >= track.decoded_frames():
+                if copied < track.playable_frames() and track.seek_index:
+                    # An earlier seek restarted decoding past copied; fill the gap
+                    track.prepare_seek(copied)
+                else:
+                    self.status[LENGTH] = track.playable_frames()
+                    return
+            time.sleep(0.005)
+
+    def play(self, device, sample_rate, block_size, looping, position):
+        self.send("play", device, sample_rate, block_size, looping, position)
+
+    def position(self):
+        return int(self.status[POSITION])
+
+    def ended_count(self):
+        return int(self.status[ENDED])
+
+    def close(self):
+        """Stop the engine process and free shared memory"""
+        self.track = None
+        self.send("quit")
+        self.process.join(timeout=1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        with self._send_lock:
+            self.commands.close()
+        self.status = None
+        self.meter = None
+        for shm in (self.clip_shm, self.status_shm, self.meter_shm):
+            if shm is not None:
+                self._release(shm)
+        self.clip_shm = None
+        print("[DEBUG] Audio engine process stopped")
+    
+    @staticmethod
+    def _release(shm):
+        try:
+            shm.close()
+        except BufferError:
+            # A feeder thread still holds a view; the mapping goes when it finishes
+            pass
+        try:
+            shm.unlink()
+        except OSError as e:
+            print(f"[ERROR] Error releasing shared memory: {e}")
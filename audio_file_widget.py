@@ -2,22 +2,44 @@ import customtkinter as ctk
 from pathlib import Path
 import time
 import threading
-from pydub import AudioSegment
+from ffmpeg_utils import probe_audio
+from wav_reader import is_wav_file, read_wav_info
+from flac_reader import is_flac_file, read_flac_info
+from cache_metadata import load_metadata
+from clip_regions import play_range
 
 class AudioFileWidget(ctk.CTkFrame):
-    def __init__(self, parent, file_name, file_path, on_remove, audio_controller, **kwargs):
+    def __init__(self, parent, file_name, file_path, on_remove, audio_controller, theme_manager,
+                 trigger_key=None, on_assign_trigger=None, on_edit_regions=None, **kwargs):
         super().__init__(parent, **kwargs)
+        self.theme_manager = theme_manager
         self.file_name = file_name
         self.file_path = file_path
         self.on_remove = on_remove
+        self.trigger_key = trigger_key
+        self.on_assign_trigger = on_assign_trigger
+        self.on_edit_regions = on_edit_regions
         self.audio_controller = audio_controller
         self.is_playing = False
         self.is_selected = False
         self.is_looping = self.audio_controller.is_looping
         self.duration = 0  # Will be set when loaded
+        self.region = None  # Named region played instead of the whole clip
         self.setup_ui()
         
         # Load duration in background to prevent UI freezing
+        self.refresh_duration()
+    
+    def update_trigger_button(self):
+        """Show the assigned trigger key, highlighted with the current theme's accent"""
+        self.trigger_btn.configure(
+            text=self.trigger_key or "⌨",
+            fg_color=self.theme_manager.get_color("accent_secondary" if self.trigger_key else "button_bg")
+        )
+    
+    def refresh_duration(self):
+        """Read the playable length again, after loading or when in/out points change"""
+        self.load_duration_info()
         self.load_duration_thread = threading.Thread(target=self.load_duration_info_bg)
         self.load_duration_thread.daemon = True
         self.load_duration_thread.start()
@@ -91,6 +113,33 @@ class AudioFileWidget(ctk.CTkFrame):
         )
         self.duration_label.pack(side="left", padx=5)
         
+        # In/out points and regions editor
+        self.regions_btn = self.theme_manager.themed(
+            ctk.CTkButton,
+            controls,
+            {"fg_color": "button_bg", "hover_color": "button_hover"},
+            text="✂",
+            width=28,
+            height=28,
+            corner_radius=14,
+            command=lambda: self.on_edit_regions(self.file_name) if self.on_edit_regions else None
+        )
+        self.regions_btn.pack(side="left", padx=2)
+        
+        # Trigger key button: shows the assigned key, click to change it
+        self.trigger_btn = self.theme_manager.themed(
+            ctk.CTkButton,
+            controls,
+            {"hover_color": "button_hover"},
+            text=self.trigger_key or "⌨",
+            width=32,
+            height=28,
+            corner_radius=14,
+            command=lambda: self.on_assign_trigger(self.file_name) if self.on_assign_trigger else None
+        )
+        self.update_trigger_button()
+        self.trigger_btn.pack(side="left", padx=2)
+        
         # Favorite/star button (optional feature)
         self.fav_btn = ctk.CTkButton(
             controls,
@@ -107,25 +156,25 @@ class AudioFileWidget(ctk.CTkFrame):
         # Add hover effect
         self.bind("<Enter>", self.on_enter)
         self.bind("<Leave>", self.on_leave)
-        
-        # Try to load duration info
-        self.load_duration_info()
     
     def load_duration_info_bg(self):
         """Load duration information in background thread to prevent UI freezing"""
         try:
-            # Check if this is a WAV file to use a faster method
-            if self.file_path.lower().endswith('.wav'):
-                # Use Wave module which is much faster for WAV files
-                import wave
-                with wave.open(self.file_path, 'rb') as wf:
-                    frames = wf.getnframes()
-                    rate = wf.getframerate()
-                    duration_sec = frames / float(rate)
-            else:
-                # Fallback to pydub for other formats
-                audio = AudioSegment.from_file(self.file_path)
-                duration_sec = len(audio) / 1000
+            metadata = load_metadata(self.file_path)
+            
+            # Show the playable length between the in/out points or silence trim points
+            start, end = play_range(metadata)
+            if end is None:
+                # Cached files are WAV or FLAC, so the header alone gives the duration
+                if is_wav_file(self.file_path):
+                    end = read_wav_info(self.file_path).duration
+                elif is_flac_file(self.file_path):
+                    # STREAMINFO may leave the length unset, then fall back to a probe
+                    end = read_flac_info(self.file_path).duration or probe_audio(self.file_path)["duration"]
+                else:
+                    # Other formats only need a header probe, not a full decode
+                    end = probe_audio(self.file_path)["duration"]
+            duration_sec = max(0.0, end - start)
                 
             self.duration = duration_sec
             mins = int(duration_sec // 60)
@@ -161,10 +210,11 @@ class AudioFileWidget(ctk.CTkFrame):
             # Start this track
             print(f"[DEBUG] Starting to play track: {self.file_name}")
             try:
-                # Ensure we fully stop any previous playback first
-                self.audio_controller.stop()
-                self.audio_controller.load_audio(self.file_path, self)
-                self.audio_controller.play(self.is_looping)
+                # Fade over the playing track if crossfades are on; otherwise stop it fully first
+                if not self.audio_controller.crossfade_to(self.file_path, self, self.is_looping, self.region):
+                    self.audio_controller.stop()
+                    self.audio_controller.load_audio(self.file_path, self, self.region)
+                    self.audio_controller.play(self.is_looping)
                 self.is_playing = True
                 self.play_btn.configure(text="⏸")
                 print(f"[DEBUG] Track started successfully: {self.file_name}")
@@ -174,6 +224,13 @@ class AudioFileWidget(ctk.CTkFrame):
         # Update widget appearance
         self.update_ui_state()
     
+    def play_region(self, region):
+        """Play a named region of the clip from its start, or with None the whole clip"""
+        self.region = region
+        self.file_label.configure(text=f"{self.file_name} [{region}]" if region else self.file_name)
+        self.is_playing = False
+        self.toggle_play()
+    
     def stop_playback(self):
         """External call to stop playback"""
         if self.is_playing:
@@ -181,13 +238,18 @@ class AudioFileWidget(ctk.CTkFrame):
             self.play_btn.configure(text="▶")
             self.update_ui_state()
     
-    def playback_finished(self):
-        """Called when playback naturally ends"""
+    def playback_finished(self, advance=True):
+        """Called when playback naturally ends; advance=False when playback_near_end already moved on"""
         self.is_playing = False
         self.play_btn.configure(text="▶")
         self.update_ui_state()
         
         # If the main app has registered a callback for this
+        if advance and hasattr(self.audio_controller, 'playback_ended_callback') and self.audio_controller.playback_ended_callback:
+            self.audio_controller.playback_ended_callback(self)
+    
+    def playback_near_end(self):
+        """Called one crossfade before the end, so the next track can fade in while this one plays on"""
         if hasattr(self.audio_controller, 'playback_ended_callback') and self.audio_controller.playback_ended_callback:
             self.audio_controller.playback_ended_callback(self)
     
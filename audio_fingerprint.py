@@ -0,0 +1,167 @@
+import hashlib
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from ffmpeg_utils import decode_audio
+
+# Fingerprints only look at 300-3000 Hz, so a low decode rate is enough and cheap
+FINGERPRINT_RATE = 8000
+FRAME_SIZE = 1024  # 128 ms
+HOP_SIZE = 256     # 32 ms between fingerprint frames
+# 17 log-spaced bands give 16 neighbour comparisons, one uint16 per frame
+BAND_EDGES = np.geomspace(300, 3000, 18)
+# Only the start of long files is fingerprinted
+MAX_SECONDS = 60
+
+# Frames this far below the loudest one are pauses; their bits would only encode noise
+QUIET_FRAME_DB = -40.0
+# Leading and trailing 10 ms windows this far below the loudest one are trimmed,
+# so padding or a noisy fade doesn't change the duration candidates are found by
+TRIM_DB = -30.0
+TRIM_WINDOW = 80  # 10 ms at FINGERPRINT_RATE
+BAND_FLOOR_DB = -30.0
+# A bit is set where a band is over 4.3 dB (1 neper) louder than the next one up;
+# smaller steps stay unset so noise doesn't flip them
+BIT_MARGIN = 1.0
+
+# Frames two copies may be offset by (about 1 s) and the share of the shorter one that must overlap
+MAX_SHIFT = 32
+MIN_OVERLAP = 0.8
+# Distance at or below which two fingerprints are the same sound; re-encoded
+# copies stay under about 0.15, unrelated sounds land above 0.7
+MATCH_THRESHOLD = 0.35
+# Candidates are looked up by trimmed duration first
+DURATION_TOLERANCE = 0.1
+
+_POPCOUNT = np.array([bin(value).count("1") for value in range(1 << 16)], dtype=np.uint8)
+
+class AudioIdentity:
+    """What import knows about a file's content before converting it"""
+
+    def __init__(self, file_hash, duration, fingerprint):
+        self.file_hash = file_hash  # SHA-1 of the file bytes
+        self.duration = duration    # Seconds, with leading and trailing silence trimmed
+        self.fingerprint = fingerprint  # uint16 per frame, or None for silent files
+
+    def fingerprint_bytes(self):
+        return fingerprint_to_bytes(self.fingerprint)
+
+def file_hash(file_path):
+    """SHA-1 of a file, read in large chunks"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def compute_fingerprint(samples, sample_rate=FINGERPRINT_RATE):
+    """
+    Band-energy fingerprint of mono samples.
+
+    Each frame's bits mark where the spectrum falls clearly from one band to
+    the next. Comparing log energies of neighbouring bands makes this
+    independent of gain, and it survives re-encoding and resampling.
+
+    Returns:
+        Tuple of (uint16 array with one value per frame, trimmed duration in seconds),
+        or (None, 0.0) if the samples are silent
+    """
+    windows = samples[:len(samples) // TRIM_WINDOW * TRIM_WINDOW].reshape(-1, TRIM_WINDOW)
+    window_power = np.mean(np.square(windows, dtype=np.float64), axis=1)
+    if len(window_power) == 0 or window_power.max() == 0:
+        return None, 0.0
+    audible = np.flatnonzero(window_power >= window_power.max() * 10 ** (TRIM_DB / 10))
+    samples = samples[audible[0] * TRIM_WINDOW:(audible[-1] + 1) * TRIM_WINDOW]
+    duration = len(samples) / sample_rate
+    samples = samples[:int(MAX_SECONDS * sample_rate)]
+    if len(samples) < FRAME_SIZE + 2 * HOP_SIZE:
+        # Very short clips still get a few frames
+        samples = np.pad(samples, (0, FRAME_SIZE + 2 * HOP_SIZE - len(samples)))
+
+    frames = sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE] * np.hanning(FRAME_SIZE).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+
+    edges = np.searchsorted(np.fft.rfftfreq(FRAME_SIZE, 1.0 / sample_rate), BAND_EDGES)
+    bands = np.add.reduceat(power[:, edges[0]:edges[-1]], edges[:-1] - edges[0], axis=1)
+
+    # Bands more than BAND_FLOOR_DB under the frame's loudest band are clamped to the
+    # floor, so empty bands compare equal instead of by their noise
+    floor = bands.max(axis=1, keepdims=True) * 10 ** (BAND_FLOOR_DB / 10)
+    levels = np.log(np.maximum(bands, floor) + 1e-20)
+    bits = (levels[:, :-1] - levels[:, 1:]) > BIT_MARGIN
+    fingerprint = np.packbits(bits, axis=1).view(">u2")[:, 0].astype(np.uint16)
+
+    energy = bands.sum(axis=1)
+    quiet = energy < energy.max() * 10 ** (QUIET_FRAME_DB / 10)
+    fingerprint[quiet] = 0
+    return fingerprint, duration
+
+def fingerprint_to_bytes(fingerprint):
+    """Serialize a fingerprint for the library database"""
+    return None if fingerprint is None else fingerprint.astype("<u2").tobytes()
+
+def fingerprint_from_bytes(data):
+    return np.frombuffer(data, dtype="<u2").astype(np.uint16)
+
+def fingerprint_distance(a, b, max_shift=MAX_SHIFT):
+    """
+    Differing bits over bits set in either fingerprint, at their best alignment.
+
+    Most bands are clamped to the floor and leave their bit unset, so counting
+    only set bits keeps unrelated sounds from looking alike just because both
+    are mostly zeros. Returns 1.0 when no alignment overlaps enough of the
+    shorter fingerprint.
+    """
+    min_overlap = max(1, int(min(len(a), len(b)) * MIN_OVERLAP))
+    best = 1.0
+    for shift in range(-max_shift, max_shift + 1):
+        if shift >= 0:
+            x, y = a[shift:], b
+        else:
+            x, y = a, b[-shift:]
+        overlap = min(len(x), len(y))
+        if overlap < min_overlap:
+            continue
+        x, y = x[:overlap], y[:overlap]
+        union = int(_POPCOUNT[x | y].sum(dtype=np.int64))
+        if union == 0:
+            continue
+        best = min(best, int(_POPCOUNT[x ^ y].sum(dtype=np.int64)) / union)
+    return best
+
+def fingerprint_file(file_path):
+    """Decode a file at the fingerprint rate; returns (fingerprint, trimmed duration)"""
+    samples, sample_rate = decode_audio(file_path, sample_rate=FINGERPRINT_RATE, channels=1)
+    return compute_fingerprint(samples, sample_rate)
+
+def identify_file(file_path):
+    """Hash and fingerprint a file for duplicate checks"""
+    fingerprint, duration = fingerprint_file(file_path)
+    return AudioIdentity(file_hash(file_path), duration, fingerprint)
+
+def find_duplicate(library, identity, exclude=None):
+    """
+    Find a library entry with the same content as identity.
+
+    exclude names an entry to ignore, such as the one a changed file re-imports into.
+
+    Returns:
+        Tuple of (entry name, "identical" or "similar"), or (None, None)
+    """
+    for name in library.find_by_hash(identity.file_hash):
+        if name != exclude:
+            return name, "identical"
+    if identity.fingerprint is None:
+        return None, None
+
+    tolerance = max(0.5, identity.duration * DURATION_TOLERANCE)
+    best_name, best_distance = None, MATCH_THRESHOLD
+    for name, data in library.fingerprints_near(identity.duration, tolerance):
+        if name == exclude:
+            continue
+        distance = fingerprint_distance(identity.fingerprint, fingerprint_from_bytes(data))
+        if distance <= best_distance:
+            best_name, best_distance = name, distance
+    if best_name is not None:
+        print(f"[DEBUG] Fingerprint match with {best_name}: distance {best_distance:.2f}")
+        return best_name, "similar"
+    return None, None
@@ -2,36 +2,55 @@ import customtkinter as ctk
 from pathlib import Path
 import atexit
 import signal
-import psutil
 import os
-import sys
-import subprocess
+import shutil
+import threading
+import time
+from startup_timer import StartupTimer
 from config_manager import ConfigManager
+from cache_manager import CacheManager
 from device_manager import DeviceManager
 from audio_controller import AudioController
 from theme_manager import ThemeManager
 from shortcuts import KeyboardShortcuts
+from triggers import TriggerBank
+from watch_folders import WatchFolderImporter
 from tkinter import messagebox
 from player_ui import PlayerUI
 from player_controller import PlayerController
-from pydub import AudioSegment
-from ffmpeg_utils import apply_ffmpeg_patches
+from ffmpeg_utils import set_ffmpeg_directory, ffmpeg_registry
 
 class AudioMicPlayer:
-    def __init__(self):
-        self.setup_ffmpeg()
+    def __init__(self, startup_time=None):
+        self.startup_timer = StartupTimer(startup_time)
+        self.startup_complete = False
         self.config_manager = ConfigManager()
         self.settings = self.config_manager.load_settings()
+        self.startup_timer.mark("settings loaded")
+        self.cache_manager = CacheManager(
+            self.config_manager, self.settings,
+            dispatch=lambda callback: self.window.after(0, callback)
+        )
         self.theme_manager = ThemeManager()
+        # Callbacks go through player_controller, which exists once the UI is built
+        self.watch_importer = WatchFolderImporter(
+            self.config_manager, self.settings,
+            dispatch=lambda callback: self.window.after(0, callback),
+            on_imported=lambda *args: self.player_controller.on_watch_import(*args),
+            on_removed=lambda name: self.player_controller.on_watch_remove(name)
+        )
         self.callback_timer_id = None
+        self.meter_timer_id = None
         
         # Set theme from settings
         if "theme" in self.settings:
             self.theme_manager.set_theme(self.settings["theme"])
         
-        # Initialize device manager with cached device
+        # Initialize device manager with cached device (PortAudio is started after the window shows)
         self.device_manager = DeviceManager(self.settings.get("last_device"))
         self.audio_controller = AudioController(self.device_manager)
+        self.trigger_bank = TriggerBank(self.audio_controller)
+        self.audio_controller.trigger_bank = self.trigger_bank
         self.current_playback = None
         self.is_playing = False
         self.audio_files = {}
@@ -40,17 +59,96 @@ class AudioMicPlayer:
         # Load voice mode settings
         self.audio_controller.voice_mode = self.settings.get("voice_mode", False)
         self.audio_controller.voice_quality = self.settings.get("voice_quality", "medium")
+        self.audio_controller.input_device = self.settings.get("input_device")
+        self.audio_controller.mic_gain = self.settings.get("mic_gain", 1.0)
+        self.audio_controller.monitor_device = self.settings.get("monitor_device")
+        self.audio_controller.monitor_gain = self.settings.get("monitor_gain", 1.0)
+        self.audio_controller.set_time_pitch(self.settings.get("playback_speed", 1.0),
+                                             self.settings.get("pitch_semitones", 0))
+        self.audio_controller.set_crossfade(self.settings.get("crossfade_shape", "equal_power"),
+                                            **self.settings.get("crossfade_seconds", {}))
         
         # Setup window and UI
         self.setup_window()
         self.initialize_components()
+        self.startup_timer.mark("ui built")
         
         # Register cleanup handlers
         atexit.register(self.cleanup)
         signal.signal(signal.SIGINT, self.signal_handler)
+        
+        # Everything slow waits until the window is on screen
+        self.window.after_idle(self.on_window_shown)
+    
+    def on_window_shown(self):
+        """Build the file list and start background startup work once the window is visible"""
+        self.startup_timer.mark("window shown")
+        self.player_controller.update_file_list()
+        self.startup_timer.mark("file list built")
+        
+        # Library validation streams its results into the list while devices are enumerated
+        self.config_manager.validate_library_async(
+            self.settings["cached_files"],
+            on_batch=lambda valid, missing: self.window.after(
+                0, lambda: self.player_controller.apply_library_validation(valid, missing)
+            ),
+            on_done=lambda: self.window.after(0, self.on_library_validated)
+        )
+        
+        startup_thread = threading.Thread(target=self.background_startup)
+        startup_thread.daemon = True
+        startup_thread.start()
+    
+    def on_library_validated(self):
+        """Collect the cache once missing entries are gone, after startup has settled"""
+        self.startup_timer.mark("library validated")
+        self.cache_manager.schedule_collect(delay=10)
+        # Older entries get fingerprints so imports can be checked against them
+        self.player_controller.fingerprint_library()
+        # Watching starts only now, so its removals can't race startup validation
+        self.player_controller.start_watching()
+    
+    def background_startup(self):
+        """Locate ffmpeg and enumerate audio devices off the UI thread"""
+        if not self.setup_ffmpeg():
+            self.window.after(0, self.show_ffmpeg_missing)
+        self.startup_timer.mark("ffmpeg configured")
+        
+        try:
+            self.device_manager.initialize()
+        except Exception as e:
+            print(f"Error initializing audio devices: {e}")
+        self.startup_timer.mark("devices enumerated")
+        
+        self.window.after(0, self.finish_startup)
+    
+    def finish_startup(self):
+        """Apply background startup results on the UI thread"""
+        try:
+            self.player_controller.refresh_devices()
+        except Exception as e:
+            print(f"Error refreshing devices: {e}")
+        
+        if self.settings.get("engine_process"):
+            self.player_controller.toggle_engine_process()
+        
+        # Trigger clips are decoded and their stream opened once devices are known
+        self.trigger_bank.arm(self.settings["triggers"], self.settings["cached_files"])
+        
+        # The passthrough stream needs the devices, so it's reopened only now
+        if self.settings.get("mic_passthrough"):
+            self.player_controller.toggle_mic_passthrough()
+        
+        self.startup_complete = True
+        self.startup_timer.mark("startup complete")
+        self.startup_timer.report()
     
     def setup_ffmpeg(self):
-        """Initialize ffmpeg path and configure pydub to avoid console windows"""
+        """Locate ffmpeg and point the decoder at it.
+        
+        Runs in a background thread, so it only reports whether ffmpeg was found
+        and leaves any error dialog to the UI thread.
+        """
         try:
             # Try to find ffmpeg in common locations
             ffmpeg_paths = [
@@ -75,27 +173,29 @@ class AudioMicPlayer:
                     print(f"Found ffmpeg in: {path}")
                     break
 
-            # If ffmpeg found, configure pydub
+            # If ffmpeg found, use it for decoding and probing
             if ffmpeg_found:
-                # Set the ffmpeg path in AudioSegment
-                AudioSegment.converter = os.path.join(ffmpeg_path, "ffmpeg.exe")
-                
-                # Apply our patches to suppress console windows
-                apply_ffmpeg_patches()
-                
+                set_ffmpeg_directory(ffmpeg_path)
                 print("FFmpeg configured successfully")
-            else:
-                # If not found, show error
-                messagebox.showerror(
-                    "FFmpeg Not Found",
-                    "Please install FFmpeg to use this application:\n\n"
-                    "1. Download from: https://ffmpeg.org/download.html\n"
-                    "2. Extract to C:\\ffmpeg\n"
-                    "3. Restart the application"
-                )
+            elif shutil.which("ffmpeg"):
+                # Already on PATH (e.g. installed by a package manager)
+                ffmpeg_found = True
+                print("Using ffmpeg from PATH")
+            return ffmpeg_found
                 
         except Exception as e:
             print(f"Warning: ffmpeg setup failed: {e}")
+            return True
+    
+    def show_ffmpeg_missing(self):
+        """Tell the user ffmpeg could not be found"""
+        messagebox.showerror(
+            "FFmpeg Not Found",
+            "Please install FFmpeg to use this application:\n\n"
+            "1. Download from: https://ffmpeg.org/download.html\n"
+            "2. Extract to C:\\ffmpeg\n"
+            "3. Restart the application"
+        )
     
     def setup_window(self):
         ctk.set_appearance_mode("dark")
@@ -136,6 +236,11 @@ class AudioMicPlayer:
         # Initialize keyboard shortcuts
         self.shortcuts = KeyboardShortcuts(self)
         
+        # On first start the device list and file list are filled in once the window shows
+        if self.startup_complete:
+            self.player_controller.refresh_devices()
+            self.player_controller.update_file_list()
+        
         # Start progress update timer - REDUCED FREQUENCY for better performance
         self.start_progress_timer()
     
@@ -144,71 +249,45 @@ class AudioMicPlayer:
         self.cancel_progress_timer()
         # Start new timer with REDUCED frequency (100ms instead of 50ms) for better performance
         self.callback_timer_id = self.window.after(100, self.player_controller.update_global_progress)
+        # The output meter redraws at display rate on its own timer
+        self.meter_timer_id = self.window.after(33, self.player_controller.update_meters)
     
     def cancel_progress_timer(self):
-        if self.callback_timer_id:
-            try:
-                self.window.after_cancel(self.callback_timer_id)
-            except Exception:
-                pass
-            self.callback_timer_id = None
+        for timer_id in (self.callback_timer_id, self.meter_timer_id):
+            if timer_id:
+                try:
+                    self.window.after_cancel(timer_id)
+                except Exception:
+                    pass
+        self.callback_timer_id = None
+        self.meter_timer_id = None
     
     def change_theme(self, theme_name):
-        """Change the application theme"""
-        # Cancel any pending callbacks before destroying UI
-        self.cancel_progress_timer()
-        
-        self.theme_manager.set_theme(theme_name)
+        """Change the application theme, restyling the existing widgets in place"""
+        start = time.perf_counter()
+        if not self.theme_manager.set_theme(theme_name):
+            return
         self.settings["theme"] = theme_name
-        self.config_manager.save_settings(self.settings)
-        
-        # First, remove all widgets
-        for widget in self.window.winfo_children():
-            widget.destroy()
+        self.config_manager.save_settings(self.settings, "theme")
         
-        # Clear widget references
-        self.file_widgets = {}
-        
-        # Update window background
         self.window.configure(fg_color=self.theme_manager.get_color("bg_primary"))
-        
-        # Rebuild the entire UI
-        self.initialize_components()
+        self.theme_manager.apply_theme()
+        print(f"[DEBUG] Theme {theme_name} applied in {(time.perf_counter() - start) * 1000:.0f} ms")
     
     def cleanup(self):
         self.cancel_progress_timer()
         if self.audio_controller:
-            self.audio_controller.stop()
+            self.audio_controller.close()
+        self.trigger_bank.close()
+        self.watch_importer.stop()
         
-        # Kill any zombie processes more aggressively
-        try:
-            current_process = psutil.Process(os.getpid())
-            children = current_process.children(recursive=True)
-            for child in children:
-                try:
-                    child.terminate()
-                except:
-                    pass
-                    
-            # Wait briefly for processes to terminate
-            gone, alive = psutil.wait_procs(children, timeout=1)
-            
-            # Force kill any remaining processes
-            for process in alive:
-                try:
-                    process.kill()
-                except:
-                    pass
-                    
-            # Look for any ffmpeg processes that might be orphaned
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-                try:
-                    if 'ffmpeg' in proc.info['name'].lower() or any('ffmpeg' in cmd.lower() for cmd in proc.info['cmdline'] if cmd):
-                        proc.kill()
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    pass
-        except Exception as e:
-            print(f"Error cleaning up processes: {e}")
+        self.cache_manager.shutdown()
+        
+        # Make sure coalesced settings changes reach the disk before exit
+        self.config_manager.close()
+        
+        # Stop only the ffmpeg processes we started ourselves
+        ffmpeg_registry.shutdown()
     
     def signal_handler(self, signum, frame):
         self.cleanup()
@@ -222,5 +301,6 @@ class AudioMicPlayer:
         self.window.mainloop()
 
 if __name__ == "__main__":
-    app = AudioMicPlayer()
+    import time
+    app = AudioMicPlayer(startup_time=time.perf_counter())
     app.run()
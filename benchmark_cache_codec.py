@@ -0,0 +1,67 @@
+import os
+import sys
+import subprocess
+import tempfile
+import time
+from ffmpeg_utils import cache_command, run_ffmpeg_command, decode_audio, DecodeStream, ffmpeg_registry
+from wav_reader import read_wav
+from flac_reader import read_flac_info
+
+# Frames the player needs before it can write its first block
+FIRST_BLOCK = 1024
+
+def encode(input_path, output_path, format, compression_level=5):
+    """Convert like an import does and return the time taken"""
+    start = time.perf_counter()
+    result = run_ffmpeg_command(cache_command(input_path, output_path, format, compression_level),
+                                stdout=subprocess.DEVNULL)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors='replace').strip())
+    return time.perf_counter() - start
+
+def time_first_block(flac_path):
+    """Time from starting a streaming decode until the first block can be played"""
+    info = read_flac_info(flac_path)
+    start = time.perf_counter()
+    stream = DecodeStream(flac_path, info.sample_rate, info.frames)
+    stream.wait_for(FIRST_BLOCK)
+    first_block = time.perf_counter() - start
+    stream.finished.wait()
+    return first_block
+
+def benchmark_cache_codec(input_path, compression_levels=(0, 5, 8)):
+    """Compare the WAV and FLAC cache formats for one source file"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        wav_path = os.path.join(work_dir, "cache.wav")
+        wav_encode = encode(input_path, wav_path, "wav")
+        wav_size = os.path.getsize(wav_path)
+
+        start = time.perf_counter()
+        read_wav(wav_path)
+        wav_read = time.perf_counter() - start
+
+        print(f"Source: {input_path}")
+        print(f"{'codec':<10}{'size MB':>10}{'ratio':>8}{'encode s':>10}{'decode ms':>11}{'first block ms':>16}")
+        print(f"{'wav':<10}{wav_size / 1e6:>10.2f}{1.0:>8.2f}{wav_encode:>10.2f}{wav_read * 1000:>11.1f}{wav_read * 1000:>16.1f}")
+
+        for level in compression_levels:
+            flac_path = os.path.join(work_dir, f"cache_{level}.flac")
+            flac_encode = encode(input_path, flac_path, "flac", level)
+            flac_size = os.path.getsize(flac_path)
+
+            start = time.perf_counter()
+            decode_audio(flac_path, channels=1)
+            flac_decode = time.perf_counter() - start
+            first_block = time_first_block(flac_path)
+
+            print(f"{'flac -' + str(level):<10}{flac_size / 1e6:>10.2f}{flac_size / wav_size:>8.2f}"
+                  f"{flac_encode:>10.2f}{flac_decode * 1000:>11.1f}{first_block * 1000:>16.1f}")
+
+    ffmpeg_registry.shutdown()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python benchmark_cache_codec.py <audio file> [compression levels...]")
+        sys.exit(1)
+    levels = tuple(int(level) for level in sys.argv[2:]) or (0, 5, 8)
+    benchmark_cache_codec(sys.argv[1], levels)
@@ -0,0 +1,49 @@
+import sys
+import time
+import numpy as np
+from ffmpeg_utils import CACHE_SAMPLE_RATE, decode_audio, ffmpeg_registry
+from time_stretch import TimePitchShifter
+
+# (speed, semitones) settings to time
+SETTINGS = [(1.0, 0), (0.75, 0), (1.5, 0), (1.0, -5), (1.0, 7), (1.25, 4), (2.0, 12), (0.5, -12)]
+BLOCK_SIZES = (256, 1024)
+
+def test_signal(seconds=30, sample_rate=CACHE_SAMPLE_RATE):
+    """Voice-like test signal: a gliding harmonic tone with noise bursts"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    f0 = 140 + 40 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    signal = sum(np.sin(k * phase) / k for k in range(1, 8))
+    noise = np.random.default_rng(0).standard_normal(len(t)) * (np.sin(2 * np.pi * 2 * t) > 0.9)
+    return (0.2 * signal + 0.05 * noise).astype(np.float32)
+
+def time_setting(samples, sample_rate, speed, semitones, block_size):
+    """Render the whole clip block by block; returns (share of realtime, worst block share of its budget)"""
+    shifter = TimePitchShifter(speed, semitones)
+    budget = block_size / sample_rate
+    worst = 0.0
+    blocks = 0
+    start = time.perf_counter()
+    while shifter.position < len(samples):
+        block_start = time.perf_counter()
+        shifter.render(samples, block_size)
+        worst = max(worst, time.perf_counter() - block_start)
+        blocks += 1
+    elapsed = time.perf_counter() - start
+    return elapsed / (blocks * budget), worst / budget
+
+def benchmark_time_stretch(samples, sample_rate):
+    print(f"{len(samples) / sample_rate:.1f} s at {sample_rate} Hz mono, one core")
+    print(f"{'speed':>7}{'semitones':>11}{'block':>7}{'% realtime':>12}{'worst block %':>15}")
+    for speed, semitones in SETTINGS:
+        for block_size in BLOCK_SIZES:
+            share, worst = time_setting(samples, sample_rate, speed, semitones, block_size)
+            print(f"{speed:>7.2f}{semitones:>+11d}{block_size:>7}{share * 100:>12.2f}{worst * 100:>15.1f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        samples, sample_rate = decode_audio(sys.argv[1], sample_rate=CACHE_SAMPLE_RATE, channels=1)
+        ffmpeg_registry.shutdown()
+    else:
+        samples, sample_rate = test_signal(), CACHE_SAMPLE_RATE
+    benchmark_time_stretch(samples, sample_rate)
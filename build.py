@@ -21,7 +21,6 @@ def build_app():
         '--clean',                     # Clean cache before building
         
         # Add required imports that PyInstaller might miss
-        '--hidden-import=pydub.utils',
         '--hidden-import=customtkinter',
         '--hidden-import=ffmpeg_utils',
         '--hidden-import=wave',        # For faster WAV file loading
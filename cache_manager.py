@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+from pathlib import Path
+from cache_metadata import METADATA_SUFFIX
+
+# Extensions an import can leave in the cache (the cached copy keeps the source name)
+AUDIO_EXTENSIONS = {".wav", ".flac", ".mp3", ".ogg", ".opus", ".m4a", ".aac", ".wma", ".aiff", ".aif"}
+
+class CacheManager:
+    """
+    Keeps the cache directory free of files the library no longer uses.
+
+    The cached copies listed in cached_files are the library and are never
+    deleted here. A background collector removes orphans (audio nobody
+    references, sidecars whose audio is gone) and records how much disk each
+    entry uses. Cached audio only counts as orphaned when the library was
+    positively loaded and isn't empty.
+    """
+
+    # How often the collector runs without being asked
+    COLLECT_INTERVAL = 30 * 60
+    # Files this new may belong to an import that isn't in cached_files yet
+    ORPHAN_GRACE = 10 * 60
+
+    def __init__(self, config_manager, settings, dispatch):
+        self.config_manager = config_manager
+        self.settings = settings
+        self.dispatch = dispatch  # Runs a callable on the UI thread
+        self.cache_dir = config_manager.cache_dir
+
+        self._condition = threading.Condition()
+        self._pending = None  # (library, library_loaded) snapshot for the next run
+        self._due = 0
+        self._closed = False
+        self._thread = None
+
+    def record_play(self, file_name):
+        """Mark a library entry as just played"""
+        try:
+            self.config_manager.library.record_play(file_name)
+        except Exception as e:
+            print(f"[ERROR] Could not record play of {file_name}: {e}")
+
+    def schedule_collect(self, delay=0):
+        """
+        Ask the collector to run after delay seconds.
+
+        Call on the UI thread: the library is snapshotted here so the
+        collector never reads settings while they change.
+        """
+        snapshot = (
+            dict(self.settings.get("cached_files", {})),
+            self.config_manager.library_loaded
+        )
+        with self._condition:
+            if self._closed:
+                return
+            self._pending = snapshot
+            self._due = time.monotonic() + delay
+            self._ensure_thread()
+            self._condition.notify_all()
+
+    def shutdown(self):
+        """Stop the collector; a run in progress finishes its current file"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="cache-gc")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._condition.wait_for(
+                    lambda: self._closed or self._pending is not None, self.COLLECT_INTERVAL
+                ):
+                    # Periodic run: take a fresh snapshot on the UI thread
+                    self.dispatch(self.schedule_collect)
+                    continue
+                while not self._closed and self._due > time.monotonic():
+                    self._condition.wait(self._due - time.monotonic())
+                if self._closed:
+                    return
+                library, library_loaded = self._pending
+                self._pending = None
+
+            try:
+                sizes = self.collect(library, library_loaded)
+                self.config_manager.library.set_sizes(sizes)
+            except Exception as e:
+                print(f"[ERROR] Cache collection failed: {e}")
+
+    def collect(self, library, library_loaded):
+        """
+        Delete orphans and measure what each library entry uses.
+
+        Unless library_loaded is set, or if the library is empty while the cache
+        holds audio, the library may be incomplete (its database couldn't be
+        opened), so orphans are only reported.
+
+        Returns:
+            Dict of library entry name -> bytes used by its cached copy and sidecar
+        """
+        start = time.perf_counter()
+        now = time.time()
+
+        # Match on the bare file name, so a path written on another platform
+        # (cache\\name on Windows) still protects its file
+        owner_by_name = {Path(path.replace("\\", "/")).name: name for name, path in library.items()}
+
+        sizes = {}
+        total = 0
+        freed = 0
+
+        cache_entries = list(self._scan_cache_dir())
+        if library_loaded and not library and any(entry.name == owner_file for entry, owner_file in cache_entries):
+            # An empty library next to cached audio more likely means it failed to load
+            print("[DEBUG] Library is empty but the cache holds audio; not removing orphaned cache files")
+            library_loaded = False
+
+        for entry, owner_file in cache_entries:
+            owner = owner_by_name.get(owner_file) if owner_file is not None else None
+            size = self._entry_size(entry)
+            if owner_file is not None and owner is None and self._is_settled(entry, now):
+                if library_loaded:
+                    print(f"[DEBUG] Removing orphaned cache file: {entry.name}")
+                    freed += self._delete(entry.path, size)
+                    continue
+                print(f"[DEBUG] Keeping unreferenced cache file, library not loaded: {entry.name}")
+            total += size
+            if owner is not None:
+                sizes[owner] = sizes.get(owner, 0) + size
+
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"[DEBUG] Cache collected in {elapsed:.0f} ms: {total / 1e6:.1f} MB in use, {freed / 1e6:.1f} MB freed")
+        return sizes
+
+    def _scan_cache_dir(self):
+        """
+        Yield (entry, owner_file) for files in the cache directory.
+
+        owner_file is the cached audio file an entry belongs to (itself for audio),
+        or None for files this manager doesn't own, which are left alone.
+        """
+        try:
+            entries = list(os.scandir(self.cache_dir))
+        except OSError as e:
+            print(f"[ERROR] Can't scan cache directory: {e}")
+            return
+        for entry in entries:
+            try:
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if entry.name.endswith(METADATA_SUFFIX):
+                yield entry, entry.name[:-len(METADATA_SUFFIX)]
+            elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                yield entry, entry.name
+            else:
+                yield entry, None
+
+    def _is_settled(self, entry, now):
+        return now - self._mtime(entry) > self.ORPHAN_GRACE
+
+    @staticmethod
+    def _mtime(entry):
+        try:
+            return entry.stat().st_mtime
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _entry_size(entry):
+        try:
+            return entry.stat().st_size
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _delete(path, size):
+        """Delete a file and return the bytes released"""
+        try:
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            print(f"[ERROR] Can't delete {path}: {e}")
+            return 0
@@ -0,0 +1,61 @@
+import json
+import os
+import threading
+
+# Sidecar files sit next to each cached audio file
+METADATA_SUFFIX = ".meta.json"
+
+# Serializes read-modify-write updates from import, playback and GC threads
+_update_lock = threading.Lock()
+
+def metadata_path(cache_path):
+    """Path of the metadata sidecar for a cached audio file"""
+    return str(cache_path) + METADATA_SUFFIX
+
+def load_metadata(cache_path):
+    """Load the metadata for a cached file, or an empty dict if there is none"""
+    try:
+        with open(metadata_path(cache_path), 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        return metadata if isinstance(metadata, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Error reading metadata for {cache_path}: {e}")
+        return {}
+
+def save_metadata(cache_path, metadata):
+    """Atomically replace the metadata sidecar for a cached file"""
+    path = metadata_path(cache_path)
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, separators=(",", ":"))
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Error saving metadata for {cache_path}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def update_metadata(cache_path, **fields):
+    """Merge fields into a cached file's metadata and return the result"""
+    with _update_lock:
+        metadata = load_metadata(cache_path)
+        metadata.update(fields)
+        save_metadata(cache_path, metadata)
+    return metadata
+
+def modify_metadata(cache_path, change):
+    """Apply change(metadata), which edits the dict in place, as one read-modify-write"""
+    with _update_lock:
+        metadata = load_metadata(cache_path)
+        change(metadata)
+        save_metadata(cache_path, metadata)
+    return metadata
+
+def delete_metadata(cache_path):
+    """Remove the metadata sidecar for a cached file if it exists"""
+    try:
+        os.remove(metadata_path(cache_path))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,95 @@
+import math
+from audio_analysis import trim_bounds
+from cache_metadata import modify_metadata, update_metadata
+
+# Metadata keys set by the user rather than by analysis; they survive a re-import
+USER_KEYS = ("in_seconds", "out_seconds", "regions")
+
+def parse_time(text):
+    """Seconds from "12.5", "1:02.5" or "1:02:03"; None for empty text"""
+    text = text.strip()
+    if not text:
+        return None
+    seconds = 0.0
+    for part in text.split(":"):
+        value = float(part)
+        # float() also takes "inf", "nan" and signs, none of which is a point in a clip
+        if not math.isfinite(value) or value < 0 or part.strip().startswith(("-", "+")):
+            raise ValueError(f"Not a time: {text}")
+        seconds = seconds * 60 + value
+    return seconds
+
+def format_time(seconds):
+    """m:ss.s for showing a point in a clip"""
+    if seconds is None:
+        return ""
+    minutes = int(seconds // 60)
+    return f"{minutes}:{seconds - minutes * 60:04.1f}"
+
+def play_range(metadata, region=None):
+    """
+    (start, end) seconds of a cached file to play; end is None for the end of the file.
+
+    A named region wins, then the entry's in/out points, then the audible
+    part found by silence trimming.
+    """
+    if region is not None:
+        bounds = metadata.get("regions", {}).get(region)
+        if bounds is not None:
+            return bounds[0], bounds[1]
+        print(f"[ERROR] No region named {region}, playing the whole clip")
+    start = metadata.get("in_seconds")
+    if start is None:
+        start = metadata.get("trim_start_seconds") or 0.0
+    end = metadata.get("out_seconds")
+    if end is None:
+        end = metadata.get("trim_end_seconds")
+    return start, end
+
+def play_bounds(metadata, sample_rate, frame_count, region=None):
+    """play_range in frames of a decoded buffer, clamped to it"""
+    if region is None and "in_seconds" not in metadata and "out_seconds" not in metadata:
+        return trim_bounds(metadata, sample_rate, frame_count)
+    start_seconds, end_seconds = play_range(metadata, region)
+    if not math.isfinite(start_seconds) or (end_seconds is not None and not math.isfinite(end_seconds)):
+        # Saved before times were validated; play the clip rather than fail
+        return trim_bounds(metadata, sample_rate, frame_count)
+    start = min(max(0, int(round(start_seconds * sample_rate))), frame_count)
+    end = frame_count if end_seconds is None else min(int(round(end_seconds * sample_rate)), frame_count)
+    if end <= start:
+        return trim_bounds(metadata, sample_rate, frame_count)
+    return start, end
+
+def set_in_out(cache_path, in_seconds, out_seconds):
+    """Set (or with None, clear) the points an entry plays between"""
+    if in_seconds is not None and out_seconds is not None and out_seconds <= in_seconds:
+        raise ValueError("The out point must come after the in point")
+
+    def change(metadata):
+        for key, value in (("in_seconds", in_seconds), ("out_seconds", out_seconds)):
+            if value is None:
+                metadata.pop(key, None)
+            else:
+                metadata[key] = value
+    return modify_metadata(cache_path, change)
+
+def set_region(cache_path, name, start, end):
+    """Add or replace a named region of an entry"""
+    name = name.strip()
+    if not name:
+        raise ValueError("A region needs a name")
+    if end <= start:
+        raise ValueError("A region must end after it starts")
+
+    def change(metadata):
+        metadata.setdefault("regions", {})[name] = [start, end]
+    return modify_metadata(cache_path, change)
+
+def remove_region(cache_path, name):
+    return modify_metadata(cache_path, lambda metadata: metadata.get("regions", {}).pop(name, None))
+
+def carry_over(old_metadata, cache_path):
+    """Copy the user-set points and regions from old_metadata into a cached file's metadata"""
+    fields = {key: old_metadata[key] for key in USER_KEYS if key in old_metadata}
+    if fields:
+        update_metadata(cache_path, **fields)
@@ -2,19 +2,103 @@ import json
 from pathlib import Path
 import os
 import shutil
+import sqlite3
+import threading
+import time
+from library_store import LibraryStore
 
 class ConfigManager:
+    # Library data lives in the SQLite store; settings["cached_files"] is only an in-memory view of it
+    LIBRARY_KEYS = ("cached_files", "cache_usage")
+    
+    # Bursts of changes closer together than this are coalesced into one write
+    SAVE_DELAY = 0.5
+    # Never hold a dirty change back for longer than this, even under constant updates
+    MAX_SAVE_DELAY = 2.0
+    
     def __init__(self):
         self.config_dir = Path("config")
         self.config_dir.mkdir(exist_ok=True)
         self.config_file = self.config_dir / "settings.json"
         self.cache_dir = Path("cache")
         self.cache_dir.mkdir(exist_ok=True)
+        self.library_in_settings = False  # Set if migration failed and settings.json still holds the library
+        # Set once the library is known to be complete; until then nothing may be
+        # deleted on the grounds that the library doesn't reference it
+        self.library_loaded = False
+        library_path = self.config_dir / "library.db"
+        try:
+            self.library = LibraryStore(library_path)
+        except sqlite3.Error as e:
+            # A locked or corrupt database mustn't stop the app; it's left as is on disk
+            print(f"Error opening library database, keeping the library in settings.json this session: {e}")
+            self._backup_library_database(library_path)
+            self.library = LibraryStore(":memory:")
+            self.library_in_settings = True
         
-        # Clean up cache by verifying entries
-        self.clean_cache_on_startup()
+        # Write-behind state, guarded by the condition's lock
+        self._save_condition = threading.Condition()
+        self._pending_settings = None
+        self._dirty_keys = set()
+        self._first_change_time = 0.0
+        self._last_change_time = 0.0
+        self._flush_requested = False
+        self._writing = False
+        self._closed = False
+        self._writer_thread = None
         
     def load_settings(self):
+        """Load preferences from settings.json and the library from the database"""
+        settings = self._read_settings_file()
+        
+        if self.library_in_settings:
+            # No database: settings.json holds the library and the in-memory store mirrors it for lookups
+            # Once migrated, settings.json has no library left, so this session only
+            # sees what it imports itself and the library counts as not loaded
+            self.library_loaded = bool(settings.get("cached_files"))
+            settings["cached_files"] = settings.get("cached_files") or {}
+            settings["cache_usage"] = settings.get("cache_usage") or {}
+            self.library.import_entries(settings["cached_files"], settings["cache_usage"])
+            return settings
+        
+        # Libraries from before the database are moved into it once
+        if any(key in settings for key in self.LIBRARY_KEYS):
+            cached_files = settings.pop("cached_files", None) or {}
+            usage = settings.pop("cache_usage", None) or {}
+            try:
+                count = self.library.import_entries(cached_files, usage)
+                print(f"[DEBUG] Migrated {count} library entries from settings.json")
+                # Rewrite settings.json without the library
+                self.save_settings(settings, *self.LIBRARY_KEYS)
+            except Exception as e:
+                print(f"Error migrating library, keeping it in settings.json: {e}")
+                settings["cached_files"] = cached_files
+                settings["cache_usage"] = usage
+                self.library_in_settings = True
+                self.library_loaded = True
+                return settings
+        
+        settings["cached_files"] = self.library.paths()
+        self.library_loaded = True
+        return settings
+    
+    def _backup_library_database(self, library_path):
+        """Copy a database that couldn't be opened aside, so a corrupt one can still be recovered"""
+        if not library_path.exists():
+            return
+        stamp = int(time.time())
+        for suffix in ("", "-wal"):
+            source = Path(f"{library_path}{suffix}")
+            if not source.exists():
+                continue
+            backup_path = self.config_dir / f"library_backup_{stamp}.db{suffix}"
+            try:
+                shutil.copy2(source, backup_path)
+                print(f"[DEBUG] Copied unreadable library database to {backup_path}")
+            except OSError as e:
+                print(f"Error backing up library database: {e}")
+    
+    def _read_settings_file(self):
         if self.config_file.exists():
             try:
                 with open(self.config_file, 'r') as f:
@@ -28,8 +112,38 @@ class ConfigManager:
                         settings["theme"] = "dark_blue"
                     if "favorites" not in settings:
                         settings["favorites"] = []
-                    if "cached_files" not in settings:
-                        settings["cached_files"] = {}
+                    if "shuffle" not in settings:
+                        settings["shuffle"] = False
+                    if "repeat_mode" not in settings:
+                        settings["repeat_mode"] = "all"
+                    if "cache_codec" not in settings:
+                        settings["cache_codec"] = "wav"
+                    if "flac_compression_level" not in settings:
+                        settings["flac_compression_level"] = 5
+                    if "mic_passthrough" not in settings:
+                        settings["mic_passthrough"] = False
+                    if "input_device" not in settings:
+                        settings["input_device"] = None
+                    if "mic_gain" not in settings:
+                        settings["mic_gain"] = 1.0
+                    if "monitor_device" not in settings:
+                        settings["monitor_device"] = None
+                    if "monitor_gain" not in settings:
+                        settings["monitor_gain"] = 1.0
+                    if "engine_process" not in settings:
+                        settings["engine_process"] = False
+                    if "triggers" not in settings:
+                        settings["triggers"] = {}
+                    if "watch_folders" not in settings:
+                        settings["watch_folders"] = []
+                    if "playback_speed" not in settings:
+                        settings["playback_speed"] = 1.0
+                    if "pitch_semitones" not in settings:
+                        settings["pitch_semitones"] = 0
+                    if "crossfade_shape" not in settings:
+                        settings["crossfade_shape"] = "equal_power"
+                    if "crossfade_seconds" not in settings:
+                        settings["crossfade_seconds"] = {"manual": 0.3, "auto": 1.0, "loop": 0.02}
                     return settings
             except json.JSONDecodeError:
                 print("Error loading settings file, using defaults")
@@ -41,54 +155,223 @@ class ConfigManager:
         # Return default settings
         return {
             "last_device": None, 
-            "cached_files": {},
             "voice_mode": False,
             "voice_quality": "medium",
             "theme": "dark_blue",
-            "favorites": []
+            "favorites": [],
+            "shuffle": False,
+            "repeat_mode": "all",
+            "cache_codec": "wav",  # "wav" or lossless "flac" (about half the size on disk)
+            "flac_compression_level": 5,
+            "mic_passthrough": False,  # Mix the real microphone into the output
+            "input_device": None,
+            "mic_gain": 1.0,
+            "monitor_device": None,  # Second output to hear what's sent
+            "monitor_gain": 1.0,
+            "engine_process": False,  # Play from a separate process, isolated from UI stalls
+            "triggers": {},  # Trigger key (F1-F12) -> file name
+            "watch_folders": [],  # Folders whose audio files are imported automatically
+            "playback_speed": 1.0,  # 0.5x-2x, pitch kept unless pitch_semitones is set
+            "pitch_semitones": 0,  # -12 to +12
+            "crossfade_shape": "equal_power",  # "equal_power", "linear", or None for hard cuts
+            "crossfade_seconds": {"manual": 0.3, "auto": 1.0, "loop": 0.02}  # Per kind of transition
+        }
+    
+    def add_library_entry(self, settings, file_name, cache_path, **fields):
+        """
+        Add a cached file to the library view in settings and to the database.
+        
+        fields are extra columns for LibraryStore.add (hash, duration, fingerprint, source).
+        """
+        settings["cached_files"][file_name] = cache_path
+        try:
+            size = os.path.getsize(cache_path)
+        except OSError:
+            size = 0
+        self._update_library(settings, lambda: self.library.add(file_name, cache_path, size, **fields))
+    
+    def remove_library_entries(self, settings, *file_names):
+        """Drop entries from the library view in settings and from the database"""
+        for file_name in file_names:
+            settings["cached_files"].pop(file_name, None)
+        self._update_library(settings, lambda: self.library.remove(*file_names))
+    
+    def _update_library(self, settings, update):
+        if self.library_in_settings:
+            self.save_settings(settings, "cached_files")
+        # Also kept up to date when settings.json holds the library, since duplicate
+        # and watch-folder lookups go through the store
+        try:
+            update()
+        except Exception as e:
+            print(f"Error updating library database: {e}")
+    
+    def save_settings(self, settings, *changed_keys):
+        """Mark settings dirty and schedule a coalesced write on the background writer.
+        
+        Returns immediately. A snapshot is taken here on the caller's thread so
+        later changes to the dict can't race with serialization; pass the keys
+        that changed to make the debug log say what is being written.
+        """
+        snapshot = self._snapshot(settings)
+        with self._save_condition:
+            if self._closed:
+                # After shutdown there is no writer left, so write through
+                self._write_settings_file(snapshot)
+                return
+            now = time.monotonic()
+            if self._pending_settings is None:
+                self._first_change_time = now
+            self._last_change_time = now
+            self._pending_settings = snapshot
+            self._dirty_keys.update(changed_keys or ("*",))
+            self._ensure_writer_thread()
+            self._save_condition.notify_all()
+    
+    def flush(self, timeout=5.0):
+        """Write any pending settings now and wait until they are on disk"""
+        deadline = time.monotonic() + timeout
+        with self._save_condition:
+            self._flush_requested = True
+            self._save_condition.notify_all()
+            while self._pending_settings is not None or self._writing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print("Warning: timed out waiting for settings to be written")
+                    break
+                self._save_condition.wait(remaining)
+            self._flush_requested = False
+    
+    def close(self):
+        """Flush pending settings and stop the background writer"""
+        if self._closed:
+            return
+        self.flush()
+        with self._save_condition:
+            self._closed = True
+            self._save_condition.notify_all()
+        if self._writer_thread:
+            self._writer_thread.join(timeout=1.0)
+        self.library.close()
+    
+    def _snapshot(self, settings):
+        """Copy settings one level deep so the writer owns an immutable view"""
+        return {
+            key: value.copy() if isinstance(value, (dict, list)) else value
+            for key, value in settings.items()
+            if self.library_in_settings or key not in self.LIBRARY_KEYS
         }
     
-    def save_settings(self, settings):
-        """Save settings with backup mechanism"""
-        # Create temp file first
+    def _ensure_writer_thread(self):
+        if self._writer_thread is None or not self._writer_thread.is_alive():
+            self._writer_thread = threading.Thread(target=self._writer_loop, name="settings-writer")
+            self._writer_thread.daemon = True
+            self._writer_thread.start()
+    
+    def _writer_loop(self):
+        """Wait for dirty settings, let bursts settle, then write them in one go"""
+        while True:
+            with self._save_condition:
+                while self._pending_settings is None and not self._closed:
+                    self._save_condition.wait()
+                if self._pending_settings is None:
+                    return
+                
+                # Coalesce: wait for a quiet period, bounded by the maximum delay
+                while not self._flush_requested and not self._closed:
+                    deadline = min(
+                        self._last_change_time + self.SAVE_DELAY,
+                        self._first_change_time + self.MAX_SAVE_DELAY
+                    )
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._save_condition.wait(remaining)
+                
+                settings = self._pending_settings
+                dirty_keys = self._dirty_keys
+                self._pending_settings = None
+                self._dirty_keys = set()
+                self._writing = True
+            
+            try:
+                print(f"[DEBUG] Writing settings, changed: {', '.join(sorted(dirty_keys))}")
+                self._write_settings_file(settings)
+            finally:
+                with self._save_condition:
+                    self._writing = False
+                    self._save_condition.notify_all()
+    
+    def _write_settings_file(self, settings):
+        """Atomically replace settings.json with the given settings"""
         temp_file = self.config_dir / "settings.tmp"
         try:
             with open(temp_file, 'w') as f:
-                json.dump(settings, f, indent=2)
+                json.dump(settings, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
             
-            # If successful, replace the actual file
-            if temp_file.exists():
-                if self.config_file.exists():
-                    self.config_file.unlink()
-                temp_file.rename(self.config_file)
+            # os.replace is atomic, so readers never see a half-written file
+            os.replace(temp_file, self.config_file)
         except Exception as e:
             print(f"Error saving settings: {e}")
             if temp_file.exists():
                 temp_file.unlink()
     
-    def clean_cache_on_startup(self):
-        """Verify cache files exist and clean up broken entries"""
+    def validate_library_async(self, cached_files, on_batch, on_done=None):
+        """Check which cached files still exist without blocking the caller.
+        
+        Entries are grouped by directory and each directory is listed once with
+        os.scandir instead of stat-ing every file. on_batch(valid_names, missing_names)
+        is called from the background thread after each directory is checked, and
+        on_done() once all of them are, so callers must marshal to the UI thread.
+        """
+        # Snapshot on the caller's thread so the UI can keep editing its dict
+        entries = list(cached_files.items())
+        
+        def validation_thread():
+            try:
+                for directory, names_by_file in self._group_by_directory(entries).items():
+                    valid, missing = self._validate_directory(directory, names_by_file)
+                    on_batch(valid, missing)
+            except Exception as e:
+                print(f"Error validating library: {e}")
+            finally:
+                if on_done:
+                    on_done()
+        
+        thread = threading.Thread(target=validation_thread, name="library-validation")
+        thread.daemon = True
+        thread.start()
+        return thread
+    
+    @staticmethod
+    def _group_by_directory(entries):
+        """Map each directory to {normalized file name: [entry names]}"""
+        directories = {}
+        for file_name, file_path in entries:
+            directory, base_name = os.path.split(file_path)
+            names_by_file = directories.setdefault(directory or ".", {})
+            names_by_file.setdefault(os.path.normcase(base_name), []).append(file_name)
+        return directories
+    
+    @staticmethod
+    def _validate_directory(directory, names_by_file):
+        """Split one directory's entries into (valid, missing) with a single listing"""
         try:
-            if not self.config_file.exists():
-                return
-                
-            with open(self.config_file, 'r') as f:
-                settings = json.load(f)
-            
-            if "cached_files" not in settings:
-                return
-                
-            # Check each cached file
-            files_to_remove = []
-            for file_name, file_path in settings["cached_files"].items():
-                if not os.path.exists(file_path):
-                    files_to_remove.append(file_name)
-            
-            # Remove missing files
-            for file_name in files_to_remove:
-                del settings["cached_files"][file_name]
-            
-            # Save updated settings
-            self.save_settings(settings)
-        except Exception as e:
-            print(f"Error cleaning cache: {e}")
+            with os.scandir(directory) as it:
+                present = {os.path.normcase(entry.name) for entry in it}
+        except FileNotFoundError:
+            present = set()
+        except OSError as e:
+            # Unreadable directory (e.g. a flaky network share), fall back to per-file checks
+            print(f"Error listing {directory}: {e}")
+            present = {
+                base_name for base_name in names_by_file
+                if os.path.exists(os.path.join(directory, base_name))
+            }
+        
+        valid, missing = [], []
+        for base_name, file_names in names_by_file.items():
+            (valid if base_name in present else missing).extend(file_names)
+        return valid, missing
@@ -0,0 +1,104 @@
+import numpy as np
+
+SHAPES = ("equal_power", "linear")
+# Names shown in the UI, with None for crossfades off
+SHAPE_LABELS = {None: "Off", "linear": "Linear", "equal_power": "Equal Power"}
+
+def fade_curves(length, shape="equal_power"):
+    """
+    (fade_out, fade_in) gain curves of length frames.
+
+    Equal power (cos/sin) keeps the loudness of uncorrelated material even
+    through the fade; linear keeps the amplitude of correlated material even,
+    such as a loop fading into its own start.
+    """
+    t = (np.arange(length, dtype=np.float64) + 0.5) / length
+    if shape == "linear":
+        fade_out, fade_in = 1.0 - t, t
+    else:
+        fade_out, fade_in = np.cos(t * np.pi / 2), np.sin(t * np.pi / 2)
+    return fade_out.astype(np.float32), fade_in.astype(np.float32)
+
+class Crossfader:
+    """
+    Crossfade shape and per-transition lengths.
+
+    Curves for the configured lengths are computed by prepare() when the
+    settings or sample rate change, so a transition only looks them up.
+    """
+
+    # Seconds for each kind of transition
+    DEFAULT_SECONDS = {"manual": 0.3, "auto": 1.0, "loop": 0.02}
+
+    def __init__(self, shape="equal_power", **seconds):
+        self.shape = None
+        self.seconds = dict(self.DEFAULT_SECONDS)
+        self._curves = {}
+        self.configure(shape, **seconds)
+
+    def configure(self, shape, **seconds):
+        """Set the shape (None turns crossfades off) and any of the manual/auto/loop lengths"""
+        self.shape = shape if shape in SHAPES else None
+        for kind, value in seconds.items():
+            if kind in self.seconds and value is not None:
+                self.seconds[kind] = max(0.0, float(value))
+        self._curves = {}
+
+    def frames(self, kind, sample_rate):
+        """Length of a transition in frames, 0 when crossfades are off"""
+        if self.shape is None:
+            return 0
+        return int(self.seconds[kind] * sample_rate)
+
+    def prepare(self, sample_rate):
+        """Compute the curves for every configured length at sample_rate"""
+        for kind in self.seconds:
+            length = self.frames(kind, sample_rate)
+            if length > 0:
+                self.curves(length)
+
+    def curves(self, length):
+        """(fade_out, fade_in) of length frames; prepared lengths come from the cache"""
+        key = (self.shape, length)
+        curves = self._curves.get(key)
+        if curves is None:
+            curves = fade_curves(length, self.shape)
+            if len(self._curves) < 8:
+                self._curves[key] = curves
+        return curves
+
+def build_loop_fade(samples, total, fade_out, fade_in):
+    """
+    Seam of a crossfaded loop: the last len(fade_out) frames of samples[:total]
+    fading out over the same number of frames from the start fading in.
+    """
+    length = len(fade_out)
+    return samples[total - length:total] * fade_out + samples[:length] * fade_in
+
+def read_looped(samples, loop_fade, position, frames, total):
+    """
+    frames of samples[:total] from position on, wrapping around inside the block.
+
+    With loop_fade from build_loop_fade, the last len(loop_fade) frames are
+    played from it and the wrap continues right after the faded-in start, so
+    the seam is crossfaded; without one the wrap goes back to 0.
+
+    Returns:
+        Tuple of (float32 block, position after it)
+    """
+    length = 0 if loop_fade is None else len(loop_fade)
+    boundary = total - length
+    block = np.empty(frames, dtype=np.float32)
+    filled = 0
+    while filled < frames:
+        if position >= total:
+            position = length
+        if position < boundary:
+            count = min(frames - filled, boundary - position)
+            block[filled:filled + count] = samples[position:position + count]
+        else:
+            count = min(frames - filled, total - position)
+            block[filled:filled + count] = loop_fade[position - boundary:position - boundary + count]
+        filled += count
+        position += count
+    return block, position
@@ -1,20 +1,36 @@
-import sounddevice as sd
+import threading
 
 class DeviceManager:
     def __init__(self, default_device=None):
         self.current_device = None
-        sd.default.samplerate = 44100
-        sd.default.channels = 1
+        self.default_device = default_device
+        self.initialized = False
+        self._init_lock = threading.RLock()
         
-        if default_device is not None:
-            try:
-                self.set_device(default_device)
-            except:
+    def initialize(self):
+        """Initialize PortAudio and select the cached device.
+        
+        Importing sounddevice enumerates every host API and device, so this is
+        deferred until after the window is shown and may run in a background thread.
+        """
+        with self._init_lock:
+            if self.initialized:
+                return
+            import sounddevice as sd
+            sd.default.samplerate = 44100
+            sd.default.channels = 1
+            self.initialized = True
+            
+            if self.default_device is not None:
+                try:
+                    self.set_device(self.default_device)
+                except:
+                    self._ensure_valid_device()
+            else:
                 self._ensure_valid_device()
-        else:
-            self._ensure_valid_device()
             
     def _ensure_valid_device(self):
+        import sounddevice as sd
         devices = self.get_output_devices()
         if not devices:
             raise RuntimeError("No output devices found")
@@ -27,11 +43,31 @@ class DeviceManager:
                 self.current_device = devices[0][0]  # Fallback to first device
             
     def get_output_devices(self):
+        self.initialize()
+        import sounddevice as sd
         devices = sd.query_devices()
         return [(i, device) for i, device in enumerate(devices) 
                 if device['max_output_channels'] > 0]
     
+    def get_input_devices(self):
+        self.initialize()
+        import sounddevice as sd
+        devices = sd.query_devices()
+        return [(i, device) for i, device in enumerate(devices)
+                if device['max_input_channels'] > 0]
+    
+    def get_default_input_device(self):
+        """Index of the system default input, or None if there is none"""
+        self.initialize()
+        import sounddevice as sd
+        try:
+            return sd.query_devices(kind='input')['index']
+        except Exception:
+            return None
+    
     def set_device(self, device_id):
+        self.initialize()
+        import sounddevice as sd
         try:
             # Test if device is valid
             sd.check_output_settings(
@@ -47,6 +83,7 @@ class DeviceManager:
             self._ensure_valid_device()
         
     def get_current_device(self):
+        self.initialize()
         if self.current_device is None:
             self._ensure_valid_device()
         return self.current_device
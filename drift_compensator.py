@@ -0,0 +1,70 @@
+import numpy as np
+
+class DriftCompensator:
+    """
+    Keeps a buffer between two independently clocked devices at a constant fill.
+
+    Two sound cards never run at exactly the same rate, so a buffer between
+    them slowly fills up or runs dry. The fill level is smoothed to follow the
+    trend rather than block jitter, a PI controller turns the error into a
+    resampling ratio limited to max_ppm, and each block is resampled by that
+    ratio with linear interpolation. The fractional read position carries
+    across blocks, so there are no seams between them.
+    """
+
+    def __init__(self, target_fill, sample_rate, max_ppm=1000, time_constant=2.0,
+                 kp=5e-4, ki=5e-5):
+        self.target_fill = target_fill
+        self.sample_rate = sample_rate
+        self.max_ratio_offset = max_ppm * 1e-6
+        self.time_constant = time_constant  # Seconds of fill history in the smoothed level
+        self.kp = kp
+        self.ki = ki
+
+        self.ratio = 1.0  # Output frames per input frame
+        self.smoothed_fill = None
+        self.integral = 0.0
+        self._phase = 1.0  # Read position in [last sample, block...]
+        self._last = 0.0
+
+    @property
+    def ppm(self):
+        return (self.ratio - 1.0) * 1e6
+
+    def update(self, fill, frames):
+        """Adjust the ratio from the current fill level before frames more are queued"""
+        dt = frames / self.sample_rate
+        if self.smoothed_fill is None:
+            self.smoothed_fill = float(fill)
+        else:
+            alpha = min(1.0, dt / self.time_constant)
+            self.smoothed_fill += alpha * (fill - self.smoothed_fill)
+
+        # Too full means the consumer runs slow: produce fewer frames (ratio < 1)
+        error = (self.smoothed_fill - self.target_fill) / self.target_fill
+        self.integral += error * dt
+        # Anti-windup: the integral alone may never push past the ratio limit
+        limit = self.max_ratio_offset / self.ki
+        self.integral = min(max(self.integral, -limit), limit)
+
+        offset = self.kp * error + self.ki * self.integral
+        offset = min(max(offset, -self.max_ratio_offset), self.max_ratio_offset)
+        self.ratio = 1.0 - offset
+
+    def process(self, block, fill):
+        """Return block resampled by the current ratio; fill is the buffer level now"""
+        self.update(fill, len(block))
+
+        frames = len(block)
+        step = 1.0 / self.ratio  # Input frames per output frame
+        count = int((frames - self._phase) / step) + 1
+        positions = self._phase + np.arange(count) * step
+
+        source = np.empty(frames + 1, dtype=np.float32)
+        source[0] = self._last
+        source[1:] = block
+        out = np.interp(positions, np.arange(frames + 1), source).astype(np.float32)
+
+        self._phase = positions[-1] + step - frames
+        self._last = block[-1]
+        return out
@@ -1,9 +1,174 @@
 import subprocess
 import os
 import sys
+import json
 import platform
 import threading
-from pydub import AudioSegment
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+
+# Executables used for decoding and probing; set_ffmpeg_directory points these at a local install
+ffmpeg_executable = "ffmpeg"
+ffprobe_executable = "ffprobe"
+
+# Raw sample formats the decoder can request over the pipe
+PCM_FORMATS = {
+    "f32le": np.float32,
+    "s16le": np.int16,
+}
+
+# Imported files are cached at this rate so high-quality voice mode can read them without resampling
+CACHE_SAMPLE_RATE = 48000
+
+class DecodeError(RuntimeError):
+    """ffmpeg or ffprobe rejected a file, as opposed to failing to run at all"""
+
+def _hidden_process_kwargs(kwargs):
+    """Add the flags that stop ffmpeg from opening console windows"""
+    # Hide console window on Windows
+    if platform.system() == 'Windows':
+        if 'startupinfo' not in kwargs:
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            startupinfo.wShowWindow = 0  # SW_HIDE
+            kwargs['startupinfo'] = startupinfo
+        if 'creationflags' not in kwargs:
+            kwargs['creationflags'] = 0x08000000  # CREATE_NO_WINDOW
+    
+    # Ensure stderr is redirected to prevent console windows
+    if 'stderr' not in kwargs:
+        kwargs['stderr'] = subprocess.PIPE
+    return kwargs
+
+class FFmpegProcessRegistry:
+    """Owns every ffmpeg process the app starts.
+    
+    Children are tracked from spawn until they exit, at most max_processes run
+    at once, conversion jobs share a small pool of reusable worker threads, and
+    shutdown() stops only our own children instead of scanning the whole system.
+    All spawning goes through here; nothing patches subprocess globally.
+    """
+    
+    def __init__(self, max_processes=None):
+        self.max_processes = max_processes or max(2, min(4, (os.cpu_count() or 2) // 2))
+        self._slots = threading.BoundedSemaphore(self.max_processes)
+        self._lock = threading.Lock()
+        self._processes = {}  # process -> whether it holds a concurrency slot
+        self._executor = None
+        self._shutting_down = False
+    
+    def popen(self, command, limit=True, **kwargs):
+        """Start a hidden ffmpeg process and track it.
+        
+        With limit=True this blocks until a concurrency slot is free; the slot is
+        returned by release(), which callers must call once they are done with it.
+        """
+        if limit:
+            self._slots.acquire()
+        try:
+            with self._lock:
+                if self._shutting_down:
+                    raise RuntimeError("ffmpeg registry has been shut down")
+                self._prune_locked()
+                process = subprocess.Popen(command, **_hidden_process_kwargs(kwargs))
+                self._processes[process] = limit
+            return process
+        except Exception:
+            if limit:
+                self._slots.release()
+            raise
+    
+    def release(self, process):
+        """Stop tracking a finished process and free its concurrency slot"""
+        with self._lock:
+            holds_slot = self._processes.pop(process, False)
+        if holds_slot:
+            self._slots.release()
+    
+    @contextmanager
+    def process(self, command, **kwargs):
+        """Context manager around popen() that always kills and releases the process"""
+        process = self.popen(command, **kwargs)
+        try:
+            yield process
+        finally:
+            if process.poll() is None:
+                process.kill()
+            try:
+                process.wait(timeout=1.0)
+            except subprocess.TimeoutExpired:
+                pass
+            self.release(process)
+    
+    def run(self, command, timeout=None, **kwargs):
+        """Run an ffmpeg command to completion, like subprocess.run"""
+        with self.process(command, **kwargs) as process:
+            stdout, stderr = process.communicate(timeout=timeout)
+            return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+    
+    def submit(self, job, *args, **kwargs):
+        """Run a job on the shared worker pool; threads are reused across jobs"""
+        with self._lock:
+            if self._shutting_down:
+                raise RuntimeError("ffmpeg registry has been shut down")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_processes,
+                    thread_name_prefix="ffmpeg-worker"
+                )
+            return self._executor.submit(job, *args, **kwargs)
+    
+    @property
+    def shutting_down(self):
+        """True once shutdown() has started terminating our processes"""
+        return self._shutting_down
+    
+    def active_count(self):
+        """Number of tracked processes that are still running"""
+        with self._lock:
+            self._prune_locked()
+            return len(self._processes)
+    
+    def shutdown(self, timeout=1.0):
+        """Terminate our own ffmpeg children, killing any that outlive the timeout"""
+        with self._lock:
+            self._shutting_down = True
+            processes = [p for p in self._processes if p.poll() is None]
+            executor = self._executor
+            self._executor = None
+        
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        for process in processes:
+            try:
+                process.terminate()
+            except OSError:
+                pass
+        
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            try:
+                process.wait(timeout=max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                try:
+                    process.kill()
+                except OSError:
+                    pass
+        
+        if processes:
+            print(f"[DEBUG] Stopped {len(processes)} ffmpeg process(es)")
+    
+    def _prune_locked(self):
+        """Forget unlimited processes that have already exited"""
+        finished = [p for p, holds_slot in self._processes.items() if not holds_slot and p.poll() is not None]
+        for process in finished:
+            del self._processes[process]
+
+# Shared registry for the whole app
+ffmpeg_registry = FFmpegProcessRegistry()
 
 def run_ffmpeg_command(command, **kwargs):
     """
@@ -11,100 +176,273 @@ def run_ffmpeg_command(command, **kwargs):
     
     Args:
         command: List of command arguments
-        **kwargs: Additional kwargs for subprocess.run
+        **kwargs: Additional kwargs for subprocess.Popen (plus timeout)
     
     Returns:
         CompletedProcess instance
     """
-    startupinfo = None
+    return ffmpeg_registry.run(command, **kwargs)
+
+def set_ffmpeg_directory(directory):
+    """Use the ffmpeg and ffprobe executables from the given directory"""
+    global ffmpeg_executable, ffprobe_executable
+    suffix = ".exe" if platform.system() == 'Windows' else ""
+    ffmpeg_executable = os.path.join(directory, "ffmpeg" + suffix)
+    ffprobe_executable = os.path.join(directory, "ffprobe" + suffix)
+
+def probe_audio(file_path, limit=True):
+    """
+    Read the first audio stream's sample rate, channel count and duration with ffprobe.
     
-    # Hide console window on Windows
-    if platform.system() == 'Windows':
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = 0  # SW_HIDE
+    limit=False runs it without waiting for a concurrency slot, for playback.
     
-    # Ensure stderr is redirected to prevent console windows
-    if 'stderr' not in kwargs:
-        kwargs['stderr'] = subprocess.PIPE
-        
-    # For all platforms, ensure we don't create new console windows
-    if platform.system() == 'Windows':
-        kwargs['creationflags'] = 0x08000000  # CREATE_NO_WINDOW
+    Returns:
+        Dict with sample_rate, channels and duration (seconds, 0 if unknown)
+    """
+    result = run_ffmpeg_command(
+        [
+            ffprobe_executable, "-v", "error",
+            "-select_streams", "a:0",
+            "-show_entries", "stream=sample_rate,channels,duration:format=duration",
+            "-of", "json",
+            str(file_path)
+        ],
+        stdout=subprocess.PIPE,
+        timeout=10,
+        limit=limit
+    )
+    if result.returncode != 0:
+        if ffmpeg_registry.shutting_down:
+            raise RuntimeError(f"ffprobe was stopped while probing {file_path}")
+        raise DecodeError(f"ffprobe failed: {result.stderr.decode(errors='replace').strip()}")
+    
+    try:
+        info = json.loads(result.stdout or b"{}")
+    except ValueError as e:
+        raise DecodeError(f"ffprobe returned unreadable output for {file_path}: {e}")
+    streams = info.get("streams") or [{}]
+    stream = streams[0]
+    duration = stream.get("duration") or info.get("format", {}).get("duration") or 0
+    return {
+        "sample_rate": int(stream.get("sample_rate", 0)),
+        "channels": int(stream.get("channels", 0)),
+        "duration": float(duration)
+    }
+
+def _decode_command(file_path, sample_rate, channels, sample_format, input_format=None):
+    """ffmpeg arguments that write raw PCM for the first audio stream to stdout"""
+    command = [ffmpeg_executable, "-v", "error"]
+    if input_format is None:
+        command += ["-nostdin", "-i", str(file_path)]
+    else:
+        # Audio arrives on stdin, so the demuxer can't probe by name
+        command += ["-f", input_format, "-i", "pipe:0"]
+    return command + [
+        "-map", "0:a:0",
+        "-ac", str(channels),
+        "-ar", str(sample_rate),
+        "-f", sample_format,
+        "pipe:1"
+    ]
 
-    return subprocess.run(command, startupinfo=startupinfo, **kwargs)
+def decode_audio(file_path, sample_rate=None, channels=1, sample_format="f32le", limit=True):
+    """
+    Decode an audio file straight into a NumPy array over an ffmpeg pipe.
+    
+    ffmpeg converts to the requested rate, channel count and raw PCM format and
+    writes to stdout, which is read directly into a preallocated buffer. There
+    are no temp files and, when the duration is known up front, no extra copy.
+    
+    Args:
+        file_path: Path to any file ffmpeg can read
+        sample_rate: Output rate in Hz, or None to keep the source rate
+        channels: Output channel count (ffmpeg downmixes)
+        sample_format: "f32le" (float in [-1, 1]) or "s16le"
+        limit: False for playback decodes, which mustn't queue behind batch
+            conversions for a concurrency slot
+    
+    Returns:
+        Tuple of (samples, sample_rate). samples is 1-D for mono and
+        (frames, channels) otherwise.
+    """
+    dtype = np.dtype(PCM_FORMATS[sample_format])
+    
+    # The probe tells us the native rate and lets us size the buffer exactly
+    info = probe_audio(file_path, limit=limit)
+    if sample_rate is None:
+        sample_rate = info["sample_rate"] or 44100
+    expected_frames = int(info["duration"] * sample_rate) + sample_rate // 10
+    
+    command = _decode_command(file_path, sample_rate, channels, sample_format)
+    
+    buffer = np.empty(max(expected_frames, sample_rate) * channels, dtype=dtype)
+    filled = 0
+    with ffmpeg_registry.process(command, limit=limit, stdout=subprocess.PIPE, bufsize=0) as process:
+        while True:
+            if filled == buffer.nbytes:
+                # Duration was underestimated: grow once by half again
+                grown = np.empty(len(buffer) + len(buffer) // 2, dtype=dtype)
+                grown.view(np.uint8)[:filled] = buffer.view(np.uint8)[:filled]
+                buffer = grown
+            read = process.stdout.readinto(buffer.view(np.uint8)[filled:])
+            if not read:
+                break
+            filled += read
+        
+        stderr = process.stderr.read()
+        process.wait()
+        if process.returncode != 0:
+            if ffmpeg_registry.shutting_down:
+                # Killed by shutdown, not a problem with the file
+                raise RuntimeError(f"ffmpeg was stopped while decoding {file_path}")
+            raise DecodeError(f"ffmpeg failed to decode {file_path}: {stderr.decode(errors='replace').strip()}")
+    
+    frames = filled // (dtype.itemsize * channels)
+    samples = buffer[:frames * channels]
+    if channels > 1:
+        samples = samples.reshape(frames, channels)
+    return samples, sample_rate
 
-def apply_ffmpeg_patches():
-    """Apply all necessary patches to suppress ffmpeg console windows"""
-    # Patch AudioSegment to use our hidden ffmpeg process
-    original_converter = AudioSegment.converter
-    
-    # Save the original subprocess.run function
-    original_run = subprocess.run
-    
-    # Create a patched version of subprocess.run
-    def patched_run(cmd, *args, **kwargs):
-        # If this is an ffmpeg command, use our hidden window version
-        if isinstance(cmd, list) and any('ffmpeg' in str(x).lower() for x in cmd):
-            return run_ffmpeg_command(cmd, *args, **kwargs)
-        # Otherwise use the original run function
-        return original_run(cmd, *args, **kwargs)
-    
-    # Apply the patch
-    subprocess.run = patched_run
-    
-    # Also patch Popen for additional coverage
-    original_popen = subprocess.Popen
-    
-    def patched_popen(cmd, *args, **kwargs):
-        if isinstance(cmd, list) and any('ffmpeg' in str(x).lower() for x in cmd):
-            startupinfo = None
-            if platform.system() == 'Windows':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                startupinfo.wShowWindow = 0  # SW_HIDE
-                kwargs['startupinfo'] = startupinfo
+class DecodeStream:
+    """
+    Progressive mono float32 decode into a preallocated buffer.
+    
+    A reader thread fills samples from the front while the caller already plays
+    what has arrived, so playback of a compressed file starts after the first
+    pipe read instead of after the whole decode. available is the buffer index
+    decoded up to.
+    
+    A stream can also start part way into a FLAC file: source_range is
+    (header_size, byte_offset), and ffmpeg is fed the file's metadata followed
+    by the frames from byte_offset on, filling samples from start_frame.
+    """
+    
+    # Small reads keep available moving so the first block is ready quickly
+    READ_SIZE = 64 * 1024
+    
+    def __init__(self, file_path, sample_rate, total_frames, samples=None, start_frame=0, source_range=None):
+        self.file_path = file_path
+        self.sample_rate = sample_rate
+        self.samples = np.zeros(total_frames, dtype=np.float32) if samples is None else samples
+        self.start_frame = start_frame
+        self.source_range = source_range
+        self.available = start_frame
+        self.error = None
+        self.finished = threading.Event()
+        self.cancelled = False
+        
+        self._thread = threading.Thread(target=self._run, name="decode-stream")
+        self._thread.daemon = True
+        self._thread.start()
+    
+    def wait_for(self, frames, timeout=None):
+        """Wait until samples[:frames] are decoded (or decoding ends); returns whether they are"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.available < frames and not self.finished.is_set():
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            self.finished.wait(0.001)
+        return self.available >= frames
+    
+    def cancel(self):
+        """Stop decoding; the ffmpeg process is killed by the reader thread"""
+        self.cancelled = True
+    
+    def _feed_source(self, stdin):
+        """Write the FLAC header and the frames from the seek offset to ffmpeg"""
+        header_size, byte_offset = self.source_range
+        try:
+            with open(self.file_path, 'rb') as f:
+                stdin.write(f.read(header_size))
+                f.seek(byte_offset)
+                while not self.cancelled:
+                    chunk = f.read(self.READ_SIZE)
+                    if not chunk:
+                        break
+                    stdin.write(chunk)
+        except (BrokenPipeError, ValueError, OSError):
+            # ffmpeg exited or was killed after a cancel
+            pass
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+    
+    def _run(self):
+        if self.source_range is None:
+            command = _decode_command(self.file_path, self.sample_rate, 1, "f32le")
+            stdin = None
+        else:
+            command = _decode_command(self.file_path, self.sample_rate, 1, "f32le", input_format="flac")
+            stdin = subprocess.PIPE
+        try:
+            # Streams feed playback, so they start at once instead of waiting for a slot
+            with ffmpeg_registry.process(command, limit=False, stdin=stdin, stdout=subprocess.PIPE,
+                                         bufsize=0) as process:
+                if stdin is not None:
+                    writer = threading.Thread(target=self._feed_source, args=(process.stdin,), name="decode-feed")
+                    writer.daemon = True
+                    writer.start()
                 
-                # Add creationflags if not present
-                if 'creationflags' not in kwargs:
-                    kwargs['creationflags'] = 0x08000000  # CREATE_NO_WINDOW
-            
-            # Redirect output
-            if 'stderr' not in kwargs:
-                kwargs['stderr'] = subprocess.PIPE
-            if 'stdout' not in kwargs:
-                kwargs['stdout'] = subprocess.PIPE
+                raw = self.samples.view(np.uint8)
+                filled = self.start_frame * 4
+                while filled < raw.nbytes and not self.cancelled:
+                    read = process.stdout.readinto(raw[filled:filled + self.READ_SIZE])
+                    if not read:
+                        break
+                    filled += read
+                    self.available = filled // 4
                 
-        return original_popen(cmd, *args, **kwargs)
-    
-    # Apply the Popen patch
-    subprocess.Popen = patched_popen
+                if not self.cancelled and filled < raw.nbytes and process.wait() != 0:
+                    stderr = process.stderr.read().decode(errors='replace').strip()
+                    raise DecodeError(f"ffmpeg failed to decode {self.file_path}: {stderr}")
+        except Exception as e:
+            print(f"[ERROR] Streaming decode failed: {e}")
+            self.error = e
+        finally:
+            self.finished.set()
 
-def process_audio_in_thread(input_path, output_path, format="wav", callback=None):
+def cache_command(input_path, output_path, format="wav", compression_level=5):
+    """ffmpeg arguments that convert a file into the 48 kHz mono cache format"""
+    command = [
+        ffmpeg_executable, "-y", "-v", "error", "-nostdin",
+        "-i", str(input_path),
+        "-map", "0:a:0",
+        "-ac", "1",
+        "-ar", str(CACHE_SAMPLE_RATE)
+    ]
+    if format == "wav":
+        command += ["-c:a", "pcm_s16le"]
+    elif format == "flac":
+        command += ["-c:a", "flac", "-sample_fmt", "s16", "-compression_level", str(compression_level)]
+    command += ["-f", format, str(output_path)]
+    return command
+
+def process_audio_in_thread(input_path, output_path, format="wav", callback=None, compression_level=5,
+                            post_process=None):
     """
-    Process audio file conversion in a background thread to prevent UI freezing.
+    Process audio file conversion on the ffmpeg worker pool to prevent UI freezing.
     
     Args:
         input_path: Path to source audio file
         output_path: Path where converted file will be saved
-        format: Output audio format
+        format: Output audio format ("wav" or lossless "flac")
         callback: Function to call when conversion completes
+        compression_level: FLAC compression level, 0 (fastest) to 12 (smallest)
+        post_process: Called as post_process(output_path, format) on the worker
+            after a successful conversion and before callback
     """
     def conversion_thread():
         try:
-            # Load audio with hidden ffmpeg process
-            audio = AudioSegment.from_file(input_path)
+            # Convert file to file in a single ffmpeg process, mono for better performance
+            command = cache_command(input_path, output_path, format, compression_level)
+            result = run_ffmpeg_command(command, stdout=subprocess.DEVNULL)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.decode(errors='replace').strip() or "ffmpeg conversion failed")
             
-            # Optimize: convert to mono for better performance
-            if audio.channels > 1:
-                audio = audio.set_channels(1)
-                
-            # Export with optimized settings
-            audio.export(
-                output_path, 
-                format=format,
-                parameters=["-q:a", "0"]  # Use high quality, fast encoding
-            )
+            if post_process:
+                post_process(output_path, format)
             
             if callback:
                 callback(True, None)
@@ -112,8 +450,5 @@ def process_audio_in_thread(input_path, output_path, format="wav", callback=None
             if callback:
                 callback(False, str(e))
     
-    # Run in thread
-    thread = threading.Thread(target=conversion_thread)
-    thread.daemon = True
-    thread.start()
-    return thread
+    # Run on a reused worker thread instead of a new thread per file
+    return ffmpeg_registry.submit(conversion_thread)
@@ -0,0 +1,235 @@
+import re
+import struct
+
+# Metadata block types we care about
+STREAMINFO = 0
+
+# Frame sync: 14 set bits, a reserved 0, then the blocking strategy bit
+FRAME_SYNC = re.compile(b'\xff[\xf8\xf9]')
+
+# Longest possible frame header: sync and codes (4), 7-byte sample number,
+# 16-bit block size, 16-bit sample rate and the CRC-8
+MAX_FRAME_HEADER = 16
+
+# The seek index scans the audio in chunks this size instead of reading the whole file
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+def _make_crc8_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return table
+
+_CRC8_TABLE = _make_crc8_table()
+
+class FlacFormatError(ValueError):
+    """Raised when a file is not a FLAC stream this reader understands"""
+
+class FlacInfo:
+    """STREAMINFO fields plus where the audio frames start"""
+    
+    def __init__(self, sample_rate, channels, bits_per_sample, total_samples,
+                 min_block_size, max_block_size, audio_offset):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bits_per_sample = bits_per_sample
+        self.total_samples = total_samples  # Per channel; 0 if the encoder didn't know
+        self.min_block_size = min_block_size
+        self.max_block_size = max_block_size
+        self.audio_offset = audio_offset  # Byte offset of the first frame
+    
+    @property
+    def frames(self):
+        return self.total_samples
+    
+    @property
+    def duration(self):
+        return self.total_samples / self.sample_rate if self.sample_rate else 0
+
+def _skip_id3(f):
+    """Skip an ID3v2 tag some taggers put before the fLaC marker"""
+    header = f.read(10)
+    if len(header) == 10 and header[:3] == b'ID3':
+        size = 0
+        for byte in header[6:10]:
+            size = (size << 7) | (byte & 0x7F)  # Syncsafe integer
+        f.seek(10 + size)
+    else:
+        f.seek(0)
+
+def is_flac_file(file_path):
+    """Cheap check on the fLaC marker"""
+    try:
+        with open(file_path, 'rb') as f:
+            _skip_id3(f)
+            return f.read(4) == b'fLaC'
+    except OSError:
+        return False
+
+def read_flac_info(file_path):
+    """
+    Parse the metadata blocks at the start of a FLAC file.
+    
+    Returns:
+        FlacInfo instance
+    """
+    with open(file_path, 'rb') as f:
+        _skip_id3(f)
+        if f.read(4) != b'fLaC':
+            raise FlacFormatError(f"Not a FLAC file: {file_path}")
+        
+        info = None
+        while True:
+            block_header = f.read(4)
+            if len(block_header) < 4:
+                raise FlacFormatError(f"Truncated metadata in {file_path}")
+            is_last = block_header[0] & 0x80
+            block_type = block_header[0] & 0x7F
+            length = int.from_bytes(block_header[1:4], 'big')
+            
+            if block_type == STREAMINFO:
+                data = f.read(length)
+                if len(data) < 34:
+                    raise FlacFormatError(f"Truncated STREAMINFO in {file_path}")
+                min_block, max_block = struct.unpack('>HH', data[:4])
+                # 20 bits rate, 3 bits channels-1, 5 bits bps-1, 36 bits total samples
+                packed = int.from_bytes(data[10:18], 'big')
+                sample_rate = packed >> 44
+                channels = ((packed >> 41) & 0x7) + 1
+                bits_per_sample = ((packed >> 36) & 0x1F) + 1
+                total_samples = packed & 0xFFFFFFFFF
+                info = [sample_rate, channels, bits_per_sample, total_samples, min_block, max_block]
+            else:
+                f.seek(length, 1)
+            
+            if is_last:
+                break
+        
+        if info is None or info[0] == 0:
+            raise FlacFormatError(f"No valid STREAMINFO in {file_path}")
+        return FlacInfo(*info, audio_offset=f.tell())
+
+def _crc8(data):
+    crc = 0
+    for byte in data:
+        crc = _CRC8_TABLE[crc ^ byte]
+    return crc
+
+def _parse_frame_header(data, pos, info):
+    """
+    Parse a frame header at pos.
+    
+    Returns (first_sample, block_size) or None if the bytes there aren't a valid
+    header. The header CRC-8 rules out most sync codes that occur inside audio data.
+    """
+    end = len(data)
+    if pos + 6 > end:
+        return None
+    variable = data[pos + 1] & 0x01
+    block_code = data[pos + 2] >> 4
+    rate_code = data[pos + 2] & 0x0F
+    channel_code = data[pos + 3] >> 4
+    if block_code == 0 or rate_code == 0x0F or channel_code > 10 or data[pos + 3] & 0x01:
+        return None
+    
+    # Frame or sample number, UTF-8 style
+    i = pos + 4
+    first = data[i]
+    if first < 0x80:
+        number, extra = first, 0
+    elif 0xC0 <= first < 0xE0:
+        number, extra = first & 0x1F, 1
+    elif 0xE0 <= first < 0xF0:
+        number, extra = first & 0x0F, 2
+    elif 0xF0 <= first < 0xF8:
+        number, extra = first & 0x07, 3
+    elif 0xF8 <= first < 0xFC:
+        number, extra = first & 0x03, 4
+    elif 0xFC <= first < 0xFE:
+        number, extra = first & 0x01, 5
+    elif first == 0xFE:
+        number, extra = 0, 6
+    else:
+        return None
+    i += 1
+    if i + extra > end:
+        return None
+    for _ in range(extra):
+        byte = data[i]
+        if byte & 0xC0 != 0x80:
+            return None
+        number = (number << 6) | (byte & 0x3F)
+        i += 1
+    
+    if block_code == 1:
+        block_size = 192
+    elif block_code <= 5:
+        block_size = 576 << (block_code - 2)
+    elif block_code == 6:
+        if i + 1 > end:
+            return None
+        block_size = data[i] + 1
+        i += 1
+    elif block_code == 7:
+        if i + 2 > end:
+            return None
+        block_size = int.from_bytes(data[i:i + 2], 'big') + 1
+        i += 2
+    else:
+        block_size = 256 << (block_code - 8)
+    
+    if rate_code == 12:
+        i += 1
+    elif rate_code in (13, 14):
+        i += 2
+    
+    if i >= end or _crc8(data[pos:i]) != data[i]:
+        return None
+    first_sample = number if variable else number * info.max_block_size
+    return first_sample, block_size
+
+def build_seek_index(file_path, interval=1.0, info=None):
+    """
+    Find the byte offsets of frames about every interval seconds.
+    
+    Returns:
+        List of [first_sample, byte_offset] pairs, starting with the first frame
+    """
+    if info is None:
+        info = read_flac_info(file_path)
+    
+    points = []
+    step = max(1, int(interval * info.sample_rate))
+    next_point = 0
+    expected = 0  # First sample of the next real frame
+    with open(file_path, 'rb') as f:
+        f.seek(info.audio_offset)
+        base = info.audio_offset  # File offset of data[0]
+        data = b''
+        while True:
+            chunk = f.read(SCAN_CHUNK_SIZE)
+            data += chunk
+            # A header starting in the last few bytes may run into the next chunk,
+            # so those bytes are carried over and searched again with it
+            limit = len(data) if not chunk else len(data) - MAX_FRAME_HEADER + 1
+            for match in FRAME_SYNC.finditer(data):
+                pos = match.start()
+                if pos >= limit:
+                    break
+                header = _parse_frame_header(data, pos, info)
+                # Frames follow each other exactly, which rejects the rare false sync with a good CRC
+                if header is None or header[0] != expected:
+                    continue
+                first_sample, block_size = header
+                if first_sample >= next_point:
+                    points.append([first_sample, base + pos])
+                    next_point = first_sample + step
+                expected = first_sample + block_size
+            if not chunk:
+                return points
+            limit = max(limit, 0)
+            data = data[limit:]
+            base += limit
@@ -0,0 +1,123 @@
+import numpy as np
+
+SLOTS = 32              # Blocks the ring holds; the UI reads at most half of them per frame
+BANDS = 24              # Log-spaced spectrum bands from LOWEST_BAND_HZ to Nyquist
+FFT_SIZE = 1024         # 21 ms at 48 kHz
+SPECTRUM_INTERVAL = 1 / 30  # Seconds between FFTs, about one per display frame
+LOWEST_BAND_HZ = 40
+FLOOR_DB = -90.0
+
+COUNT = 0               # Slot of the state array holding how many blocks were published
+RECORD = 2 + BANDS      # Per block: peak, RMS, band levels in dBFS
+
+def ring_size():
+    """Bytes of state a LevelMeter needs, for sizing a shared-memory block"""
+    return (1 + SLOTS * RECORD) * 8
+
+def to_db(level):
+    return 20 * np.log10(np.maximum(level, 1e-9))
+
+class LevelMeter:
+    """
+    Peak, RMS and spectrum of the output, passed from the audio thread to the UI without locks.
+
+    The audio thread calls publish() with each block it sends; it writes one
+    record into a fixed ring and then bumps a counter, and never waits on
+    the reader. The UI calls read() at display rate, copies only the records
+    written since its last read, and checks the counter again to drop any
+    the writer lapped meanwhile. The spectrum comes from an FFT of the most
+    recent FFT_SIZE samples, taken about once per display frame and reduced
+    to BANDS bands.
+
+    buffer can be shared memory, so a meter written in the engine process
+    is read the same way. One writer per meter.
+    """
+
+    def __init__(self, buffer=None):
+        if buffer is None:
+            buffer = bytearray(ring_size())
+        self._state = np.ndarray(1 + SLOTS * RECORD, dtype=np.float64, buffer=buffer)
+        self._records = self._state[1:].reshape(SLOTS, RECORD)
+        self._read_count = int(self._state[COUNT])
+
+        # Writer side, preallocated so publish() allocates as little as possible
+        self._history = np.zeros(FFT_SIZE, dtype=np.float32)
+        self._window = np.hanning(FFT_SIZE).astype(np.float32)
+        self._spectrum = np.full(BANDS, FLOOR_DB)
+        self._since_spectrum = 0
+        self._band_rate = None
+        self._band_starts = None
+
+    def reset(self):
+        """Start the ring over; only before the writer starts"""
+        self._state[:] = 0
+        self._read_count = 0
+        self._history[:] = 0
+        self._spectrum[:] = FLOOR_DB
+
+    def _band_edges(self, sample_rate):
+        """First FFT bin of each band at sample_rate"""
+        if self._band_rate != sample_rate:
+            bins = FFT_SIZE // 2 + 1
+            edges = np.geomspace(LOWEST_BAND_HZ, sample_rate / 2, BANDS + 1)[:-1]
+            starts = np.round(edges * FFT_SIZE / sample_rate).astype(np.int64)
+            # Low bands narrower than a bin would repeat it; give each its own bin
+            for band in range(1, BANDS):
+                starts[band] = max(starts[band], starts[band - 1] + 1)
+            self._band_starts = np.minimum(starts, bins - 1)
+            self._band_rate = sample_rate
+        return self._band_starts
+
+    def _update_spectrum(self, sample_rate):
+        magnitude = np.abs(np.fft.rfft(self._history * self._window)) * (4.0 / FFT_SIZE)
+        levels = to_db(np.maximum.reduceat(magnitude, self._band_edges(sample_rate)))
+        np.maximum(levels, FLOOR_DB, out=self._spectrum)
+
+    def publish(self, block, sample_rate):
+        """Record one output block (audio thread)"""
+        frames = len(block)
+        if frames == 0:
+            return
+        if frames >= FFT_SIZE:
+            self._history[:] = block[-FFT_SIZE:]
+        else:
+            self._history[:-frames] = self._history[frames:]
+            self._history[-frames:] = block
+        self._since_spectrum += frames
+        if self._since_spectrum >= SPECTRUM_INTERVAL * sample_rate:
+            self._since_spectrum = 0
+            self._update_spectrum(sample_rate)
+
+        count = int(self._state[COUNT])
+        record = self._records[count % SLOTS]
+        record[0] = max(float(block.max()), -float(block.min()))
+        record[1] = np.sqrt(float(np.dot(block, block)) / frames)
+        record[2:] = self._spectrum
+        # Publish only after the record is complete
+        self._state[COUNT] = count + 1
+
+    def read(self):
+        """
+        (peak, rms, spectrum) over the blocks published since the last read,
+        or None if there were none (UI thread).
+
+        peak and rms are linear; spectrum is BANDS levels in dBFS from the
+        latest block.
+        """
+        count = int(self._state[COUNT])
+        new = count - self._read_count
+        if new < 0:
+            # The writer started over
+            self._read_count = count
+            return None
+        if new == 0:
+            return None
+        new = min(new, SLOTS // 2)
+        records = self._records[np.arange(count - new, count) % SLOTS]
+        lapped = int(self._state[COUNT]) - count >= SLOTS - new
+        self._read_count = count
+        if lapped:
+            return None
+        peak = float(records[:, 0].max())
+        rms = float(np.sqrt(np.mean(records[:, 1] ** 2)))
+        return peak, rms, records[-1, 2:]
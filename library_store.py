@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    hash TEXT,
+    duration REAL,
+    play_count INTEGER NOT NULL DEFAULT 0,
+    last_played REAL NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL DEFAULT 0,
+    added REAL NOT NULL DEFAULT 0,
+    fingerprint BLOB,
+    source TEXT,
+    source_mtime REAL
+);
+CREATE INDEX IF NOT EXISTS tracks_hash ON tracks (hash);
+CREATE INDEX IF NOT EXISTS tracks_duration ON tracks (duration);
+CREATE INDEX IF NOT EXISTS tracks_play_count ON tracks (play_count);
+CREATE INDEX IF NOT EXISTS tracks_last_played ON tracks (last_played);
+CREATE INDEX IF NOT EXISTS tracks_source ON tracks (source);
+"""
+
+class LibraryStore:
+    """
+    Library entries in an SQLite database.
+
+    Each change is one small transaction on the row it touches, so adding or
+    removing a file no longer rewrites the whole library. The database runs in
+    WAL mode: readers don't block the writer and a commit only appends to the
+    log instead of rewriting pages in place.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # One connection shared by the UI and background threads, serialized by the lock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only risks the last commits on power loss, never corruption
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._add_missing_columns()
+        self._connection.commit()
+
+    def _add_missing_columns(self):
+        """Bring databases created by older versions up to the current schema"""
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(tracks)")}
+        if "fingerprint" not in columns:
+            self._connection.execute("ALTER TABLE tracks ADD COLUMN fingerprint BLOB")
+        if "source" not in columns:
+            self._connection.execute("ALTER TABLE tracks ADD COLUMN source TEXT")
+            self._connection.execute("ALTER TABLE tracks ADD COLUMN source_mtime REAL")
+
+    def _execute(self, sql, parameters=()):
+        with self._lock:
+            with self._connection:
+                return self._connection.execute(sql, parameters).rowcount
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def paths(self):
+        """All entries as {name: cached file path}"""
+        return dict(self._query("SELECT name, path FROM tracks ORDER BY added, name"))
+
+    def add(self, name, path, size=0, hash=None, duration=None, fingerprint=None, source=None, source_mtime=None):
+        """
+        Add an entry, or point an existing one at a new cached file.
+
+        hash is the SHA-1 of the imported source file; duration (trimmed, in
+        seconds) and fingerprint come from audio_fingerprint. source and
+        source_mtime are set for files imported from a watch folder.
+        """
+        now = time.time()
+        self._execute(
+            "INSERT INTO tracks (name, path, size, hash, duration, fingerprint, source, source_mtime, added, last_played) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET path = excluded.path, size = excluded.size, "
+            "hash = excluded.hash, duration = excluded.duration, fingerprint = excluded.fingerprint, "
+            "source = excluded.source, source_mtime = excluded.source_mtime",
+            (name, str(path), size, hash, duration, fingerprint, source, source_mtime, now, now)
+        )
+
+    def remove(self, *names):
+        """Delete entries; returns how many existed"""
+        if not names:
+            return 0
+        with self._lock:
+            with self._connection:
+                return self._connection.executemany(
+                    "DELETE FROM tracks WHERE name = ?", [(name,) for name in names]
+                ).rowcount
+
+    def record_play(self, name):
+        self._execute(
+            "UPDATE tracks SET play_count = play_count + 1, last_played = ? WHERE name = ?",
+            (time.time(), name)
+        )
+
+    def set_sizes(self, sizes):
+        """Store measured sizes from {name: bytes}, skipping rows that already match"""
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    "UPDATE tracks SET size = ? WHERE name = ? AND size != ?",
+                    [(size, name, size) for name, size in sizes.items()]
+                )
+
+    def set_fingerprint(self, name, duration, fingerprint):
+        """Store an entry's fingerprint; duration 0 with no fingerprint marks one that couldn't be decoded"""
+        self._execute(
+            "UPDATE tracks SET duration = ?, fingerprint = ? WHERE name = ?",
+            (duration, fingerprint, name)
+        )
+
+    def source_of(self, name):
+        """Watch-folder file an entry came from, "" for other imports, None if there's no entry"""
+        rows = self._query("SELECT source FROM tracks WHERE name = ?", (name,))
+        if not rows:
+            return None
+        return rows[0][0] or ""
+
+    def sourced_entries(self):
+        """(name, source, source_mtime) of entries imported from watch folders"""
+        return self._query("SELECT name, source, source_mtime FROM tracks WHERE source IS NOT NULL")
+
+    def find_by_hash(self, hash):
+        """Names of entries imported from a file with this SHA-1"""
+        return [row[0] for row in self._query("SELECT name FROM tracks WHERE hash = ?", (hash,))]
+
+    def fingerprints_near(self, duration, tolerance):
+        """(name, fingerprint) of entries whose trimmed duration is within tolerance seconds"""
+        return self._query(
+            "SELECT name, fingerprint FROM tracks WHERE duration BETWEEN ? AND ? AND fingerprint IS NOT NULL",
+            (duration - tolerance, duration + tolerance)
+        )
+
+    def without_fingerprint(self):
+        """(name, path) of entries that were never fingerprinted, in library order"""
+        return self._query("SELECT name, path FROM tracks WHERE duration IS NULL ORDER BY added, name")
+
+    def import_entries(self, cached_files, usage=None):
+        """
+        Bulk-load entries from the old settings.json library in one transaction.
+
+        Args:
+            cached_files: {name: path} from settings["cached_files"]
+            usage: {name: {"last_played", "size"}} from settings["cache_usage"]
+        """
+        usage = usage or {}
+        now = time.time()
+        rows = []
+        for order, (name, path) in enumerate(cached_files.items()):
+            entry = usage.get(name, {})
+            # Keep the old list order, which followed insertion
+            rows.append((name, str(path), entry.get("size", 0), entry.get("last_played", 0), now + order * 1e-6))
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO tracks (name, path, size, last_played, added) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            try:
+                self._connection.close()
+            except sqlite3.Error as e:
+                print(f"[ERROR] Error closing library database: {e}")
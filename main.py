@@ -1,3 +1,8 @@
+import time
+
+# Taken before any other import so the startup report includes module loading
+STARTUP_TIME = time.perf_counter()
+
 import sys
 import os
 
@@ -14,13 +19,17 @@ def configure_path():
         sys.path.insert(0, script_dir)
 
 if __name__ == "__main__":
+    # The audio engine runs in a spawned process; frozen builds must not start the app again there
+    import multiprocessing
+    multiprocessing.freeze_support()
+    
     # Ensure imports work properly
     configure_path()
     
     # Import and run the audio player app
     try:
         from audio_player import AudioMicPlayer
-        app = AudioMicPlayer()
+        app = AudioMicPlayer(startup_time=STARTUP_TIME)
         app.run()
     except Exception as e:
         import traceback
@@ -0,0 +1,116 @@
+import numpy as np
+from drift_compensator import DriftCompensator
+
+class RingBuffer:
+    """
+    Single-producer, single-consumer ring of float32 frames.
+
+    Each side only advances its own counter, so the render thread can write
+    while a PortAudio callback reads without taking a lock.
+    """
+
+    def __init__(self, capacity):
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.write_count = 0
+        self.read_count = 0
+
+    def available(self):
+        """Frames written but not read yet"""
+        return self.write_count - self.read_count
+
+    def space(self):
+        return self.capacity - self.available()
+
+    def write(self, data):
+        """Append all of data, or nothing if it doesn't fit; returns whether it was written"""
+        frames = len(data)
+        if frames > self.space():
+            return False
+        start = self.write_count % self.capacity
+        first = min(frames, self.capacity - start)
+        self.buffer[start:start + first] = data[:first]
+        self.buffer[:frames - first] = data[first:]
+        self.write_count += frames
+        return True
+
+    def read_into(self, out):
+        """Fill out from the ring, zero-padding what's missing; returns frames read"""
+        frames = min(len(out), self.available())
+        start = self.read_count % self.capacity
+        first = min(frames, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        out[first:frames] = self.buffer[:frames - first]
+        out[frames:] = 0
+        self.read_count += frames
+        return frames
+
+class OutputSink:
+    """
+    One output device fed from its own ring buffer.
+
+    Blocks are rendered once and pushed to every sink; a sink that falls
+    behind drops blocks (overrun) or plays silence (underrun) instead of
+    stalling the others.
+    """
+
+    def __init__(self, name, device, sample_rate, block_size, gain=1.0, buffer_blocks=8,
+                 compensate_drift=False):
+        self.name = name
+        self.device = device
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.gain = gain
+        self.ring = RingBuffer(block_size * buffer_blocks)
+        # Fill level the renderer keeps this sink at
+        self.target_fill = block_size * 3
+        # A sink not driving the render clock drifts against it
+        self.drift = DriftCompensator(self.target_fill, sample_rate) if compensate_drift else None
+        self.underruns = 0
+        self.overruns = 0
+        self.stream = None
+
+    def start(self):
+        import sounddevice as sd
+        print(f"[DEBUG] Opening {self.name} sink on device {self.device} at {self.sample_rate} Hz")
+        self.stream = sd.OutputStream(
+            samplerate=self.sample_rate,
+            blocksize=self.block_size,
+            device=self.device,
+            channels=1,
+            dtype=np.float32,
+            callback=self._callback
+        )
+        self.stream.start()
+
+    def push(self, block):
+        """Queue a rendered block for this device"""
+        if self.drift is not None:
+            block = self.drift.process(block, self.ring.available())
+        if not self.ring.write(block):
+            self.overruns += 1
+
+    def needs_data(self):
+        return self.ring.available() < self.target_fill
+
+    def _callback(self, outdata, frames, time_info, status):
+        out = outdata[:, 0]
+        if self.ring.read_into(out) < frames:
+            self.underruns += 1
+        if self.gain != 1.0:
+            out *= self.gain
+
+    def close(self):
+        if self.stream is None:
+            return
+        try:
+            self.stream.stop()
+            self.stream.close()
+        except Exception as e:
+            print(f"[ERROR] Error closing {self.name} sink: {e}")
+        finally:
+            self.stream = None
+        if self.underruns or self.overruns:
+            print(f"[DEBUG] {self.name} sink: {self.underruns} underruns, {self.overruns} overruns")
+        if self.drift is not None:
+            print(f"[DEBUG] {self.name} sink drift correction: {self.drift.ppm:+.0f} ppm")
@@ -0,0 +1,234 @@
+import random
+import threading
+
+class PlayQueue:
+    """Playback order for library entries, kept separate from the list widgets.
+    
+    Entries are file names. The playback order is a list plus a name -> position
+    index, so next/previous and jumping to any entry are O(1).
+    """
+    
+    REPEAT_ALL = "all"   # Wrap around at the end of the queue
+    REPEAT_ONE = "one"   # Loop the current track
+    REPEAT_OFF = "off"   # Stop after the last track
+    REPEAT_MODES = (REPEAT_ALL, REPEAT_ONE, REPEAT_OFF)
+    
+    def __init__(self, shuffle=False, repeat=REPEAT_ALL):
+        self.entries = []       # Names in list order
+        self.order = []         # Names in playback order (shuffled or not)
+        self.positions = {}     # Name -> index in self.order
+        self.current = None     # Index in self.order of the current track
+        self.shuffle = shuffle
+        self.repeat = repeat if repeat in self.REPEAT_MODES else self.REPEAT_ALL
+    
+    def __len__(self):
+        return len(self.order)
+    
+    def set_entries(self, names, current_name=None):
+        """
+        Replace the queue contents, keeping the current track if it is still present.
+        
+        A shuffled order is kept rather than reshuffled, so searching or an
+        import doesn't change what plays next.
+        """
+        self.entries = list(names)
+        if current_name is None:
+            current_name = self.current_name()
+        if self.shuffle and self.order:
+            self._merge_order(current_name)
+        else:
+            self._rebuild_order(current_name)
+    
+    def set_shuffle(self, enabled):
+        """Turn shuffle on or off; the current track stays current"""
+        self.shuffle = enabled
+        self._rebuild_order(self.current_name())
+    
+    def cycle_repeat(self):
+        """Step through all -> one -> off and return the new mode"""
+        index = self.REPEAT_MODES.index(self.repeat)
+        self.repeat = self.REPEAT_MODES[(index + 1) % len(self.REPEAT_MODES)]
+        return self.repeat
+    
+    def set_current(self, name):
+        """Make name the current track (no-op if it isn't queued)"""
+        self.current = self.positions.get(name)
+    
+    def current_name(self):
+        if self.current is None or self.current >= len(self.order):
+            return None
+        return self.order[self.current]
+    
+    def first(self):
+        return self.order[0] if self.order else None
+    
+    def last(self):
+        return self.order[-1] if self.order else None
+    
+    def peek_next(self, auto=False):
+        """
+        Name of the track after the current one, without moving.
+        
+        Args:
+            auto: True for auto-advance at the end of a track, where repeat-one
+                  replays the current track and repeat-off stops at the end.
+                  Manual next always moves and wraps.
+        """
+        index = self._next_index(auto)
+        return None if index is None else self.order[index]
+    
+    def peek_previous(self):
+        """Name of the track before the current one, without moving"""
+        if not self.order:
+            return None
+        if self.current is None:
+            return self.order[-1]
+        return self.order[(self.current - 1) % len(self.order)]
+    
+    def advance(self, auto=False):
+        """Move to the next track and return its name (None when the queue is done)"""
+        index = self._next_index(auto)
+        if index is not None:
+            self.current = index
+            return self.order[index]
+        return None
+    
+    def go_back(self):
+        """Move to the previous track and return its name"""
+        name = self.peek_previous()
+        if name is not None:
+            self.current = self.positions[name]
+        return name
+    
+    def _next_index(self, auto):
+        if not self.order:
+            return None
+        if self.current is None:
+            return 0
+        if auto and self.repeat == self.REPEAT_ONE:
+            return self.current
+        next_index = self.current + 1
+        if next_index >= len(self.order):
+            if auto and self.repeat == self.REPEAT_OFF:
+                return None
+            next_index = 0
+        return next_index
+    
+    def _merge_order(self, current_name):
+        """Drop removed names from the shuffled order and mix new ones in after the current track"""
+        present = set(self.entries)
+        order = [name for name in self.order if name in present]
+        kept = set(order)
+        added = [name for name in self.entries if name not in kept]
+        if added:
+            random.shuffle(added)
+            split = order.index(current_name) + 1 if current_name in kept else 0
+            upcoming = order[split:]
+            # Random interleave that keeps the upcoming order, weighted so every merge is equally likely
+            merged = []
+            i = j = 0
+            while i < len(upcoming) or j < len(added):
+                if random.randrange(len(upcoming) - i + len(added) - j) < len(added) - j:
+                    merged.append(added[j])
+                    j += 1
+                else:
+                    merged.append(upcoming[i])
+                    i += 1
+            order = order[:split] + merged
+        self.order = order
+        self.positions = {name: index for index, name in enumerate(self.order)}
+        self.current = self.positions.get(current_name)
+    
+    def _rebuild_order(self, current_name):
+        self.order = list(self.entries)
+        if self.shuffle:
+            random.shuffle(self.order)
+            # Keep the playing track first so shuffling never repeats it right away
+            if current_name in self.order:
+                self.order.remove(current_name)
+                self.order.insert(0, current_name)
+        self.positions = {name: index for index, name in enumerate(self.order)}
+        self.current = self.positions.get(current_name)
+
+class TrackPrefetcher:
+    """Decodes the next queued track on a background thread.
+    
+    Only one track is held at a time. Requests are keyed by file path plus the
+    decode settings (voice mode, quality) so a stale decode is never played.
+    """
+    
+    def __init__(self, decode):
+        self.decode = decode  # Callable(file_path, settings_key) -> decoded track
+        self._condition = threading.Condition()
+        self._requested = None  # (file_path, settings_key) waiting to be decoded
+        self._decoding = None   # (file_path, settings_key) being decoded now
+        self._ready = None      # ((file_path, settings_key), track)
+        self._thread = None
+    
+    def prefetch(self, file_path, settings_key):
+        """Ask for a track to be decoded ahead of time"""
+        request = (file_path, settings_key)
+        with self._condition:
+            if request == self._decoding or (self._ready and self._ready[0] == request):
+                return
+            self._requested = request
+            self._ensure_thread()
+            self._condition.notify_all()
+    
+    def take(self, file_path, settings_key, timeout=5.0):
+        """
+        Return the prefetched track if it matches, waiting for an in-flight decode
+        of the same track. Returns None if the track wasn't prefetched.
+        """
+        request = (file_path, settings_key)
+        with self._condition:
+            if request == self._requested and self._decoding is None:
+                # Not started yet; the caller is about to decode it anyway
+                self._requested = None
+            if request == self._decoding:
+                self._condition.wait_for(lambda: self._decoding != request, timeout)
+            if self._ready and self._ready[0] == request:
+                track = self._ready[1]
+                self._ready = None
+                return track
+        return None
+    
+    def clear(self):
+        """Drop any pending or finished prefetch"""
+        with self._condition:
+            self._requested = None
+            self._discard_ready()
+    
+    def _discard_ready(self):
+        # A streamed track still holds a running decoder until it's closed
+        if self._ready is not None:
+            self._ready[1].close()
+            self._ready = None
+    
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="track-prefetch")
+            self._thread.daemon = True
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._requested is not None)
+                request = self._requested
+                self._requested = None
+                self._decoding = request
+            
+            track = None
+            try:
+                print(f"[DEBUG] Prefetching: {request[0]}")
+                track = self.decode(*request)
+            except Exception as e:
+                print(f"[ERROR] Prefetch failed for {request[0]}: {e}")
+            
+            with self._condition:
+                self._decoding = None
+                if track is not None:
+                    self._discard_ready()
+                    self._ready = (request, track)
+                self._condition.notify_all()
@@ -1,12 +1,22 @@
 import customtkinter as ctk
+import os
 from pathlib import Path
 import numpy as np
-from pydub import AudioSegment
 import webbrowser
 import subprocess
+from collections import deque
 from tkinter import messagebox, filedialog
 from audio_file_widget import AudioFileWidget
-from ffmpeg_utils import run_ffmpeg_command, process_audio_in_thread
+from ffmpeg_utils import run_ffmpeg_command, process_audio_in_thread, ffmpeg_registry, DecodeError
+from audio_analysis import prepare_cached_file
+from audio_fingerprint import identify_file, find_duplicate, fingerprint_file, fingerprint_to_bytes
+from cache_metadata import delete_metadata, metadata_path
+from play_queue import PlayQueue
+from triggers import TRIGGER_KEYS
+from crossfade import SHAPE_LABELS
+from watch_folders import install_cached_file
+from region_editor import RegionEditor
+from level_meter import to_db
 
 class PlayerController:
     def __init__(self, app, audio_controller, ui, device_manager, theme_manager):
@@ -16,6 +26,13 @@ class PlayerController:
         self.device_manager = device_manager
         self.theme_manager = theme_manager
         
+        # Playback order lives in the queue, not in the widget list
+        self.queue = PlayQueue(
+            shuffle=self.app.settings.get("shuffle", False),
+            repeat=self.app.settings.get("repeat_mode", PlayQueue.REPEAT_ALL)
+        )
+        self.audio_controller.is_looping = self.queue.repeat == PlayQueue.REPEAT_ONE
+        
         # Set initial state for loop functionality
         self.is_looping = self.audio_controller.is_looping
         
@@ -23,6 +40,13 @@ class PlayerController:
         self.ui.volume_slider.set(self.audio_controller.volume)
         self.ui.sidebar_vol_slider.set(self.audio_controller.volume)
         
+        # Show the restored shuffle and repeat modes
+        self.update_loop_button()
+        self.update_shuffle_button()
+        
+        # Colors that follow playback state are repainted here after a theme change
+        self.theme_manager.add_listener(self.apply_theme_state)
+        
     def update_global_progress(self):
         """Update the global progress bar and time information with reduced updates for better performance"""
         try:
@@ -66,6 +90,7 @@ class PlayerController:
                     if self.ui.current_song_label.cget("text") != file_name:
                         self.ui.current_song_label.configure(text=file_name)
                         self.update_playing_highlight()
+                        self.on_track_changed(file_name)
             else:
                 # Reset time display when nothing is playing
                 if self.ui.time_elapsed.cget("text") != "0:00":
@@ -85,6 +110,37 @@ class PlayerController:
             # Reschedule even on error
             self.app.callback_timer_id = self.app.window.after(1000, self.update_global_progress)
     
+    def update_meters(self):
+        """Redraw the output meter from what the audio threads published since the last frame"""
+        try:
+            peak = rms = 0.0
+            spectrum = None
+            # Each stream sending audio has its own meter; show them combined
+            for meter in self.audio_controller.level_meters():
+                reading = meter.read()
+                if reading is None:
+                    continue
+                peak, rms = max(peak, reading[0]), max(rms, reading[1])
+                spectrum = reading[2] if spectrum is None else np.maximum(spectrum, reading[2])
+            self.ui.draw_meter(float(to_db(peak)), float(to_db(rms)), spectrum)
+        except Exception as e:
+            print(f"[ERROR] Error updating meters: {e}")
+        # About 30 frames per second
+        self.app.meter_timer_id = self.app.window.after(33, self.update_meters)
+    
+    def apply_theme_state(self):
+        """Repaint the state-dependent colors with the new theme"""
+        self.update_loop_button()
+        self.update_shuffle_button()
+        playing = self.audio_controller.is_playing and not self.audio_controller.is_paused
+        self.ui.play_pause_btn.configure(
+            fg_color=self.theme_manager.get_color("accent_secondary") if playing
+            else self.theme_manager.get_color("accent_primary")
+        )
+        self.update_playing_highlight()
+        for widget in self.get_file_widgets():
+            widget.update_trigger_button()
+    
     def update_playing_highlight(self):
         """Ensure the currently playing track is highlighted in the list with safety checks"""
         try:
@@ -133,10 +189,11 @@ class PlayerController:
             self.ui.play_pause_btn.configure(text="⏸")
         else:
             # Play first track if nothing is selected
-            widgets = self.get_file_widgets()
-            if widgets:
-                print(f"[DEBUG] Playing first track: {widgets[0].file_name}")
-                widgets[0].toggle_play()
+            widget = self.get_queue_widget(self.queue.first())
+            if widget:
+                print(f"[DEBUG] Playing first track: {widget.file_name}")
+                self.queue.set_current(widget.file_name)
+                widget.toggle_play()
                 self.ui.play_pause_btn.configure(text="⏸")
             else:
                 print("[DEBUG] No tracks available to play")
@@ -188,24 +245,70 @@ class PlayerController:
         self.toggle_global_mute()
     
     def toggle_global_loop(self):
-        """Toggle loop state for current track"""
-        self.audio_controller.is_looping = not self.audio_controller.is_looping
+        """Cycle the repeat mode: all -> one (loop current track) -> off"""
+        repeat = self.queue.cycle_repeat()
+        self.audio_controller.is_looping = repeat == PlayQueue.REPEAT_ONE
         self.is_looping = self.audio_controller.is_looping  # Keep local state in sync
         
-        # Update loop button appearance
-        self.ui.loop_btn.configure(
-            fg_color=self.theme_manager.get_color("accent_primary") if self.audio_controller.is_looping 
-            else self.theme_manager.get_color("button_bg")
-        )
+        self.update_loop_button()
         
         # Update loop state in current widget if exists
         if self.audio_controller.current_widget:
             self.audio_controller.current_widget.is_looping = self.audio_controller.is_looping
             self.audio_controller.current_widget.update_loop_button()
+        
+        self.app.settings["repeat_mode"] = repeat
+        self.app.config_manager.save_settings(self.app.settings, "repeat_mode")
+        
+        # What comes next may have changed
+        self.prefetch_next()
+    
+    def update_loop_button(self):
+        """Show the repeat mode on the loop button"""
+        repeat = self.queue.repeat
+        self.ui.loop_btn.configure(
+            text="🔂" if repeat == PlayQueue.REPEAT_ONE else "🔁",
+            fg_color=self.theme_manager.get_color("accent_primary") if repeat == PlayQueue.REPEAT_ONE
+            else self.theme_manager.get_color("button_bg"),
+            text_color=self.theme_manager.get_color("text_secondary") if repeat == PlayQueue.REPEAT_OFF
+            else self.theme_manager.get_color("text_primary")
+        )
+    
+    def toggle_shuffle(self):
+        """Toggle shuffled playback order"""
+        self.queue.set_shuffle(not self.queue.shuffle)
+        self.update_shuffle_button()
+        
+        self.app.settings["shuffle"] = self.queue.shuffle
+        self.app.config_manager.save_settings(self.app.settings, "shuffle")
+        self.prefetch_next()
+    
+    def update_shuffle_button(self):
+        """Highlight the shuffle button while shuffle is on"""
+        self.ui.shuffle_btn.configure(
+            fg_color=self.theme_manager.get_color("accent_primary") if self.queue.shuffle
+            else self.theme_manager.get_color("button_bg")
+        )
+    
+    def on_track_changed(self, file_name):
+        """Keep the queue in step with the playing track and start decoding the next one"""
+        self.queue.set_current(file_name)
+        self.app.cache_manager.record_play(file_name)
+        self.prefetch_next()
+    
+    def prefetch_next(self):
+        """Decode the track that auto-advance will play next in the background"""
+        next_name = self.queue.peek_next(auto=True)
+        if next_name is None or next_name not in self.app.settings["cached_files"]:
+            return
+        self.audio_controller.prefetcher.prefetch(
+            self.app.settings["cached_files"][next_name],
+            self.audio_controller.decode_settings()
+        )
     
     def on_audio_ended(self, widget):
         """Called when audio playback ends"""
-        print(f"[DEBUG] Audio ended, loop state: {self.is_looping}, track: {widget.file_name}")
+        print(f"[DEBUG] Audio ended, repeat mode: {self.queue.repeat}, track: {widget.file_name}")
         
         try:
             if self.audio_controller.is_looping:
@@ -215,7 +318,8 @@ class PlayerController:
             else:
                 # Auto-play next track
                 print(f"[DEBUG] Auto-playing next track after: {widget.file_name}")
-                self.next_track()
+                self.queue.set_current(widget.file_name)
+                self.play_queue_entry(self.queue.advance(auto=True))
         except Exception as e:
             print(f"[ERROR] Error in on_audio_ended: {e}")
     
@@ -224,47 +328,49 @@ class PlayerController:
         return [w for w in self.ui.files_list.winfo_children() 
                 if isinstance(w, AudioFileWidget)]
     
-    def previous_track(self):
-        """Play the previous track in the list"""
-        widgets = self.get_file_widgets()
-        if not widgets:
+    def get_queue_widget(self, file_name):
+        """Widget for a queued entry, or None if it isn't shown or was destroyed"""
+        widget = self.app.file_widgets.get(file_name) if file_name else None
+        if widget is not None and hasattr(widget, 'winfo_exists') and widget.winfo_exists():
+            return widget
+        return None
+    
+    def play_queue_entry(self, file_name):
+        """Start playing a queue entry from the beginning"""
+        widget = self.get_queue_widget(file_name)
+        if widget is None:
+            print("[DEBUG] End of queue")
             return
-            
-        if self.audio_controller.current_widget in widgets:
-            current_index = widgets.index(self.audio_controller.current_widget)
-            prev_index = (current_index - 1) % len(widgets)
-            widgets[prev_index].toggle_play()
-        else:
-            widgets[-1].toggle_play()  # Play the last track
+        
+        print(f"[DEBUG] Playing queued track: {file_name}")
+        # The current track isn't stopped here: toggle_play crossfades from it or stops it
+        if widget.is_playing:
+            # Already current but paused: restart rather than resume
+            widget.is_playing = False
+        widget.toggle_play()
+    
+    def previous_track(self):
+        """Play the previous track in the queue"""
+        self._sync_queue_with_current()
+        self.play_queue_entry(self.queue.go_back())
     
     def next_track(self):
-        """Play the next track in the list with safety checks"""
-        widgets = self.get_file_widgets()
-        if not widgets:
+        """Play the next track in the queue with safety checks"""
+        if not len(self.queue):
             print("[DEBUG] No tracks available to play next")
             return
-        
-        # Make sure the current widget is actually valid
+        self._sync_queue_with_current()
+        self.play_queue_entry(self.queue.advance())
+    
+    def _sync_queue_with_current(self):
+        """Point the queue at the playing track, dropping it if its widget is gone"""
         current_widget = self.audio_controller.current_widget
         if current_widget and (not hasattr(current_widget, 'winfo_exists') or not current_widget.winfo_exists()):
             print("[DEBUG] Current widget no longer exists")
-            current_widget = None
             self.audio_controller.current_widget = None
-            
-        if current_widget in widgets:
-            current_index = widgets.index(current_widget)
-            next_index = (current_index + 1) % len(widgets)
-            print(f"[DEBUG] Playing next track: {widgets[next_index].file_name}")
-            
-            # Stop current track first to ensure clean state
-            if self.audio_controller.is_playing:
-                self.audio_controller.stop()
-                
-            # Play next track
-            widgets[next_index].toggle_play()
-        else:
-            print(f"[DEBUG] No current track - playing first: {widgets[0].file_name}")
-            widgets[0].toggle_play()  # Play the first track
+            current_widget = None
+        if current_widget:
+            self.queue.set_current(current_widget.file_name)
     
     def refresh_devices(self):
         """Refresh the list of audio output devices"""
@@ -278,6 +384,174 @@ class PlayerController:
             if device_str.startswith(str(current_device)):
                 self.ui.device_menu.set(device_str)
                 break
+        
+        # Monitor choices are the same outputs
+        self.ui.monitor_device_menu.configure(values=["Off"] + device_list)
+        monitor_device = self.audio_controller.monitor_device
+        self.ui.monitor_device_menu.set("Off")
+        for device_str in device_list:
+            if monitor_device is not None and device_str.startswith(f"{monitor_device}:"):
+                self.ui.monitor_device_menu.set(device_str)
+                break
+        
+        # Microphones for passthrough
+        inputs = self.device_manager.get_input_devices()
+        input_list = ["Default"] + [f"{i}: {device['name']}" for i, device in inputs]
+        self.ui.input_device_menu.configure(values=input_list)
+        input_device = self.audio_controller.input_device
+        self.ui.input_device_menu.set("Default")
+        for device_str in input_list:
+            if input_device is not None and device_str.startswith(f"{input_device}:"):
+                self.ui.input_device_menu.set(device_str)
+                break
+    
+    def on_monitor_device_change(self, selection):
+        """Change (or turn off) the device that monitors the output"""
+        device_id = None if selection == "Off" else int(selection.split(':')[0])
+        print(f"Selecting monitor device: {device_id}")
+        self.audio_controller.set_monitor_device(device_id)
+        
+        self.app.settings["monitor_device"] = device_id
+        self.app.config_manager.save_settings(self.app.settings, "monitor_device")
+    
+    def set_monitor_gain(self, value):
+        """Set the monitor level independently of what's sent to the main output"""
+        self.audio_controller.set_monitor_gain(float(value))
+        self.app.settings["monitor_gain"] = float(value)
+        self.app.config_manager.save_settings(self.app.settings, "monitor_gain")
+    
+    def assign_trigger(self, file_name):
+        """Ask for the key that triggers a clip instantly (empty clears it)"""
+        current = next((key for key, name in self.app.settings["triggers"].items() if name == file_name), "")
+        dialog = ctk.CTkInputDialog(
+            title="Trigger Key",
+            text=f"Key that plays \"{file_name}\" instantly ({TRIGGER_KEYS[0]}-{TRIGGER_KEYS[-1]}).\n"
+                 f"Current: {current or 'none'}. Leave empty to clear."
+        )
+        answer = dialog.get_input()
+        if answer is None:
+            return
+        key = answer.strip().upper()
+        if key and key not in TRIGGER_KEYS:
+            messagebox.showerror("Error", f"Trigger keys are {TRIGGER_KEYS[0]} to {TRIGGER_KEYS[-1]}.")
+            return
+        self.set_trigger_key(file_name, key or None)
+    
+    def set_trigger_key(self, file_name, key):
+        """Assign (or with None, clear) a clip's trigger key and re-arm the trigger bank"""
+        triggers = {k: name for k, name in self.app.settings["triggers"].items() if name != file_name}
+        if key is not None:
+            triggers[key] = file_name  # A key plays one clip, so this replaces any earlier owner
+        self.app.settings["triggers"] = triggers
+        self.app.config_manager.save_settings(self.app.settings, "triggers")
+        
+        self.app.shortcuts.bind_triggers()
+        self.rearm_triggers()
+        
+        # Refresh the key shown on each row
+        trigger_keys = {name: k for k, name in triggers.items()}
+        for name, widget in self.app.file_widgets.items():
+            assigned = trigger_keys.get(name)
+            if widget.trigger_key != assigned:
+                widget.trigger_key = assigned
+                widget.update_trigger_button()
+    
+    def edit_regions(self, file_name):
+        """Open the in/out points and regions editor for an entry"""
+        widget = self.app.file_widgets.get(file_name)
+        if widget is not None:
+            RegionEditor(self.app.window, widget, self.on_regions_changed)
+    
+    def on_regions_changed(self, file_name):
+        """Apply edited in/out points: decodes prepared with the old bounds are dropped"""
+        self.audio_controller.prefetcher.clear()
+        widget = self.app.file_widgets.get(file_name)
+        if widget is not None:
+            widget.refresh_duration()
+        if file_name in self.app.settings.get("triggers", {}).values():
+            self.rearm_triggers()
+    
+    def rearm_triggers(self):
+        """Preload trigger clips again after assignments, rate or device changed"""
+        self.app.trigger_bank.arm(self.app.settings["triggers"], self.app.settings["cached_files"])
+    
+    def toggle_engine_process(self):
+        """Move playback into (or out of) the separate audio engine process"""
+        enabled = self.ui.engine_process_var.get()
+        if enabled == (self.audio_controller.engine is not None):
+            return
+        
+        if not self.audio_controller.set_engine_process(enabled):
+            messagebox.showerror("Error", "Could not start the separate audio process.")
+            enabled = False
+            self.ui.engine_process_var.set(False)
+        
+        self.app.settings["engine_process"] = enabled
+        self.app.config_manager.save_settings(self.app.settings, "engine_process")
+    
+    def toggle_mic_passthrough(self):
+        """Open or close the full-duplex stream that mixes the microphone with clips"""
+        enabled = self.ui.passthrough_var.get()
+        if enabled == (self.audio_controller.duplex_stream is not None):
+            return
+        
+        if not self.audio_controller.set_passthrough(enabled):
+            messagebox.showerror(
+                "Error",
+                "Could not open the microphone together with the output device.\n\n"
+                "Check the selected input device, or pick a different output device."
+            )
+            enabled = False
+            self.ui.passthrough_var.set(False)
+        
+        self.app.settings["mic_passthrough"] = enabled
+        self.app.config_manager.save_settings(self.app.settings, "mic_passthrough")
+    
+    def on_input_device_change(self, selection):
+        """Change the microphone used for passthrough"""
+        device_id = None if selection == "Default" else int(selection.split(':')[0])
+        print(f"Selecting input device: {device_id}")
+        self.audio_controller.set_input_device(device_id)
+        
+        self.app.settings["input_device"] = device_id
+        self.app.config_manager.save_settings(self.app.settings, "input_device")
+    
+    def set_mic_gain(self, value):
+        """Set the microphone level in the passthrough mix"""
+        self.audio_controller.mic_gain = float(value)
+        self.ui.mic_gain_label.configure(text=f"{int(float(value) * 100)}%")
+        self.app.settings["mic_gain"] = float(value)
+        self.app.config_manager.save_settings(self.app.settings, "mic_gain")
+    
+    def set_playback_speed(self, value):
+        """Change playback speed live, keeping pitch"""
+        speed = round(float(value), 2)
+        self.audio_controller.set_time_pitch(speed, self.audio_controller.shifter.semitones)
+        self.ui.speed_label.configure(text=f"{speed:.2f}x")
+        self.app.settings["playback_speed"] = speed
+        self.app.config_manager.save_settings(self.app.settings, "playback_speed")
+    
+    def set_pitch(self, value):
+        """Change playback pitch live in semitones, keeping speed"""
+        semitones = int(round(float(value)))
+        self.audio_controller.set_time_pitch(self.audio_controller.shifter.speed, semitones)
+        self.ui.pitch_label.configure(text=f"{semitones:+d} st")
+        self.app.settings["pitch_semitones"] = semitones
+        self.app.config_manager.save_settings(self.app.settings, "pitch_semitones")
+    
+    def on_crossfade_change(self, selection):
+        """Pick the crossfade curve, or turn crossfades off"""
+        shape = next(shape for shape, label in SHAPE_LABELS.items() if label == selection)
+        self.audio_controller.set_crossfade(shape)
+        self.app.settings["crossfade_shape"] = shape
+        self.app.config_manager.save_settings(self.app.settings, "crossfade_shape")
+    
+    def reset_time_pitch(self):
+        """Back to normal speed and pitch"""
+        self.ui.speed_slider.set(1.0)
+        self.ui.pitch_slider.set(0)
+        self.set_playback_speed(1.0)
+        self.set_pitch(0)
     
     def on_device_change(self, selection):
         """Change the output audio device"""
@@ -290,10 +564,11 @@ class PlayerController:
             
             # Save to settings immediately
             self.app.settings["last_device"] = device_id
-            self.app.config_manager.save_settings(self.app.settings)
+            self.app.config_manager.save_settings(self.app.settings, "last_device")
             
             # Restart any active playback with new device
             self.audio_controller.restart_playback()
+            self.app.trigger_bank.open_stream()
             
             print(f"Current device after selection: {self.device_manager.get_current_device()}")
         except Exception as e:
@@ -335,22 +610,63 @@ class PlayerController:
         # Show a loading indicator or status message
         loading_label = ctk.CTkLabel(
             self.ui.files_list,
-            text=f"Converting {file_name}...",
+            text=f"Checking {file_name}...",
             fg_color=self.theme_manager.get_color("bg_secondary"),
             corner_radius=6
         )
         loading_label.pack(fill="x", padx=5, pady=3)
         self.ui.files_list.update()  # Force UI update to show loading message
         
+        # Fingerprint before converting, so a duplicate costs a cheap 8 kHz decode instead of a conversion
+        library = self.app.config_manager.library
+        def identify():
+            try:
+                identity = identify_file(file_path)
+                duplicate = find_duplicate(library, identity)
+            except Exception as e:
+                print(f"[ERROR] Could not fingerprint {file_name}: {e}")
+                identity, duplicate = None, (None, None)
+            self.app.window.after(
+                0, lambda: self.import_identified(file_path, file_name, cache_path, loading_label, identity, duplicate)
+            )
+        ffmpeg_registry.submit(identify)
+    
+    def import_identified(self, file_path, file_name, cache_path, loading_label, identity, duplicate):
+        """Ask about a duplicate if one was found, then convert the file into the cache"""
+        existing_name, kind = duplicate
+        if existing_name is not None:
+            how = "is identical to" if kind == "identical" else "sounds the same as"
+            if not messagebox.askyesno(
+                "Duplicate Audio",
+                f"'{file_name}' {how} '{existing_name}', which is already in your library.\n\n"
+                "Import it anyway?"
+            ):
+                print(f"Skipped {file_name}, duplicate of {existing_name}")
+                loading_label.destroy()
+                return
+        
+        loading_label.configure(text=f"Converting {file_name}...")
+        fields = {}
+        if identity is not None:
+            fields = {
+                "hash": identity.file_hash,
+                "duration": identity.duration,
+                "fingerprint": identity.fingerprint_bytes()
+            }
+        
         # Process the file in a background thread
         def on_conversion_complete(success, error_msg):
+            # Runs on the ffmpeg worker; the library and widgets are updated on the UI thread
+            self.app.window.after(0, lambda: finish_import(success, error_msg))
+        
+        def finish_import(success, error_msg):
             # Remove loading indicator
             loading_label.destroy()
             
             if success:
                 print("File cached successfully")
-                self.app.settings["cached_files"][file_name] = cache_path
-                self.app.config_manager.save_settings(self.app.settings)
+                self.app.config_manager.add_library_entry(self.app.settings, file_name, cache_path, **fields)
+                self.app.cache_manager.schedule_collect()
                 self.update_file_list()
                 print("=== Audio file added successfully ===\n")
             else:
@@ -364,10 +680,50 @@ class PlayerController:
         process_audio_in_thread(
             input_path=file_path,
             output_path=cache_path,
-            format="wav",
-            callback=on_conversion_complete
+            format=self.app.settings.get("cache_codec", "wav"),
+            callback=on_conversion_complete,
+            compression_level=self.app.settings.get("flac_compression_level", 5),
+            post_process=prepare_cached_file
         )
     
+    def fingerprint_library(self):
+        """
+        Fingerprint entries imported before duplicate detection existed, in the background.
+        
+        Entries go to the worker pool one at a time, each submitted when the
+        previous one is done, so imports queued meanwhile run first. An entry
+        ffmpeg can't decode is stored with duration 0 and no fingerprint, so it
+        isn't retried on every start; other failures (a file briefly locked,
+        shutdown) leave it to be retried on the next start.
+        """
+        library = self.app.config_manager.library
+        def fingerprint_next(entries):
+            if entries is None:
+                entries = deque(library.without_fingerprint())
+                if entries:
+                    print(f"[DEBUG] Fingerprinting {len(entries)} library entries")
+            if not entries:
+                return
+            name, path = entries.popleft()
+            try:
+                # A locked or unreadable file raises OSError here instead of
+                # reaching ffmpeg as a decode error
+                with open(path, 'rb'):
+                    pass
+                fingerprint, duration = fingerprint_file(path)
+                library.set_fingerprint(name, duration, fingerprint_to_bytes(fingerprint))
+            except DecodeError as e:
+                print(f"[ERROR] Could not fingerprint {name}: {e}")
+                library.set_fingerprint(name, 0, None)
+            except Exception as e:
+                print(f"[ERROR] Could not fingerprint {name}, will retry next start: {e}")
+            try:
+                ffmpeg_registry.submit(fingerprint_next, entries)
+            except RuntimeError:
+                # Shutting down; the rest are picked up on the next start
+                pass
+        ffmpeg_registry.submit(fingerprint_next, None)
+    
     def update_file_list(self):
         """Update the list of audio files in the UI with improved performance"""
         print("[DEBUG] Updating file list")
@@ -383,55 +739,158 @@ class PlayerController:
         if search_text:
             print(f"[DEBUG] Filtering by search: '{search_text}'")
         
-        # Verify cache files exist before adding to UI
-        valid_files = {}
+        # Existence is checked once in the background by ConfigManager.validate_library_async,
+        # which removes missing entries through apply_library_validation
+        visible_files = {}
         for file_name, file_path in self.app.settings["cached_files"].items():
             # Apply search filter if needed
             if search_text and search_text not in file_name.lower():
                 continue
-                
-            # Check if file actually exists
-            path_obj = Path(file_path)
-            if path_obj.exists():
-                valid_files[file_name] = file_path
-            else:
-                # File was deleted or moved, remove from settings
-                print(f"[DEBUG] Removing missing file from cache: {file_name}")
-                del self.app.settings["cached_files"][file_name]
-                
-        # Save cleaned up settings
-        if len(valid_files) != len(self.app.settings["cached_files"]):
-            self.app.config_manager.save_settings(self.app.settings)
-        
-        # Add each valid file as an AudioFileWidget
-        print(f"[DEBUG] Adding {len(valid_files)} files to UI")
-        for file_name, file_path in valid_files.items():
-            file_widget = AudioFileWidget(
-                self.ui.files_list,
-                file_name,
-                file_path,
-                self.remove_file,
-                self.audio_controller,
-                fg_color=self.theme_manager.get_color("bg_secondary"),
-                corner_radius=6
-            )
-            file_widget.pack(fill="x", padx=5, pady=3)
-            
-            # Set the loop state to match the global state
-            file_widget.is_looping = self.audio_controller.is_looping
-            
-            self.app.file_widgets[file_name] = file_widget
-            
+            visible_files[file_name] = file_path
+        
+        # Add each visible file as an AudioFileWidget
+        print(f"[DEBUG] Adding {len(visible_files)} files to UI")
+        trigger_keys = {file_name: key for key, file_name in self.app.settings.get("triggers", {}).items()}
+        for file_name, file_path in visible_files.items():
+            self.app.file_widgets[file_name] = self._create_file_widget(file_name, file_path, trigger_keys.get(file_name))
+        
+        # The queue follows the visible list order
+        self._sync_queue_entries()
+        
         print("[DEBUG] File list updated successfully")
     
+    def _create_file_widget(self, file_name, file_path, trigger_key=None):
+        """Create and pack the row for one library entry"""
+        file_widget = AudioFileWidget(
+            self.ui.files_list,
+            file_name,
+            file_path,
+            self.remove_file,
+            self.audio_controller,
+            self.theme_manager,
+            trigger_key=trigger_key,
+            on_assign_trigger=self.assign_trigger,
+            on_edit_regions=self.edit_regions,
+            fg_color=self.theme_manager.get_color("bg_secondary"),
+            corner_radius=6
+        )
+        file_widget.pack(fill="x", padx=5, pady=3)
+        
+        # Set the loop state to match the global state
+        file_widget.is_looping = self.audio_controller.is_looping
+        return file_widget
+    
+    def _sync_queue_entries(self):
+        """Point the queue at the rows currently shown, in list order"""
+        current_widget = self.audio_controller.current_widget
+        self.queue.set_entries(
+            list(self.app.file_widgets.keys()),
+            current_widget.file_name if current_widget else None
+        )
+    
+    def add_watch_folder(self):
+        """Pick a folder to import from automatically, or stop watching one that already is"""
+        folder = filedialog.askdirectory(title="Watch Folder")
+        if not folder:
+            return
+        folder = os.path.abspath(folder)
+        folders = list(self.app.settings.get("watch_folders", []))
+        if folder in folders:
+            if not messagebox.askyesno(
+                "Watch Folder",
+                f"Stop watching '{folder}'?\n\nFiles already imported from it stay in your library."
+            ):
+                return
+            folders.remove(folder)
+        else:
+            folders.append(folder)
+        self.app.settings["watch_folders"] = folders
+        self.app.config_manager.save_settings(self.app.settings, "watch_folders")
+        self.start_watching()
+    
+    def start_watching(self):
+        """(Re)start importing from the configured watch folders"""
+        self.app.watch_importer.start(self.app.settings.get("watch_folders", []))
+    
+    def on_watch_import(self, file_name, temp_path, cache_path, fields):
+        """Swap in a file converted from a watch folder, touching only its own row"""
+        widget = self.get_queue_widget(file_name)
+        if widget is not None and widget == self.audio_controller.current_widget:
+            self.stop_global_playback()
+        # A decode of the old file may be waiting to play next, or kept for replaying
+        self.audio_controller.prefetcher.clear()
+        self.audio_controller.release_track(cache_path)
+        try:
+            install_cached_file(temp_path, cache_path)
+        except OSError as e:
+            print(f"[ERROR] Could not install {file_name}: {e}")
+            # .part files aren't audio the cache GC knows about, so clean up here
+            for leftover in (temp_path, metadata_path(temp_path)):
+                try:
+                    os.remove(leftover)
+                except OSError:
+                    pass
+            return
+        
+        self.app.config_manager.add_library_entry(self.app.settings, file_name, cache_path, **fields)
+        self.app.cache_manager.schedule_collect()
+        if file_name in self.app.settings.get("triggers", {}).values():
+            self.rearm_triggers()
+        
+        if widget is not None:
+            # Same cached path, new content: only the duration shown can change
+            widget.refresh_duration()
+            return
+        search_text = self.ui.search_var.get().lower()
+        if search_text and search_text not in file_name.lower():
+            return
+        trigger_keys = {name: key for key, name in self.app.settings.get("triggers", {}).items()}
+        self.app.file_widgets[file_name] = self._create_file_widget(file_name, cache_path, trigger_keys.get(file_name))
+        self._sync_queue_entries()
+    
+    def on_watch_remove(self, file_name):
+        """Drop an entry whose watch-folder source was deleted, touching only its own row"""
+        widget = self.app.file_widgets.pop(file_name, None)
+        if widget is not None:
+            if widget == self.audio_controller.current_widget:
+                self.stop_global_playback()
+            widget.destroy()
+        
+        cache_path = self.app.settings["cached_files"].get(file_name)
+        if cache_path is not None:
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            delete_metadata(cache_path)
+        self.app.config_manager.remove_library_entries(self.app.settings, file_name)
+        if file_name in self.app.settings.get("triggers", {}).values():
+            self.set_trigger_key(file_name, None)
+        self._sync_queue_entries()
+    
+    def apply_library_validation(self, valid_names, missing_names):
+        """Drop entries that background validation found missing, without rebuilding the list"""
+        if not missing_names:
+            return
+        
+        for file_name in missing_names:
+            print(f"[DEBUG] Removing missing file from cache: {file_name}")
+            widget = self.app.file_widgets.pop(file_name, None)
+            if widget is not None:
+                if widget == self.audio_controller.current_widget:
+                    self.stop_global_playback()
+                widget.destroy()
+        
+        self.app.config_manager.remove_library_entries(self.app.settings, *missing_names)
+    
     def remove_file(self, file_name):
         """Remove an audio file from the player"""
         if file_name in self.app.settings["cached_files"]:
             cache_path = Path(self.app.settings["cached_files"][file_name])
             if cache_path.exists():
                 cache_path.unlink()
-            del self.app.settings["cached_files"][file_name]
-            self.app.config_manager.save_settings(self.app.settings)
+            delete_metadata(cache_path)
+            self.app.config_manager.remove_library_entries(self.app.settings, file_name)
+            if file_name in self.app.settings.get("triggers", {}).values():
+                self.set_trigger_key(file_name, None)
             self.update_file_list()
     
     def toggle_voice_mode(self):
@@ -441,7 +900,8 @@ class PlayerController:
         
         # Save to settings
         self.app.settings["voice_mode"] = voice_mode
-        self.app.config_manager.save_settings(self.app.settings)
+        self.app.config_manager.save_settings(self.app.settings, "voice_mode")
+        self.rearm_triggers()
         
         if voice_mode:
             messagebox.showinfo(
@@ -458,7 +918,8 @@ class PlayerController:
         
         # Save to settings
         self.app.settings["voice_quality"] = quality
-        self.app.config_manager.save_settings(self.app.settings)
+        self.app.config_manager.save_settings(self.app.settings, "voice_quality")
+        self.rearm_triggers()
     
     def show_voice_help(self):
         """Show help instructions for voice mode"""
@@ -1,17 +1,56 @@
 import customtkinter as ctk
+import tkinter as tk
+import numpy as np
 from tkinter import messagebox
 from tkinter import filedialog
 from pathlib import Path
 import webbrowser
 from audio_file_widget import AudioFileWidget
+from time_stretch import MIN_SPEED, MAX_SPEED, MIN_SEMITONES, MAX_SEMITONES
+from crossfade import SHAPE_LABELS
+from level_meter import BANDS
 
 class PlayerUI:
+    # Palette keys of the shared widget styles; ThemeManager restyles these options in place
+    BUTTON_COLORS = {
+        "fg_color": "button_bg",
+        "hover_color": "button_hover",
+        "text_color": "text_primary"
+    }
+    DROPDOWN_COLORS = {
+        "fg_color": "bg_tertiary",
+        "button_color": "button_bg",
+        "button_hover_color": "button_hover",
+        "text_color": "text_primary",
+        "dropdown_fg_color": "bg_tertiary",
+        "dropdown_hover_color": "button_hover",
+        "dropdown_text_color": "text_primary"
+    }
+    SLIDER_COLORS = {
+        "progress_color": "accent_primary",
+        "button_color": "accent_secondary",
+        "button_hover_color": "accent_secondary"
+    }
+    SWITCH_COLORS = {
+        "progress_color": "accent_primary",
+        "button_color": "accent_secondary",
+        "button_hover_color": "button_hover"
+    }
+    
+    # Output meter: spectrum bars over a level bar, in dBFS
+    METER_WIDTH, METER_HEIGHT = 192, 40
+    METER_LEVEL_HEIGHT = 6
+    METER_FLOOR_DB = -60.0
+    METER_FALL_DB = 1.5  # Per display frame, so levels fall back smoothly
+    
     def __init__(self, app, window, theme_manager):
         self.app = app
         self.window = window
         self.theme_manager = theme_manager
         self.search_var = ctk.StringVar()
         self.voice_mode_var = ctk.BooleanVar(value=app.audio_controller.voice_mode)
+        self.passthrough_var = ctk.BooleanVar(value=app.settings.get("mic_passthrough", False))
+        self.engine_process_var = ctk.BooleanVar(value=app.settings.get("engine_process", False))
         
         # UI elements that need to be accessed by PlayerController
         self.device_menu = None
@@ -24,16 +63,31 @@ class PlayerUI:
         self.volume_slider = None
         self.sidebar_vol_slider = None
         self.loop_btn = None
+        self.shuffle_btn = None
         self.mute_btn = None
         self.sidebar_mute_btn = None
         self.vol_value_label = None
         self.voice_quality_menu = None
+        self.input_device_menu = None
+        self.monitor_device_menu = None
+        self.monitor_gain_slider = None
+        self.mic_gain_slider = None
+        self.mic_gain_label = None
+        self.speed_slider = None
+        self.speed_label = None
+        self.pitch_slider = None
+        self.pitch_label = None
+        self.crossfade_menu = None
+        self.meter_canvas = None
+        self._meter_bars = []
+        self._meter_levels = np.full(BANDS + 2, self.METER_FLOOR_DB)  # Peak, RMS, then bands as shown
     
     def setup_ui(self):
         # Content container for everything except the player bar
-        self.content_container = ctk.CTkFrame(
+        self.content_container = self.theme_manager.themed(
+            ctk.CTkFrame,
             self.window,
-            fg_color=self.theme_manager.get_color("bg_primary"),
+            colors={"fg_color": "bg_primary"},
             corner_radius=0
         )
         self.content_container.grid(row=0, column=0, sticky="nsew")
@@ -49,11 +103,18 @@ class PlayerUI:
         )
         content_area.pack(fill="both", expand=True, padx=15, pady=(0, 15))
         
-        # Split into left sidebar and right main panel
-        left_panel = ctk.CTkFrame(
+        # Split into left sidebar and right main panel; the sidebar holds more
+        # sections than the fixed window fits, so it scrolls
+        left_panel = self.theme_manager.themed(
+            ctk.CTkScrollableFrame,
             content_area,
-            fg_color=self.theme_manager.get_color("bg_secondary"),
-            corner_radius=10
+            colors={
+                "fg_color": "bg_secondary",
+                "scrollbar_button_color": "button_bg",
+                "scrollbar_button_hover_color": "button_hover"
+            },
+            corner_radius=10,
+            width=210
         )
         left_panel.pack(side="left", fill="y", padx=(0, 10), pady=0, expand=False)
         
@@ -78,6 +139,8 @@ class PlayerUI:
         """Connect the UI to the controller after both have been initialized"""
         # Setup command bindings for the UI components
         self.device_menu.configure(command=controller.on_device_change)
+        self.monitor_device_menu.configure(command=controller.on_monitor_device_change)
+        self.monitor_gain_slider.configure(command=controller.set_monitor_gain)
         self.voice_quality_menu.configure(command=controller.on_voice_quality_change)
         
         # Update trace for voice mode variable
@@ -85,6 +148,19 @@ class PlayerUI:
             self.voice_mode_var.trace_remove("write", self.voice_mode_var.trace_info()[0][1])
         self.voice_mode_var.trace_add("write", lambda *args: controller.toggle_voice_mode())
         
+        if self.passthrough_var.trace_info():
+            self.passthrough_var.trace_remove("write", self.passthrough_var.trace_info()[0][1])
+        self.passthrough_var.trace_add("write", lambda *args: controller.toggle_mic_passthrough())
+        
+        if self.engine_process_var.trace_info():
+            self.engine_process_var.trace_remove("write", self.engine_process_var.trace_info()[0][1])
+        self.engine_process_var.trace_add("write", lambda *args: controller.toggle_engine_process())
+        self.input_device_menu.configure(command=controller.on_input_device_change)
+        self.mic_gain_slider.configure(command=controller.set_mic_gain)
+        self.speed_slider.configure(command=controller.set_playback_speed)
+        self.pitch_slider.configure(command=controller.set_pitch)
+        self.crossfade_menu.configure(command=controller.on_crossfade_change)
+        
         # Update trace for search variable - be careful about trace_info returning empty list
         if self.search_var.trace_info():
             self.search_var.trace_remove("write", self.search_var.trace_info()[0][1])
@@ -95,6 +171,7 @@ class PlayerUI:
         self.play_pause_btn.configure(command=controller.toggle_global_playback)
         self.stop_btn.configure(command=controller.stop_global_playback)
         self.next_btn.configure(command=controller.next_track)
+        self.shuffle_btn.configure(command=controller.toggle_shuffle)
         self.loop_btn.configure(command=controller.toggle_global_loop)
         self.mute_btn.configure(command=controller.toggle_global_mute)
         self.sidebar_mute_btn.configure(command=controller.toggle_global_mute_with_label)
@@ -103,16 +180,13 @@ class PlayerUI:
         self.global_progress.configure(command=controller.seek_global)
         self.volume_slider.configure(command=controller.set_global_volume)
         self.sidebar_vol_slider.configure(command=controller.set_global_volume_with_label)
-        
-        # Initialize the devices and file list
-        controller.refresh_devices()
-        controller.update_file_list()
     
     def create_header_panel(self, parent):
         """Create an attractive header panel with logo and app name"""
-        header = ctk.CTkFrame(
+        header = self.theme_manager.themed(
+            ctk.CTkFrame,
             parent,
-            fg_color=self.theme_manager.get_color("bg_tertiary"),
+            colors={"fg_color": "bg_tertiary"},
             corner_radius=10,
             height=60
         )
@@ -121,9 +195,10 @@ class PlayerUI:
         header.pack_propagate(False)
         
         # Logo placeholder/icon
-        logo_frame = ctk.CTkFrame(
+        logo_frame = self.theme_manager.themed(
+            ctk.CTkFrame,
             header,
-            fg_color=self.theme_manager.get_color("accent_primary"),
+            colors={"fg_color": "accent_primary"},
             corner_radius=10,
             width=40,
             height=40
@@ -145,37 +220,41 @@ class PlayerUI:
         title_frame = ctk.CTkFrame(header, fg_color="transparent")
         title_frame.pack(side="left", padx=10, fill="y")
         
-        ctk.CTkLabel(
+        self.theme_manager.themed(
+            ctk.CTkLabel,
             title_frame,
+            colors={"text_color": "text_primary"},
             text="AUDIO TO MIC",
-            font=ctk.CTkFont(size=18, weight="bold"),
-            text_color=self.theme_manager.get_color("text_primary")
+            font=ctk.CTkFont(size=18, weight="bold")
         ).pack(anchor="sw")
         
-        ctk.CTkLabel(
+        self.theme_manager.themed(
+            ctk.CTkLabel,
             title_frame,
+            colors={"text_color": "text_secondary"},
             text="PROFESSIONAL PLAYER",
-            font=ctk.CTkFont(size=12),
-            text_color=self.theme_manager.get_color("text_secondary")
+            font=ctk.CTkFont(size=12)
         ).pack(anchor="sw")
         
         # Theme selector on right side of header
         theme_frame = ctk.CTkFrame(header, fg_color="transparent")
         theme_frame.pack(side="right", padx=15)
         
-        ctk.CTkLabel(
+        self.theme_manager.themed(
+            ctk.CTkLabel,
             theme_frame,
+            colors={"text_color": "text_secondary"},
             text="Theme:",
-            font=ctk.CTkFont(size=12),
-            text_color=self.theme_manager.get_color("text_secondary")
+            font=ctk.CTkFont(size=12)
         ).pack(side="left", padx=(0, 5))
         
-        theme_menu = ctk.CTkOptionMenu(
+        theme_menu = self.theme_manager.themed(
+            ctk.CTkOptionMenu,
             theme_frame,
+            colors=self.DROPDOWN_COLORS,
             values=self.theme_manager.get_all_themes(),
             command=self.app.change_theme,
-            width=120,
-            **self.get_dropdown_style()
+            width=120
         )
         theme_menu.pack(side="left")
         theme_menu.set(self.theme_manager.current_theme_name)
@@ -188,25 +267,60 @@ class PlayerUI:
         device_section = ctk.CTkFrame(parent, fg_color="transparent")
         device_section.pack(fill="x", padx=10, pady=15)
         
-        ctk.CTkLabel(
+        self.theme_manager.themed(
+            ctk.CTkLabel,
             device_section,
+            colors={"text_color": "text_secondary"},
             text="OUTPUT DEVICE",
-            font=ctk.CTkFont(size=12, weight="bold"),
-            text_color=self.theme_manager.get_color("text_secondary")
+            font=ctk.CTkFont(size=12, weight="bold")
         ).pack(anchor="w", pady=(0, 5))
         
-        self.device_menu = ctk.CTkOptionMenu(
+        self.device_menu = self.theme_manager.themed(
+            ctk.CTkOptionMenu,
             device_section,
-            values=[],
-            **self.get_dropdown_style()
+            colors=self.DROPDOWN_COLORS,
+            values=[]
         )
         self.device_menu.pack(fill="x", padx=0, pady=(0, 5))
         
-        refresh_btn = ctk.CTkButton(
+        # Optional second device that hears the same output, with its own level
+        monitor_frame = ctk.CTkFrame(device_section, fg_color="transparent")
+        monitor_frame.pack(fill="x", pady=(5, 0))
+        
+        self.theme_manager.themed(
+            ctk.CTkLabel,
+            monitor_frame,
+            colors={"text_color": "text_primary"},
+            text="Monitor:"
+        ).pack(side="left")
+        
+        self.monitor_device_menu = self.theme_manager.themed(
+            ctk.CTkOptionMenu,
+            monitor_frame,
+            colors=self.DROPDOWN_COLORS,
+            values=["Off"]
+        )
+        self.monitor_device_menu.set("Off")
+        self.monitor_device_menu.pack(side="right")
+        
+        self.monitor_gain_slider = self.theme_manager.themed(
+            ctk.CTkSlider,
             device_section,
+            colors=self.SLIDER_COLORS,
+            from_=0,
+            to=1
+        )
+        self.monitor_gain_slider.set(self.app.audio_controller.monitor_gain)
+        self.monitor_gain_slider.pack(fill="x", padx=0, pady=(5, 5))
+        
+        refresh_btn = self.theme_manager.themed(
+            ctk.CTkButton,
+            device_section,
+            colors=self.BUTTON_COLORS,
             text="Refresh Devices",
             command=lambda: self.app.player_controller.refresh_devices() if hasattr(self.app, 'player_controller') else None,
-            **self.get_button_style(),
+            height=28,
+            corner_radius=6,
             image=self.load_image("refresh_icon", "🔄")
         )
         refresh_btn.pack(fill="x", padx=0, pady=(5, 0))
@@ -218,117 +332,292 @@ class PlayerUI:
         voice_section = ctk.CTkFrame(parent, fg_color="transparent")
         voice_section.pack(fill="x", padx=10, pady=15)
         
-        ctk.CTkLabel(
+        self.theme_manager.themed(
+            ctk.CTkLabel,
             voice_section,
+            colors={"text_color": "text_secondary"},
             text="VOICE APP MODE",
-            font=ctk.CTkFont(size=12, weight="bold"),
-            text_color=self.theme_manager.get_color("text_secondary")
+            font=ctk.CTkFont(size=12, weight="bold")
         ).pack(anchor="w", pady=(0, 10))
         
         # Voice app toggle with improved styling
         voice_switch_frame = ctk.CTkFrame(voice_section, fg_color="transparent")
         voice_switch_frame.pack(fill="x", pady=5)
         
-        voice_switch = ctk.CTkSwitch(
+        voice_switch = self.theme_manager.themed(
+            ctk.CTkSwitch,
             voice_switch_frame,
+            colors=self.SWITCH_COLORS,
             text="Enable Voice Mode",
             variable=self.voice_mode_var,
             onvalue=True,
-            offvalue=False,
-            progress_color=self.theme_manager.get_color("accent_primary"),
-            button_color=self.theme_manager.get_color("accent_secondary"),
-            button_hover_color=self.theme_manager.get_color("button_hover")
+            offvalue=False
         )
         voice_switch.pack(side="left")
         
+        # Playback in its own process so UI work can't cause dropouts
+        engine_switch = self.theme_manager.themed(
+            ctk.CTkSwitch,
+            voice_section,
+            colors=self.SWITCH_COLORS,
+            text="Separate Audio Process",
+            variable=self.engine_process_var,
+            onvalue=True,
+            offvalue=False
+        )
+        engine_switch.pack(anchor="w", pady=5)
+        
         # Quality setting with label
         quality_frame = ctk.CTkFrame(voice_section, fg_color="transparent")
         quality_frame.pack(fill="x", pady=10)
         
-        ctk.CTkLabel(
+        self.theme_manager.themed(
+            ctk.CTkLabel,
             quality_frame,
-            text="Quality:",
-            text_color=self.theme_manager.get_color("text_primary")
+            colors={"text_color": "text_primary"},
+            text="Quality:"
         ).pack(side="left")
         
-        self.voice_quality_menu = ctk.CTkOptionMenu(
+        self.voice_quality_menu = self.theme_manager.themed(
+            ctk.CTkOptionMenu,
             quality_frame,
-            values=["low", "medium", "high"],
-            **self.get_dropdown_style()
+            colors=self.DROPDOWN_COLORS,
+            values=["low", "medium", "high"]
         )
         self.voice_quality_menu.set(self.app.audio_controller.voice_quality)
         self.voice_quality_menu.pack(side="right")
         
         # Voice app help & download buttons
-        help_btn = ctk.CTkButton(
+        help_btn = self.theme_manager.themed(
+            ctk.CTkButton,
             voice_section,
+            colors=self.BUTTON_COLORS,
             text="How to Use",
             command=lambda: self.app.player_controller.show_voice_help() if hasattr(self.app, 'player_controller') else None,
-            **self.get_button_style()
+            height=28,
+            corner_radius=6
         )
         help_btn.pack(fill="x", padx=0, pady=(5, 5))
         
-        cable_btn = ctk.CTkButton(
+        cable_btn = self.theme_manager.themed(
+            ctk.CTkButton,
             voice_section,
+            colors=self.BUTTON_COLORS,
             text="Download VB-Cable",
             command=lambda: self.app.player_controller.get_vb_cable() if hasattr(self.app, 'player_controller') else None,
-            **self.get_button_style()
+            height=28,
+            corner_radius=6
         )
         cable_btn.pack(fill="x", padx=0, pady=(0, 5))
         
         # Separator
         self.create_separator(parent)
         
+        # Microphone passthrough: mix the real mic with clips in one stream
+        mic_section = ctk.CTkFrame(parent, fg_color="transparent")
+        mic_section.pack(fill="x", padx=10, pady=15)
+        
+        self.theme_manager.themed(
+            ctk.CTkLabel,
+            mic_section,
+            colors={"text_color": "text_secondary"},
+            text="MICROPHONE",
+            font=ctk.CTkFont(size=12, weight="bold")
+        ).pack(anchor="w", pady=(0, 10))
+        
+        passthrough_switch = self.theme_manager.themed(
+            ctk.CTkSwitch,
+            mic_section,
+            colors=self.SWITCH_COLORS,
+            text="Mix Microphone",
+            variable=self.passthrough_var,
+            onvalue=True,
+            offvalue=False
+        )
+        passthrough_switch.pack(anchor="w", pady=5)
+        
+        self.input_device_menu = self.theme_manager.themed(
+            ctk.CTkOptionMenu,
+            mic_section,
+            colors=self.DROPDOWN_COLORS,
+            values=["Default"]
+        )
+        self.input_device_menu.set("Default")
+        self.input_device_menu.pack(fill="x", padx=0, pady=(5, 5))
+        
+        mic_gain_frame = ctk.CTkFrame(mic_section, fg_color="transparent")
+        mic_gain_frame.pack(fill="x", pady=5)
+        
+        self.mic_gain_label = self.theme_manager.themed(
+            ctk.CTkLabel,
+            mic_gain_frame,
+            colors={"text_color": "text_primary"},
+            text=f"{int(self.app.audio_controller.mic_gain * 100)}%",
+            width=40
+        )
+        self.mic_gain_label.pack(side="right")
+        
+        self.mic_gain_slider = self.theme_manager.themed(
+            ctk.CTkSlider,
+            mic_gain_frame,
+            colors=self.SLIDER_COLORS,
+            from_=0,
+            to=1
+        )
+        self.mic_gain_slider.set(self.app.audio_controller.mic_gain)
+        self.mic_gain_slider.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        
+        # Separator
+        self.create_separator(parent)
+        
+        # Live speed and pitch change, and how tracks and loops join
+        shift_section = ctk.CTkFrame(parent, fg_color="transparent")
+        shift_section.pack(fill="x", padx=10, pady=15)
+        
+        self.theme_manager.themed(
+            ctk.CTkLabel,
+            shift_section,
+            colors={"text_color": "text_secondary"},
+            text="PLAYBACK",
+            font=ctk.CTkFont(size=12, weight="bold")
+        ).pack(anchor="w", pady=(0, 10))
+        
+        shifter = self.app.audio_controller.shifter
+        speed_frame = ctk.CTkFrame(shift_section, fg_color="transparent")
+        speed_frame.pack(fill="x", pady=5)
+        
+        self.speed_label = self.theme_manager.themed(
+            ctk.CTkLabel,
+            speed_frame,
+            colors={"text_color": "text_primary"},
+            text=f"{shifter.speed:.2f}x",
+            width=40
+        )
+        self.speed_label.pack(side="right")
+        
+        self.speed_slider = self.theme_manager.themed(
+            ctk.CTkSlider,
+            speed_frame,
+            colors=self.SLIDER_COLORS,
+            from_=MIN_SPEED,
+            to=MAX_SPEED,
+            number_of_steps=30
+        )
+        self.speed_slider.set(shifter.speed)
+        self.speed_slider.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        
+        pitch_frame = ctk.CTkFrame(shift_section, fg_color="transparent")
+        pitch_frame.pack(fill="x", pady=5)
+        
+        self.pitch_label = self.theme_manager.themed(
+            ctk.CTkLabel,
+            pitch_frame,
+            colors={"text_color": "text_primary"},
+            text=f"{int(shifter.semitones):+d} st",
+            width=40
+        )
+        self.pitch_label.pack(side="right")
+        
+        self.pitch_slider = self.theme_manager.themed(
+            ctk.CTkSlider,
+            pitch_frame,
+            colors=self.SLIDER_COLORS,
+            from_=MIN_SEMITONES,
+            to=MAX_SEMITONES,
+            number_of_steps=MAX_SEMITONES - MIN_SEMITONES
+        )
+        self.pitch_slider.set(shifter.semitones)
+        self.pitch_slider.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        
+        self.theme_manager.themed(
+            ctk.CTkButton,
+            shift_section,
+            colors=self.BUTTON_COLORS,
+            text="Reset",
+            command=lambda: self.app.player_controller.reset_time_pitch() if hasattr(self.app, 'player_controller') else None,
+            height=28,
+            corner_radius=6
+        ).pack(fill="x", padx=0, pady=(5, 0))
+        
+        crossfade_frame = ctk.CTkFrame(shift_section, fg_color="transparent")
+        crossfade_frame.pack(fill="x", pady=(10, 0))
+        
+        self.theme_manager.themed(
+            ctk.CTkLabel,
+            crossfade_frame,
+            colors={"text_color": "text_primary"},
+            text="Crossfade:"
+        ).pack(side="left")
+        
+        self.crossfade_menu = self.theme_manager.themed(
+            ctk.CTkOptionMenu,
+            crossfade_frame,
+            colors=self.DROPDOWN_COLORS,
+            values=list(SHAPE_LABELS.values())
+        )
+        self.crossfade_menu.set(SHAPE_LABELS[self.app.audio_controller.crossfader.shape])
+        self.crossfade_menu.pack(side="right")
+        
+        # Separator
+        self.create_separator(parent)
+        
         # Volume control section
         volume_section = ctk.CTkFrame(parent, fg_color="transparent")
         volume_section.pack(fill="x", padx=10, pady=15)
         
-        ctk.CTkLabel(
+        self.theme_manager.themed(
+            ctk.CTkLabel,
             volume_section,
+            colors={"text_color": "text_secondary"},
             text="VOLUME CONTROL",
-            font=ctk.CTkFont(size=12, weight="bold"),
-            text_color=self.theme_manager.get_color("text_secondary")
+            font=ctk.CTkFont(size=12, weight="bold")
         ).pack(anchor="w", pady=(0, 10))
         
         # Volume slider with value display
         vol_slider_frame = ctk.CTkFrame(volume_section, fg_color="transparent")
         vol_slider_frame.pack(fill="x", pady=5)
         
-        self.vol_value_label = ctk.CTkLabel(
+        self.vol_value_label = self.theme_manager.themed(
+            ctk.CTkLabel,
             vol_slider_frame,
+            colors={"text_color": "text_primary"},
             text=f"{int(self.app.audio_controller.volume * 100)}%",
-            width=40,
-            text_color=self.theme_manager.get_color("text_primary")
+            width=40
         )
         self.vol_value_label.pack(side="right")
         
         # Fix the slider command to use lambda with existence check
-        self.sidebar_vol_slider = ctk.CTkSlider(
+        self.sidebar_vol_slider = self.theme_manager.themed(
+            ctk.CTkSlider,
             vol_slider_frame,
+            colors=self.SLIDER_COLORS,
             from_=0,
             to=1,
-            command=lambda value: self.app.player_controller.set_global_volume_with_label(value) if hasattr(self.app, 'player_controller') else None,
-            **self.get_slider_style()
+            command=lambda value: self.app.player_controller.set_global_volume_with_label(value) if hasattr(self.app, 'player_controller') else None
         )
         self.sidebar_vol_slider.set(self.app.audio_controller.volume)
         self.sidebar_vol_slider.pack(side="left", fill="x", expand=True, padx=(0, 5))
         
         # Mute button
         # Fix the mute button command similarly
-        self.sidebar_mute_btn = ctk.CTkButton(
+        self.sidebar_mute_btn = self.theme_manager.themed(
+            ctk.CTkButton,
             volume_section,
+            colors=self.BUTTON_COLORS,
             text="Mute" if self.app.audio_controller.muted else "Unmute",
             command=lambda: self.app.player_controller.toggle_global_mute_with_label() if hasattr(self.app, 'player_controller') else None,
-            **self.get_button_style()
+            height=28,
+            corner_radius=6
         )
         self.sidebar_mute_btn.pack(fill="x", padx=0, pady=(5, 0))
     
     def create_file_panel(self, parent):
         """Create file list panel with search and controls"""
         # Top controls area
-        controls_frame = ctk.CTkFrame(
-            parent, 
-            fg_color=self.theme_manager.get_color("bg_secondary"),
+        controls_frame = self.theme_manager.themed(
+            ctk.CTkFrame,
+            parent,
+            colors={"fg_color": "bg_secondary"},
             corner_radius=10,
             height=50
         )
@@ -336,36 +625,52 @@ class PlayerUI:
         controls_frame.pack_propagate(False)  # Don't resize the frame
         
         # Add file button with icon
-        add_btn = ctk.CTkButton(
+        add_btn = self.theme_manager.themed(
+            ctk.CTkButton,
             controls_frame,
+            colors=self.BUTTON_COLORS,
             text="Add Audio",
             command=lambda: self.app.player_controller.add_audio_file() if hasattr(self.app, 'player_controller') else None,
-            **self.get_button_style(),
+            height=28,
+            corner_radius=6,
             image=self.load_image("add_icon", "➕"),
             width=120
         )
         add_btn.pack(side="left", padx=15, pady=10)
         
+        # Folders whose new and changed files are imported automatically
+        self.theme_manager.themed(
+            ctk.CTkButton,
+            controls_frame,
+            colors=self.BUTTON_COLORS,
+            text="Watch Folder",
+            command=lambda: self.app.player_controller.add_watch_folder() if hasattr(self.app, 'player_controller') else None,
+            height=28,
+            corner_radius=6,
+            width=110
+        ).pack(side="left", padx=(0, 15), pady=10)
+        
         # Search box on the right
         search_frame = ctk.CTkFrame(controls_frame, fg_color="transparent")
         search_frame.pack(side="right", padx=15, pady=10, fill="y")
         
         # Search icon and label
-        ctk.CTkLabel(
+        self.theme_manager.themed(
+            ctk.CTkLabel,
             search_frame,
-            text="Search:",
-            text_color=self.theme_manager.get_color("text_secondary")
+            colors={"text_color": "text_secondary"},
+            text="Search:"
         ).pack(side="left", padx=(0, 5))
         
         # Search entry with styling
-        search_entry = ctk.CTkEntry(
+        search_entry = self.theme_manager.themed(
+            ctk.CTkEntry,
             search_frame,
+            colors={"border_color": "accent_primary", "fg_color": "bg_tertiary"},
             placeholder_text="Type to search...",
             textvariable=self.search_var,
             width=200,
-            height=28,
-            border_color=self.theme_manager.get_color("accent_primary"),
-            fg_color=self.theme_manager.get_color("bg_tertiary")
+            height=28
         )
         search_entry.pack(side="left")
         
@@ -374,9 +679,10 @@ class PlayerUI:
         files_container.pack(fill="both", expand=True)
         
         # Files header with column labels
-        files_header = ctk.CTkFrame(
+        files_header = self.theme_manager.themed(
+            ctk.CTkFrame,
             files_container,
-            fg_color=self.theme_manager.get_color("bg_tertiary"),
+            colors={"fg_color": "bg_tertiary"},
             corner_radius=5,
             height=30
         )
@@ -384,45 +690,108 @@ class PlayerUI:
         files_header.pack_propagate(False)  # Keep fixed height
         
         # Column headers with appropriate widths
-        ctk.CTkLabel(
+        self.theme_manager.themed(
+            ctk.CTkLabel,
             files_header,
+            colors={"text_color": "text_secondary"},
             text="TRACK NAME",
-            font=ctk.CTkFont(size=12, weight="bold"),
-            text_color=self.theme_manager.get_color("text_secondary")
+            font=ctk.CTkFont(size=12, weight="bold")
         ).pack(side="left", padx=50)
         
-        ctk.CTkLabel(
+        self.theme_manager.themed(
+            ctk.CTkLabel,
             files_header,
+            colors={"text_color": "text_secondary"},
             text="DURATION",
-            font=ctk.CTkFont(size=12, weight="bold"),
-            text_color=self.theme_manager.get_color("text_secondary")
+            font=ctk.CTkFont(size=12, weight="bold")
         ).pack(side="right", padx=(0, 110))
         
         # Files list with improved styling
-        self.files_list = ctk.CTkScrollableFrame(
+        self.files_list = self.theme_manager.themed(
+            ctk.CTkScrollableFrame,
             files_container,
-            fg_color=self.theme_manager.get_color("bg_secondary"),
+            colors={"fg_color": "bg_secondary"},
             corner_radius=10
         )
         self.files_list.pack(fill="both", expand=True)
     
+    def create_meter(self, parent):
+        """Canvas with one bar per spectrum band and a level bar with a peak mark below"""
+        self.meter_canvas = self.theme_manager.themed(
+            tk.Canvas,
+            parent,
+            colors={"bg": "bg_tertiary"},
+            width=self.METER_WIDTH,
+            height=self.METER_HEIGHT,
+            highlightthickness=0
+        )
+        self.meter_canvas.pack(side="right")
+        
+        self._meter_bars = [self.meter_canvas.create_rectangle(0, 0, 0, 0, width=0) for _ in range(BANDS)]
+        top = self.METER_HEIGHT - self.METER_LEVEL_HEIGHT
+        self._meter_track = self.meter_canvas.create_rectangle(0, top, self.METER_WIDTH, self.METER_HEIGHT, width=0)
+        self._meter_rms = self.meter_canvas.create_rectangle(0, top, 0, self.METER_HEIGHT, width=0)
+        self._meter_peak = self.meter_canvas.create_rectangle(0, top, 0, self.METER_HEIGHT, width=0)
+        self.apply_meter_colors()
+        self.theme_manager.add_listener(self.apply_meter_colors)
+    
+    def apply_meter_colors(self):
+        canvas = self.meter_canvas
+        for bar in self._meter_bars:
+            canvas.itemconfigure(bar, fill=self.theme_manager.get_color("accent_primary"))
+        canvas.itemconfigure(self._meter_track, fill=self.theme_manager.get_color("bg_primary"))
+        canvas.itemconfigure(self._meter_rms, fill=self.theme_manager.get_color("accent_primary"))
+        canvas.itemconfigure(self._meter_peak, fill=self.theme_manager.get_color("accent_secondary"))
+    
+    def draw_meter(self, peak_db, rms_db, spectrum):
+        """
+        Show one display frame of output levels (dBFS; spectrum may be None).
+        
+        Levels rise at once and fall by METER_FALL_DB per frame; nothing is
+        redrawn while the meter rests at the floor.
+        """
+        previous = self._meter_levels
+        fallen = previous - self.METER_FALL_DB
+        levels = np.empty_like(previous)
+        levels[0], levels[1] = max(peak_db, fallen[0]), max(rms_db, fallen[1])
+        levels[2:] = fallen[2:] if spectrum is None else np.maximum(spectrum, fallen[2:])
+        np.clip(levels, self.METER_FLOOR_DB, 0.0, out=levels)
+        if np.array_equal(levels, previous):
+            return
+        self._meter_levels = levels
+        
+        canvas = self.meter_canvas
+        fractions = (levels - self.METER_FLOOR_DB) / -self.METER_FLOOR_DB
+        top = self.METER_HEIGHT - self.METER_LEVEL_HEIGHT
+        peak_x = fractions[0] * self.METER_WIDTH
+        canvas.coords(self._meter_rms, 0, top, fractions[1] * self.METER_WIDTH, self.METER_HEIGHT)
+        canvas.coords(self._meter_peak, max(0, peak_x - 2), top, peak_x, self.METER_HEIGHT)
+        
+        spectrum_height = top - 2
+        bar_width = self.METER_WIDTH / BANDS
+        for band, bar in enumerate(self._meter_bars):
+            x = band * bar_width
+            canvas.coords(bar, x + 1, spectrum_height * (1 - fractions[band + 2]), x + bar_width - 1, spectrum_height)
+    
     def create_player_panel(self, parent):
         """Create an enhanced player control panel with large progress bar fixed at the bottom"""
         # Create a visually distinct player panel using grid for better anchoring
-        self.global_player = ctk.CTkFrame(
+        self.global_player = self.theme_manager.themed(
+            ctk.CTkFrame,
             parent,
-            fg_color=self.theme_manager.get_color("bg_tertiary"),
-            corner_radius=0,  # No rounded corners for bottom bar
-            height=100  # Fixed height
+            colors={"fg_color": "bg_tertiary"},
+            corner_radius=0,
+            height=100
         )
         self.global_player.grid(row=1, column=0, sticky="ew")
         self.global_player.grid_propagate(False)  # Prevent resizing
         
         # Add a noticeable top border for visual separation
-        top_border = ctk.CTkFrame(
+        top_border = self.theme_manager.themed(
+            ctk.CTkFrame,
             self.global_player,
-            fg_color=self.theme_manager.get_color("accent_primary"),
-            height=3  # Make it slightly thicker for visibility
+            colors={"fg_color": "accent_primary"},
+            height=3
         )
         top_border.pack(fill="x")
         
@@ -430,25 +799,30 @@ class PlayerUI:
         top_section = ctk.CTkFrame(self.global_player, fg_color="transparent")
         top_section.pack(fill="x", padx=15, pady=(10, 5))
         
+        # Output level and spectrum, so it's visible that audio is reaching the device
+        self.create_meter(top_section)
+        
         # Current song info with better styling
         song_info = ctk.CTkFrame(top_section, fg_color="transparent")
         song_info.pack(fill="x")
         
         # Now playing label
-        now_playing = ctk.CTkLabel(
+        now_playing = self.theme_manager.themed(
+            ctk.CTkLabel,
             song_info,
+            colors={"text_color": "text_secondary"},
             text="NOW PLAYING",
-            font=ctk.CTkFont(size=10, weight="bold"),
-            text_color=self.theme_manager.get_color("text_secondary")
+            font=ctk.CTkFont(size=10, weight="bold")
         )
         now_playing.pack(anchor="w")
         
         # Song title with scroll effect if needed
-        self.current_song_label = ctk.CTkLabel(
+        self.current_song_label = self.theme_manager.themed(
+            ctk.CTkLabel,
             song_info,
+            colors={"text_color": "accent_primary"},
             text="No song playing",
-            font=ctk.CTkFont(size=14, weight="bold"),
-            text_color=self.theme_manager.get_color("accent_primary")
+            font=ctk.CTkFont(size=14, weight="bold")
         )
         self.current_song_label.pack(anchor="w")
         
@@ -461,45 +835,46 @@ class PlayerUI:
         progress_container.pack(fill="x", pady=5)
         
         # Time labels
-        self.time_elapsed = ctk.CTkLabel(
+        self.time_elapsed = self.theme_manager.themed(
+            ctk.CTkLabel,
             progress_container,
+            colors={"text_color": "accent_primary"},
             text="0:00",
-            width=35,
-            text_color=self.theme_manager.get_color("accent_primary")
+            width=35
         )
         self.time_elapsed.pack(side="left", padx=(0, 5))
         
         # Progress container with background - make it stand out more
-        progress_bg = ctk.CTkFrame(
+        progress_bg = self.theme_manager.themed(
+            ctk.CTkFrame,
             progress_container,
-            fg_color=self.theme_manager.get_color("bg_primary"),
+            colors={"fg_color": "bg_primary", "border_color": "accent_primary"},
             corner_radius=8,
-            border_width=1,
-            border_color=self.theme_manager.get_color("accent_primary")
+            border_width=1
         )
         progress_bg.pack(side="left", fill="x", expand=True)
         
         # Actual slider on top of background
-        self.global_progress = ctk.CTkSlider(
+        self.global_progress = self.theme_manager.themed(
+            ctk.CTkSlider,
             progress_bg,
+            colors=self.SLIDER_COLORS,
             from_=0,
             to=1,
             command=lambda value: self.app.player_controller.seek_global(value) if hasattr(self.app, 'player_controller') else None,
             height=20,
             button_length=20,
-            progress_color=self.theme_manager.get_color("accent_primary"),
-            button_color=self.theme_manager.get_color("accent_secondary"),
-            button_hover_color=self.theme_manager.get_color("accent_secondary"),
             corner_radius=8
         )
         self.global_progress.pack(fill="both", expand=True, padx=2, pady=2)
         
         # Remaining time
-        self.time_remaining = ctk.CTkLabel(
+        self.time_remaining = self.theme_manager.themed(
+            ctk.CTkLabel,
             progress_container,
+            colors={"text_color": "accent_primary"},
             text="-0:00",
-            width=40,
-            text_color=self.theme_manager.get_color("accent_primary")
+            width=40
         )
         self.time_remaining.pack(side="left", padx=(5, 0))
         
@@ -512,55 +887,55 @@ class PlayerUI:
         playback_frame.pack(side="left")
         
         # Previous track button
-        self.prev_btn = ctk.CTkButton(
+        self.prev_btn = self.theme_manager.themed(
+            ctk.CTkButton,
             playback_frame,
+            colors={"fg_color": "button_bg", "hover_color": "button_hover"},
             text="⏮",
             width=40,
             height=30,
             corner_radius=15,
-            command=lambda: self.app.player_controller.previous_track() if hasattr(self.app, 'player_controller') else None,
-            fg_color=self.theme_manager.get_color("button_bg"),
-            hover_color=self.theme_manager.get_color("button_hover"),
+            command=lambda: self.app.player_controller.previous_track() if hasattr(self.app, 'player_controller') else None
         )
         self.prev_btn.pack(side="left", padx=5)
         
         # Play/Pause button - larger and more prominent
-        self.play_pause_btn = ctk.CTkButton(
+        self.play_pause_btn = self.theme_manager.themed(
+            ctk.CTkButton,
             playback_frame,
+            colors={"fg_color": "accent_primary", "hover_color": "accent_secondary"},
             text="▶",
             width=50,
             height=30,
             corner_radius=15,
             command=lambda: self.app.player_controller.toggle_global_playback() if hasattr(self.app, 'player_controller') else None,
-            fg_color=self.theme_manager.get_color("accent_primary"),
-            hover_color=self.theme_manager.get_color("accent_secondary"),
             text_color="#FFFFFF"
         )
         self.play_pause_btn.pack(side="left", padx=5)
         
         # Stop button - fixed formatting
-        self.stop_btn = ctk.CTkButton(
+        self.stop_btn = self.theme_manager.themed(
+            ctk.CTkButton,
             playback_frame,
+            colors={"fg_color": "button_bg", "hover_color": "button_hover"},
             text="⏹",
             width=40,
             height=30,
             corner_radius=15,
-            command=lambda: self.app.player_controller.stop_global_playback() if hasattr(self.app, 'player_controller') else None,
-            fg_color=self.theme_manager.get_color("button_bg"),
-            hover_color=self.theme_manager.get_color("button_hover"),
+            command=lambda: self.app.player_controller.stop_global_playback() if hasattr(self.app, 'player_controller') else None
         )
         self.stop_btn.pack(side="left", padx=5)
         
         # Next track button - fixed formatting
-        self.next_btn = ctk.CTkButton(
+        self.next_btn = self.theme_manager.themed(
+            ctk.CTkButton,
             playback_frame,
+            colors={"fg_color": "button_bg", "hover_color": "button_hover"},
             text="⏭",
             width=40,
             height=30,
             corner_radius=15,
-            command=lambda: self.app.player_controller.next_track() if hasattr(self.app, 'player_controller') else None,
-            fg_color=self.theme_manager.get_color("button_bg"),
-            hover_color=self.theme_manager.get_color("button_hover"),
+            command=lambda: self.app.player_controller.next_track() if hasattr(self.app, 'player_controller') else None
         )
         self.next_btn.pack(side="left", padx=5)
         
@@ -568,29 +943,42 @@ class PlayerUI:
         right_controls = ctk.CTkFrame(controls_section, fg_color="transparent")
         right_controls.pack(side="right")
         
+        # Shuffle toggle button
+        self.shuffle_btn = self.theme_manager.themed(
+            ctk.CTkButton,
+            right_controls,
+            colors={"fg_color": "button_bg", "hover_color": "button_hover"},
+            text="🔀",
+            width=40,
+            height=30,
+            corner_radius=15,
+            command=lambda: self.app.player_controller.toggle_shuffle() if hasattr(self.app, 'player_controller') else None
+        )
+        self.shuffle_btn.pack(side="left", padx=5)
+        
         # Loop toggle button - fixed formatting
-        self.loop_btn = ctk.CTkButton(
+        self.loop_btn = self.theme_manager.themed(
+            ctk.CTkButton,
             right_controls,
+            colors={"fg_color": "button_bg", "hover_color": "button_hover"},
             text="🔁",
             width=40,
             height=30,
             corner_radius=15,
-            command=lambda: self.app.player_controller.toggle_global_loop() if hasattr(self.app, 'player_controller') else None,
-            fg_color=self.theme_manager.get_color("button_bg"),
-            hover_color=self.theme_manager.get_color("button_hover"),
+            command=lambda: self.app.player_controller.toggle_global_loop() if hasattr(self.app, 'player_controller') else None
         )
         self.loop_btn.pack(side="left", padx=5)
         
         # Fix for line 557 error - removed text fragment
-        self.mute_btn = ctk.CTkButton(
+        self.mute_btn = self.theme_manager.themed(
+            ctk.CTkButton,
             right_controls,
+            colors={"fg_color": "button_bg", "hover_color": "button_hover"},
             text="🔊",
             width=40,
             height=30,
             corner_radius=15,
-            command=lambda: self.app.player_controller.toggle_global_mute() if hasattr(self.app, 'player_controller') else None,
-            fg_color=self.theme_manager.get_color("button_bg"),
-            hover_color=self.theme_manager.get_color("button_hover"),
+            command=lambda: self.app.player_controller.toggle_global_mute() if hasattr(self.app, 'player_controller') else None
         )
         self.mute_btn.pack(side="left", padx=5)
         
@@ -598,22 +986,24 @@ class PlayerUI:
         volume_frame = ctk.CTkFrame(right_controls, fg_color="transparent", height=30)
         volume_frame.pack(side="left", padx=5, fill="y")
         
-        self.volume_slider = ctk.CTkSlider(
+        self.volume_slider = self.theme_manager.themed(
+            ctk.CTkSlider,
             volume_frame,
+            colors=self.SLIDER_COLORS,
             from_=0,
             to=1,
             command=lambda value: self.app.player_controller.set_global_volume(value) if hasattr(self.app, 'player_controller') else None,
-            width=100,
-            **self.get_slider_style()
+            width=100
         )
         self.volume_slider.set(self.app.audio_controller.volume)
         self.volume_slider.pack(side="left", expand=True, fill="both")
     
     def create_separator(self, parent):
         """Create a visual separator"""
-        separator = ctk.CTkFrame(
-            parent, 
-            fg_color=self.theme_manager.get_color("bg_tertiary"),
+        separator = self.theme_manager.themed(
+            ctk.CTkFrame,
+            parent,
+            colors={"fg_color": "bg_tertiary"},
             height=1
         )
         separator.pack(fill="x", padx=10, pady=5)
@@ -623,33 +1013,3 @@ class PlayerUI:
         # This would normally load an image, but we'll just return None
         # so CustomTkinter uses the fallback text
         return None
-    
-    def get_button_style(self):
-        """Get common button style from theme"""
-        return {
-            "fg_color": self.theme_manager.get_color("button_bg"),
-            "hover_color": self.theme_manager.get_color("button_hover"),
-            "text_color": self.theme_manager.get_color("text_primary"),
-            "height": 28,
-            "corner_radius": 6
-        }
-    
-    def get_dropdown_style(self):
-        """Get common dropdown style from theme"""
-        return {
-            "fg_color": self.theme_manager.get_color("bg_tertiary"),
-            "button_color": self.theme_manager.get_color("button_bg"),
-            "button_hover_color": self.theme_manager.get_color("button_hover"),
-            "text_color": self.theme_manager.get_color("text_primary"),
-            "dropdown_fg_color": self.theme_manager.get_color("bg_tertiary"),
-            "dropdown_hover_color": self.theme_manager.get_color("button_hover"),
-            "dropdown_text_color": self.theme_manager.get_color("text_primary")
-        }
-    
-    def get_slider_style(self):
-        """Get common slider style from theme"""
-        return {
-            "progress_color": self.theme_manager.get_color("accent_primary"),
-            "button_color": self.theme_manager.get_color("accent_secondary"),
-            "button_hover_color": self.theme_manager.get_color("accent_secondary")
-        }
\ No newline at end of file
@@ -0,0 +1,128 @@
+import customtkinter as ctk
+from tkinter import messagebox
+from cache_metadata import load_metadata
+from clip_regions import parse_time, format_time, set_in_out, set_region, remove_region
+
+class RegionEditor(ctk.CTkToplevel):
+    """
+    Window for a library entry's in/out points and named regions.
+
+    Times are in seconds of the cached file (m:ss.s or plain seconds). Regions
+    play through the entry's row, so they follow its loop and crossfade
+    settings; on_changed(file_name) runs after anything is saved.
+    """
+
+    def __init__(self, parent, widget, on_changed):
+        super().__init__(parent)
+        self.widget = widget
+        self.on_changed = on_changed
+        self.title(f"Regions - {widget.file_name}")
+        self.geometry("420x440")
+        self.transient(parent)
+        self.setup_ui()
+        self.refresh()
+
+    def setup_ui(self):
+        # In/out points of the whole clip
+        points = ctk.CTkFrame(self, fg_color="transparent")
+        points.pack(fill="x", padx=10, pady=(10, 5))
+        self.in_entry = self._time_entry(points, "In")
+        self.out_entry = self._time_entry(points, "Out")
+        ctk.CTkButton(points, text="Save", width=60, command=self.save_points).pack(side="right")
+
+        actions = ctk.CTkFrame(self, fg_color="transparent")
+        actions.pack(fill="x", padx=10, pady=5)
+        ctk.CTkButton(actions, text="▶ Whole clip", width=100,
+                      command=lambda: self.widget.play_region(None)).pack(side="left")
+        ctk.CTkButton(actions, text="In = playhead", width=100,
+                      command=lambda: self._set_from_playhead(self.in_entry)).pack(side="left", padx=5)
+        ctk.CTkButton(actions, text="Out = playhead", width=100,
+                      command=lambda: self._set_from_playhead(self.out_entry)).pack(side="left")
+
+        ctk.CTkLabel(self, text="REGIONS", font=ctk.CTkFont(size=12, weight="bold"),
+                     text_color="#8d99ae").pack(anchor="w", padx=10, pady=(10, 0))
+        self.regions_list = ctk.CTkScrollableFrame(self, height=200)
+        self.regions_list.pack(fill="both", expand=True, padx=10, pady=5)
+
+        # New region: name, start, end
+        add_row = ctk.CTkFrame(self, fg_color="transparent")
+        add_row.pack(fill="x", padx=10, pady=(5, 10))
+        self.name_entry = ctk.CTkEntry(add_row, placeholder_text="Name", width=110)
+        self.name_entry.pack(side="left", padx=(0, 5))
+        self.start_entry = ctk.CTkEntry(add_row, placeholder_text="Start", width=70)
+        self.start_entry.pack(side="left", padx=(0, 5))
+        self.end_entry = ctk.CTkEntry(add_row, placeholder_text="End", width=70)
+        self.end_entry.pack(side="left", padx=(0, 5))
+        ctk.CTkButton(add_row, text="Add", width=60, command=self.add_region).pack(side="right")
+
+    @staticmethod
+    def _time_entry(parent, label):
+        ctk.CTkLabel(parent, text=label).pack(side="left", padx=(0, 5))
+        entry = ctk.CTkEntry(parent, placeholder_text="0:00.0", width=80)
+        entry.pack(side="left", padx=(0, 10))
+        return entry
+
+    @staticmethod
+    def _set_text(entry, text):
+        entry.delete(0, "end")
+        if text:
+            entry.insert(0, text)
+
+    def _set_from_playhead(self, entry):
+        """Fill entry with where this entry is playing, in file time"""
+        controller = self.widget.audio_controller
+        track = controller.track
+        if track is None or track.file_path != self.widget.file_path:
+            return
+        self._set_text(entry, format_time(track.stream_offset / track.sample_rate + controller.position))
+
+    def refresh(self):
+        """Show the saved points and regions"""
+        metadata = load_metadata(self.widget.file_path)
+        self._set_text(self.in_entry, format_time(metadata.get("in_seconds")))
+        self._set_text(self.out_entry, format_time(metadata.get("out_seconds")))
+
+        for child in self.regions_list.winfo_children():
+            child.destroy()
+        regions = metadata.get("regions", {})
+        for name, (start, end) in sorted(regions.items(), key=lambda item: item[1][0]):
+            row = ctk.CTkFrame(self.regions_list, fg_color="transparent")
+            row.pack(fill="x", pady=2)
+            ctk.CTkButton(row, text="▶", width=28, height=28, corner_radius=14, fg_color="#3a3a5e",
+                          command=lambda n=name: self.widget.play_region(n)).pack(side="left", padx=(0, 8))
+            ctk.CTkLabel(row, text=f"{name}   {format_time(start)} - {format_time(end)}",
+                         anchor="w").pack(side="left", fill="x", expand=True)
+            ctk.CTkButton(row, text="✕", width=28, height=28, corner_radius=14, fg_color="#3a3a5e",
+                          hover_color="#f72585",
+                          command=lambda n=name: self.delete_region(n)).pack(side="right")
+
+    def save_points(self):
+        try:
+            set_in_out(self.widget.file_path, parse_time(self.in_entry.get()), parse_time(self.out_entry.get()))
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid in/out points: {e}", parent=self)
+            return
+        self.refresh()
+        self.on_changed(self.widget.file_name)
+
+    def add_region(self):
+        try:
+            start, end = parse_time(self.start_entry.get()), parse_time(self.end_entry.get())
+            if start is None or end is None:
+                raise ValueError("A region needs a start and an end")
+            set_region(self.widget.file_path, self.name_entry.get(), start, end)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid region: {e}", parent=self)
+            return
+        for entry in (self.name_entry, self.start_entry, self.end_entry):
+            self._set_text(entry, "")
+        self.refresh()
+        self.on_changed(self.widget.file_name)
+
+    def delete_region(self, name):
+        remove_region(self.widget.file_path, name)
+        if self.widget.region == name:
+            self.widget.region = None
+            self.widget.file_label.configure(text=self.widget.file_name)
+        self.refresh()
+        self.on_changed(self.widget.file_name)
@@ -9,10 +9,8 @@ def check_requirements():
     required_packages = [
         "sounddevice",
         "numpy",
-        "pydub",
         "ffmpeg-python",
-        "customtkinter",
-        "psutil"
+        "customtkinter"
     ]
     
     missing_packages = []
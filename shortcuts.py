@@ -1,14 +1,19 @@
+import time
+from triggers import TRIGGER_KEYS
+
 class KeyboardShortcuts:
     def __init__(self, app):
         self.app = app
+        self.bound_trigger_keys = []
         self.setup_shortcuts()
         
     def setup_shortcuts(self):
         """Configure keyboard shortcuts"""
         window = self.app.window
+        controller = self.app.player_controller
         
         # Space = Play/Pause
-        window.bind("<space>", lambda e: self.app.toggle_global_playback())
+        window.bind("<space>", lambda e: controller.toggle_global_playback())
         
         # Left/right arrow keys = Seek backward/forward
         window.bind("<Left>", lambda e: self.seek_backward())
@@ -19,37 +24,67 @@ class KeyboardShortcuts:
         window.bind("<Down>", lambda e: self.volume_down())
         
         # M = Toggle mute
-        window.bind("m", lambda e: self.app.toggle_global_mute())
+        window.bind("m", lambda e: controller.toggle_global_mute())
         
         # L = Toggle loop
-        window.bind("l", lambda e: self.app.toggle_global_loop())
+        window.bind("l", lambda e: controller.toggle_global_loop())
         
         # Media keys (may not work on all systems)
-        window.bind("<XF86AudioPlay>", lambda e: self.app.toggle_global_playback())
-        window.bind("<XF86AudioStop>", lambda e: self.app.stop_global_playback())
-        window.bind("<XF86AudioPrev>", lambda e: self.app.previous_track())
-        window.bind("<XF86AudioNext>", lambda e: self.app.next_track())
+        window.bind("<XF86AudioPlay>", lambda e: controller.toggle_global_playback())
+        window.bind("<XF86AudioStop>", lambda e: controller.stop_global_playback())
+        window.bind("<XF86AudioPrev>", lambda e: controller.previous_track())
+        window.bind("<XF86AudioNext>", lambda e: controller.next_track())
         
+        self.bind_triggers()
+    
+    def bind_triggers(self):
+        """Bind the keys that have clips assigned, replacing earlier bindings"""
+        window = self.app.window
+        for key in self.bound_trigger_keys:
+            window.unbind(f"<{key}>")
+        
+        self.bound_trigger_keys = [key for key in self.app.settings.get("triggers", {}) if key in TRIGGER_KEYS]
+        for key in self.bound_trigger_keys:
+            window.bind(f"<{key}>", lambda e, key=key: self.fire_trigger(key))
+    
+    def fire_trigger(self, key):
+        """Start a trigger clip; its latency is reported once it has reached the output"""
+        # Taken first thing so the measurement covers everything after Tk delivers the key
+        press_time = time.perf_counter()
+        if self.app.trigger_bank.trigger(key, press_time):
+            self.app.window.after(500, lambda: self.report_trigger_latency(key))
+        return "break"
+    
+    def report_trigger_latency(self, key):
+        latency = self.app.trigger_bank.last_latency(key)
+        if latency is not None:
+            print(f"[DEBUG] Trigger {key}: {latency * 1000:.1f} ms from key to first sample")
+            
     def seek_backward(self):
         """Seek 5 seconds backward"""
-        if self.app.audio_controller.is_playing:
-            current = self.app.audio_controller.position
-            self.app.audio_controller.seek(max(0, current - 5))
+        audio_controller = self.app.audio_controller
+        if audio_controller.is_playing and audio_controller.duration > 0:
+            current = audio_controller.position
+            audio_controller.seek(max(0, current - 5) / audio_controller.duration)
             
     def seek_forward(self):
         """Seek 5 seconds forward"""
-        if self.app.audio_controller.is_playing:
-            current = self.app.audio_controller.position
-            self.app.audio_controller.seek(min(self.app.audio_controller.duration, current + 5))
+        audio_controller = self.app.audio_controller
+        if audio_controller.is_playing and audio_controller.duration > 0:
+            current = audio_controller.position
+            audio_controller.seek(min(audio_controller.duration, current + 5) / audio_controller.duration)
             
     def volume_up(self):
         """Increase volume by 5%"""
         current = self.app.audio_controller.volume
-        self.app.audio_controller.set_volume(min(1.0, current + 0.05))
-        self.app.volume_slider.set(self.app.audio_controller.volume)
+        self.set_volume(min(1.0, current + 0.05))
         
     def volume_down(self):
         """Decrease volume by 5%"""
         current = self.app.audio_controller.volume
-        self.app.audio_controller.set_volume(max(0, current - 0.05))
-        self.app.volume_slider.set(self.app.audio_controller.volume)
+        self.set_volume(max(0, current - 0.05))
+    
+    def set_volume(self, volume):
+        """Apply a volume and keep both sliders in step"""
+        self.app.player_controller.set_global_volume_with_label(volume)
+        self.app.player_ui.volume_slider.set(volume)
@@ -0,0 +1,37 @@
+import time
+
+class StartupTimer:
+    """Records named startup milestones and prints a timing report"""
+    
+    def __init__(self, start_time=None):
+        # Allow the launcher to pass in an earlier reference point so module imports are included
+        self.start_time = start_time if start_time is not None else time.perf_counter()
+        self.marks = []
+        self.reported = False
+    
+    def mark(self, label):
+        """Record a milestone relative to the start time"""
+        elapsed_ms = (time.perf_counter() - self.start_time) * 1000
+        self.marks.append((label, elapsed_ms))
+        print(f"[STARTUP] {label}: {elapsed_ms:.1f} ms")
+        return elapsed_ms
+    
+    def elapsed(self, label):
+        """Get the elapsed time recorded for a milestone, or None"""
+        for mark_label, elapsed_ms in self.marks:
+            if mark_label == label:
+                return elapsed_ms
+        return None
+    
+    def report(self):
+        """Print a summary of all milestones with the time spent in each stage"""
+        if self.reported:
+            return
+        self.reported = True
+        
+        print("[STARTUP] ===== Startup timing report =====")
+        previous = 0.0
+        for label, elapsed_ms in self.marks:
+            print(f"[STARTUP] {label:<28} {elapsed_ms:8.1f} ms  (+{elapsed_ms - previous:.1f} ms)")
+            previous = elapsed_ms
+        print("[STARTUP] ==================================")
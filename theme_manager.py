@@ -41,6 +41,8 @@ class ThemeManager:
     def __init__(self):
         self.current_theme_name = "dark_blue"  # Default theme
         self.current_theme = self.THEMES[self.current_theme_name]
+        self.themed_widgets = []  # (widget, {option: color key}) restyled on theme changes
+        self.listeners = []  # Callbacks that repaint state-dependent colors
     
     def get_color(self, color_key):
         """Get a color from the current theme"""
@@ -54,6 +56,45 @@ class ThemeManager:
             return True
         return False
         
+    def colors(self, color_keys):
+        """Resolve a mapping of widget options to color keys against the current theme"""
+        return {option: self.get_color(key) for option, key in color_keys.items()}
+    
+    def themed(self, widget_class, parent, colors, **kwargs):
+        """
+        Create a widget with colors from the current theme and register it.
+        
+        colors maps widget options to color keys, e.g. {"fg_color": "bg_secondary"};
+        apply_theme sets exactly these options again when the theme changes.
+        """
+        widget = widget_class(parent, **self.colors(colors), **kwargs)
+        self.themed_widgets.append((widget, dict(colors)))
+        return widget
+    
+    def add_listener(self, callback):
+        """Call callback after each theme change, for colors that depend on UI state"""
+        self.listeners.append(callback)
+    
+    def apply_theme(self):
+        """Restyle every registered widget in place with the current theme"""
+        alive = []
+        for widget, color_keys in self.themed_widgets:
+            try:
+                if not widget.winfo_exists():
+                    continue
+                widget.configure(**self.colors(color_keys))
+                alive.append((widget, color_keys))
+            except Exception as e:
+                print(f"[ERROR] Could not restyle {widget}: {e}")
+        # Forget widgets destroyed since the last change
+        self.themed_widgets = alive
+        
+        for callback in self.listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[ERROR] Theme listener failed: {e}")
+        
     def get_button_style(self):
         """Get standard button styling"""
         return {
@@ -0,0 +1,128 @@
+import numpy as np
+
+FRAME_SIZE = 1024      # 21 ms at 48 kHz, long enough to hold a couple of voice pitch periods
+SYNTHESIS_HOP = 512    # 50% overlap; a periodic Hann window sums to exactly 1 at this hop
+SEEK_TOLERANCE = 256   # How far (in frames) a WSOLA frame may move to line up with the previous one
+OVERLAP = FRAME_SIZE - SYNTHESIS_HOP
+
+MIN_SPEED, MAX_SPEED = 0.5, 2.0
+MIN_SEMITONES, MAX_SEMITONES = -12, 12
+
+class TimePitchShifter:
+    """
+    Streaming speed and pitch change for a clip held in memory.
+
+    Speed is changed with WSOLA: output is built from overlapping Hann-windowed
+    frames taken from the clip at the speed-scaled position, each moved within
+    SEEK_TOLERANCE to where it best continues the previous frame, so
+    waveforms line up and pitch is kept. Pitch is then changed by resampling
+    that output by the pitch ratio, with the stretch pre-scaled to cancel the
+    resampler's speed change.
+
+    The clip is read by random access, so there's no input buffering: the only
+    state is the overlap tail and the unresampled output. speed and semitones
+    can be changed between blocks while playing.
+    """
+
+    def __init__(self, speed=1.0, semitones=0.0):
+        self.window = np.hanning(FRAME_SIZE + 1)[:-1].astype(np.float32)
+        self.set(speed, semitones)
+        self.reset(0)
+
+    def set(self, speed, semitones):
+        self.speed = min(max(float(speed), MIN_SPEED), MAX_SPEED)
+        self.semitones = min(max(float(semitones), MIN_SEMITONES), MAX_SEMITONES)
+        self.pitch_ratio = 2.0 ** (self.semitones / 12.0)
+
+    @property
+    def active(self):
+        """False when the settings leave the clip unchanged and the shifter can be bypassed"""
+        return self.speed != 1.0 or self.semitones != 0.0
+
+    def reset(self, position):
+        """Start over at an input frame, after a load, seek or loop"""
+        self.position = float(position)  # Input frame the next output sample corresponds to
+        self._analysis = float(position)  # Nominal input frame of the next WSOLA frame
+        self._previous = None             # Where the last WSOLA frame was actually taken
+        self._overlap = np.zeros(OVERLAP, dtype=np.float32)
+        self._stretched = np.zeros(0, dtype=np.float32)  # WSOLA output not yet resampled
+        self._phase = 0.0                 # Fractional read position in _stretched
+
+    def _stretched_needed(self, frames, pitch_ratio):
+        """Samples of WSOLA output the resampler reads for the next frames of output"""
+        return int(self._phase + pitch_ratio * (frames - 1)) + 2
+
+    def input_range(self, frames):
+        """Range of input frames the next render of frames will read"""
+        missing = max(0, self._stretched_needed(frames, self.pitch_ratio) - len(self._stretched))
+        hops = -(-missing // SYNTHESIS_HOP)
+        analysis_hop = SYNTHESIS_HOP * self.speed / self.pitch_ratio
+        start = int(self._analysis) - SEEK_TOLERANCE
+        if self._previous is not None:
+            start = min(start, self._previous + SYNTHESIS_HOP)
+        end = int(self._analysis + hops * analysis_hop) + SEEK_TOLERANCE + FRAME_SIZE
+        return max(0, start), end
+
+    @staticmethod
+    def _read(samples, start, length, limit):
+        """samples[start:start + length] with everything outside [0, limit) as silence"""
+        if 0 <= start and start + length <= limit:
+            return samples[start:start + length]
+        chunk = np.zeros(length, dtype=np.float32)
+        lo, hi = max(start, 0), min(start + length, limit)
+        if hi > lo:
+            chunk[lo - start:hi - start] = samples[lo:hi]
+        return chunk
+
+    def _next_hop(self, samples, limit, speed, pitch_ratio):
+        nominal = int(round(self._analysis))
+        if self._previous is None:
+            position = nominal
+        else:
+            # Where the previous frame would have continued; pick the candidate most like it
+            template = self._read(samples, self._previous + SYNTHESIS_HOP, OVERLAP, limit)
+            region = self._read(samples, nominal - SEEK_TOLERANCE, 2 * SEEK_TOLERANCE + OVERLAP, limit)
+            position = nominal - SEEK_TOLERANCE + int(np.argmax(np.correlate(region, template, "valid")))
+
+        frame = self._read(samples, position, FRAME_SIZE, limit) * self.window
+        frame[:OVERLAP] += self._overlap
+        self._overlap = frame[SYNTHESIS_HOP:]
+        self._previous = position
+        self._analysis += SYNTHESIS_HOP * speed / pitch_ratio
+        return frame[:SYNTHESIS_HOP]
+
+    def render(self, samples, frames, limit=None):
+        """
+        Next frames of output from samples, read from self.position on.
+
+        limit is how much of samples holds audio (the playable length); past it
+        the clip reads as silence. Returns a float32 block of frames.
+
+        The settings are read once, so a set() from another thread while this
+        runs takes effect from the next block.
+        """
+        if limit is None:
+            limit = len(samples)
+        speed, pitch_ratio = self.speed, self.pitch_ratio
+        needed = self._stretched_needed(frames, pitch_ratio)
+        if len(self._stretched) < needed:
+            hops = [self._stretched]
+            available = len(self._stretched)
+            while available < needed:
+                hop = self._next_hop(samples, limit, speed, pitch_ratio)
+                hops.append(hop)
+                available += len(hop)
+            self._stretched = np.concatenate(hops)
+
+        # Linear-interpolating resampler at the pitch ratio
+        read = self._phase + pitch_ratio * np.arange(frames)
+        index = read.astype(np.int64)
+        fraction = (read - index).astype(np.float32)
+        block = self._stretched[index] * (1.0 - fraction) + self._stretched[index + 1] * fraction
+
+        advance = self._phase + pitch_ratio * frames
+        consumed = int(advance)
+        self._stretched = self._stretched[consumed:]
+        self._phase = advance - consumed
+        self.position += frames * speed
+        return block.astype(np.float32, copy=False)
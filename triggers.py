@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+from level_meter import LevelMeter
+
+# Keys clips can be assigned to; F-keys don't clash with typing in the search box
+TRIGGER_KEYS = [f"F{i}" for i in range(1, 13)]
+
+class TriggerClip:
+    """A clip held decoded in memory, ready to start on the next block"""
+
+    def __init__(self, key, file_name, samples, gain):
+        self.key = key
+        self.file_name = file_name
+        self.samples = samples
+        self.gain = gain
+        # Seconds from key event to the clip's first sample reaching the DAC
+        self.latencies = deque(maxlen=50)
+
+class TriggerBank:
+    """
+    Clips assigned to trigger keys, preloaded and played through a stream that stays open.
+
+    A key press only queues a voice; the stream callback mixes it in from its
+    next block, so nothing is decoded, loaded or opened between the key and
+    the sound. While mic passthrough runs, voices are mixed into the
+    passthrough stream instead so they reach the same output.
+    """
+
+    def __init__(self, audio_controller):
+        self.audio_controller = audio_controller
+        self.clips = {}  # key -> TriggerClip
+        self.sample_rate = None
+        self.stream = None
+        self._pending = deque()  # (clip, press_time) handed to the audio thread
+        self._voices = []        # [clip, position, press_time], owned by the audio thread
+        self._arm_lock = threading.Lock()
+        self.meter = LevelMeter()  # Levels of the trigger stream, while it plays on its own
+
+    def arm(self, assignments, cached_files):
+        """Decode the assigned clips in the background, then (re)open the trigger stream"""
+        assignments = dict(assignments)
+        cached_files = dict(cached_files)
+        thread = threading.Thread(target=self._arm, args=(assignments, cached_files), name="trigger-arm")
+        thread.daemon = True
+        thread.start()
+
+    def _arm(self, assignments, cached_files):
+        with self._arm_lock:
+            controller = self.audio_controller
+            # Same rate as the passthrough stream so clips can be mixed into either
+            sample_rate = controller.duplex_rate()
+            settings_key = (controller.voice_mode, controller.voice_quality, True)
+
+            clips = {}
+            for key, file_name in assignments.items():
+                file_path = cached_files.get(file_name)
+                if file_path is None:
+                    continue
+                try:
+                    track = controller.decode_track(file_path, settings_key)
+                    if track.stream is not None:
+                        track.stream.finished.wait()
+                    samples = np.ascontiguousarray(track.samples[:track.playable_frames()])
+                    clips[key] = TriggerClip(key, file_name, samples, track.gain)
+                except Exception as e:
+                    print(f"[ERROR] Could not preload trigger {key} ({file_name}): {e}")
+
+            self.clips = clips
+            self.sample_rate = sample_rate
+            print(f"[DEBUG] Armed {len(clips)} trigger clip(s) at {sample_rate} Hz")
+            if clips:
+                self.open_stream()
+            else:
+                self.close()
+
+    def open_stream(self):
+        """Open (or reopen on the current output device) the stream triggers play through"""
+        import sounddevice as sd
+        self.close()
+        if not self.clips or self.sample_rate is None:
+            return
+        try:
+            device_id = self.audio_controller.device_manager.get_current_device()
+            stream = sd.OutputStream(
+                samplerate=self.sample_rate,
+                blocksize=self.audio_controller._block_size(),
+                device=device_id,
+                channels=1,
+                dtype=np.float32,
+                latency="low",
+                callback=self._callback
+            )
+            stream.start()
+            self.stream = stream
+            print(f"[DEBUG] Trigger stream open on device {device_id}")
+        except Exception as e:
+            print(f"[ERROR] Could not open trigger stream: {e}")
+
+    def close(self):
+        stream = self.stream
+        self.stream = None
+        if stream is not None:
+            try:
+                stream.stop()
+                stream.close()
+            except Exception as e:
+                print(f"[ERROR] Error closing trigger stream: {e}")
+
+    def trigger(self, key, press_time=None):
+        """Start the clip assigned to key on the next block; returns whether one is assigned"""
+        clip = self.clips.get(key)
+        if clip is None:
+            return False
+        self._pending.append((clip, press_time if press_time is not None else time.perf_counter()))
+        return True
+
+    def last_latency(self, key):
+        """Most recent key-to-first-sample latency for a trigger in seconds, or None"""
+        clip = self.clips.get(key)
+        if clip is None or not clip.latencies:
+            return None
+        return clip.latencies[-1]
+
+    def latency_report(self):
+        """Median and worst latency per trigger key, in milliseconds"""
+        report = {}
+        for key, clip in self.clips.items():
+            if clip.latencies:
+                values = np.array(clip.latencies) * 1000
+                report[key] = (float(np.median(values)), float(values.max()))
+        return report
+
+    def mix_into(self, out, frames, output_delay, stream_latency):
+        """
+        Add the playing trigger voices to out; called from an audio callback.
+
+        output_delay is how long until this block reaches the DAC, which
+        completes the latency measurement for voices starting in it. Some host
+        APIs don't report DAC times, so stream_latency (the output latency of
+        the calling stream) is used when output_delay isn't positive.
+        """
+        if output_delay <= 0:
+            output_delay = stream_latency
+        while self._pending:
+            clip, press_time = self._pending.popleft()
+            self._voices.append([clip, 0, press_time])
+        if not self._voices:
+            return
+
+        controller = self.audio_controller
+        volume = 0.0 if controller.muted else controller.volume
+        now = time.perf_counter()
+        finished = []
+        for voice in self._voices:
+            clip, position, press_time = voice
+            if position == 0:
+                clip.latencies.append(now - press_time + output_delay)
+            end = min(position + frames, len(clip.samples))
+            out[:end - position] += clip.samples[position:end] * (volume * clip.gain)
+            voice[1] = end
+            if end >= len(clip.samples):
+                finished.append(voice)
+        for voice in finished:
+            self._voices.remove(voice)
+        np.clip(out, -1.0, 1.0, out=out)
+
+    def _callback(self, outdata, frames, time_info, status):
+        out = outdata[:, 0]
+        out.fill(0)
+        if self.audio_controller.duplex_stream is not None:
+            # The passthrough callback mixes triggers into its own output
+            return
+        stream = self.stream
+        self.mix_into(
+            out, frames,
+            time_info.outputBufferDacTime - time_info.currentTime,
+            stream.latency if stream is not None else 0.0
+        )
+        self.meter.publish(out, self.sample_rate)
@@ -0,0 +1,427 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+import time
+from collections import deque
+from cache_manager import AUDIO_EXTENSIONS
+from cache_metadata import metadata_path, load_metadata, delete_metadata
+from clip_regions import carry_over
+from ffmpeg_utils import process_audio_in_thread, ffmpeg_registry
+from audio_analysis import prepare_cached_file
+from audio_fingerprint import identify_file, find_duplicate
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+# struct inotify_event: wd, mask, cookie, len, then len bytes of name
+EVENT_HEADER = struct.Struct("iIII")
+
+def is_audio_file(path):
+    return os.path.splitext(path)[1].lower() in AUDIO_EXTENSIONS
+
+def scan_folder(folder):
+    """{path: (mtime, size)} of the audio files under folder, including subfolders"""
+    files = {}
+    for directory, _, names in os.walk(folder):
+        for name in names:
+            path = os.path.join(directory, name)
+            if not is_audio_file(path):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files[path] = (stat.st_mtime, stat.st_size)
+    return files
+
+def install_cached_file(temp_path, cache_path):
+    """
+    Move a finished conversion and its metadata over the cached file it
+    replaces, keeping the in/out points and regions set on the old one.
+    """
+    old_metadata = load_metadata(cache_path)
+    os.replace(temp_path, cache_path)
+    if os.path.exists(metadata_path(temp_path)):
+        os.replace(metadata_path(temp_path), metadata_path(cache_path))
+    else:
+        delete_metadata(cache_path)
+    carry_over(old_metadata, cache_path)
+
+def _load_inotify():
+    """libc's inotify functions, or None where inotify doesn't exist"""
+    if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+class FolderWatcher:
+    """
+    Reports audio files added, changed or removed under a set of folders.
+
+    On Linux the folders are watched with inotify, which reports a file once
+    it's closed after writing, so half-copied files are never picked up. Elsewhere
+    (or if inotify runs out of watches) the folders are rescanned every
+    POLL_INTERVAL seconds and a file is reported once its size and time have
+    stopped changing between two scans.
+
+    on_scan(files) gets the full {path: (mtime, size)} state once at start,
+    on_changes(changed, removed) every settled batch after that. Both are
+    called from the watcher thread.
+    """
+
+    POLL_INTERVAL = 5.0
+    # Events closer together than this are reported as one batch
+    SETTLE_DELAY = 1.0
+
+    def __init__(self, folders, on_scan, on_changes):
+        self.folders = [os.path.abspath(folder) for folder in folders]
+        self.on_scan = on_scan
+        self.on_changes = on_changes
+        self.mode = None
+        self._stop = threading.Event()
+        self._reported = {}  # path -> (mtime, size) last handed out
+        self._thread = threading.Thread(target=self._run, name="folder-watcher")
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _scan_all(self):
+        files = {}
+        for folder in self.folders:
+            files.update(scan_folder(folder))
+        return files
+
+    def _run(self):
+        libc = _load_inotify()
+        fd = -1
+        watches = {}
+        if libc is not None:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            # Watches go on before the scan, so nothing created in between is missed
+            if fd < 0 or not self._watch_tree(libc, fd, watches, self.folders):
+                if fd >= 0:
+                    os.close(fd)
+                fd = -1
+        self.mode = "inotify" if fd >= 0 else "polling"
+        print(f"[DEBUG] Watching {len(self.folders)} folder(s) by {self.mode}")
+
+        try:
+            self._reported = self._scan_all()
+            self.on_scan(dict(self._reported))
+            if fd >= 0:
+                self._inotify_loop(libc, fd, watches)
+            else:
+                self._poll_loop()
+        except Exception as e:
+            print(f"[ERROR] Folder watcher stopped: {e}")
+        finally:
+            if fd >= 0:
+                os.close(fd)
+
+    def _watch_tree(self, libc, fd, watches, roots):
+        """Add a watch for every directory under roots; False if inotify can't cover them"""
+        for root in roots:
+            for directory, _, _ in os.walk(root):
+                wd = libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK)
+                if wd < 0:
+                    error = ctypes.get_errno()
+                    if error == errno.ENOSPC:
+                        print("[DEBUG] Out of inotify watches, falling back to polling")
+                        return False
+                    # The directory went away while walking
+                    continue
+                watches[wd] = directory
+        return True
+
+    def _inotify_loop(self, libc, fd, watches):
+        changed, removed = set(), set()
+        last_event = None
+        while not self._stop.is_set():
+            timeout = 0.5 if last_event is None else max(0.0, last_event + self.SETTLE_DELAY - time.monotonic())
+            readable, _, _ = select.select([fd], [], [], timeout)
+            if readable:
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    data = b""
+                offset = 0
+                while offset + EVENT_HEADER.size <= len(data):
+                    wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                    name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+                    offset += EVENT_HEADER.size + length
+                    last_event = time.monotonic()
+
+                    if mask & IN_Q_OVERFLOW:
+                        # Events were lost: work out what changed from a fresh scan
+                        changed.update(self._scan_all())
+                        removed.update(self._reported)
+                        continue
+                    directory = watches.get(wd)
+                    if directory is None:
+                        continue
+                    if mask & (IN_IGNORED | IN_DELETE_SELF):
+                        watches.pop(wd, None)
+                        continue
+                    path = os.path.join(directory, os.fsdecode(name))
+                    if mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            # A folder copied or moved in: watch it and take what's already inside
+                            self._watch_tree(libc, fd, watches, [path])
+                            changed.update(scan_folder(path))
+                        elif mask & IN_MOVED_FROM:
+                            prefix = path + os.sep
+                            removed.update(p for p in self._reported if p.startswith(prefix))
+                        continue
+                    if not is_audio_file(path):
+                        continue
+                    if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                        changed.add(path)
+                        removed.discard(path)
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        removed.add(path)
+                        changed.discard(path)
+            elif last_event is not None:
+                # Quiet for SETTLE_DELAY: report the batch
+                self._report(changed, removed)
+                changed, removed = set(), set()
+                last_event = None
+
+    def _report(self, changed, removed):
+        """Stat the changed paths and hand out whatever really differs from the last report"""
+        changed_files = {}
+        for path in changed:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                removed.add(path)
+                continue
+            state = (stat.st_mtime, stat.st_size)
+            if self._reported.get(path) != state:
+                changed_files[path] = state
+        removed_paths = [path for path in removed if path in self._reported and not os.path.exists(path)]
+        self._reported.update(changed_files)
+        for path in removed_paths:
+            del self._reported[path]
+        if changed_files or removed_paths:
+            self.on_changes(changed_files, removed_paths)
+
+    def _poll_loop(self):
+        previous = dict(self._reported)
+        while not self._stop.wait(self.POLL_INTERVAL):
+            current = self._scan_all()
+            # Report a file only once two scans agree, so files still being copied wait
+            changed = {
+                path: state for path, state in current.items()
+                if previous.get(path) == state and self._reported.get(path) != state
+            }
+            removed = [path for path in self._reported if path not in current]
+            previous = current
+            self._reported.update(changed)
+            for path in removed:
+                del self._reported[path]
+            if changed or removed:
+                self.on_changes(changed, removed)
+
+class WatchFolderImporter:
+    """
+    Keeps library entries in step with the watch folders.
+
+    New and changed files are queued and imported at most MAX_ACTIVE at a time
+    on the ffmpeg worker pool, so a folder full of clips neither floods the
+    pool nor blocks imports started by hand. Files identical or similar to an
+    entry from somewhere else are skipped. Entries whose source file is deleted
+    are removed. Files are converted next to the cache under a temporary name,
+    and on_imported(name, temp_path, cache_path, fields) swaps them in with
+    install_cached_file, so an entry that's playing is never overwritten
+    mid-read. on_imported and on_removed(name) run on the UI thread through
+    dispatch, one entry at a time.
+    """
+
+    MAX_ACTIVE = 2
+
+    def __init__(self, config_manager, settings, dispatch, on_imported, on_removed):
+        self.config_manager = config_manager
+        self.library = config_manager.library
+        self.settings = settings
+        self.dispatch = dispatch
+        self.on_imported = on_imported
+        self.on_removed = on_removed
+        self.watcher = None
+        self._lock = threading.Lock()
+        self._queue = deque()  # (path, mtime) waiting to be imported
+        self._queued = set()
+        self._active = 0
+
+    def start(self, folders):
+        """(Re)start watching folders; an empty list stops watching"""
+        self.stop()
+        folders = [folder for folder in folders if os.path.isdir(folder)]
+        if not folders:
+            return
+        watcher = FolderWatcher(
+            folders,
+            # A watcher replaced by a restart may still report once; ignore it
+            on_scan=lambda files: watcher is self.watcher and self._reconcile(watcher.folders, files),
+            on_changes=lambda changed, removed: watcher is self.watcher and self._apply_changes(changed, removed)
+        )
+        self.watcher = watcher
+        watcher.start()
+
+    def stop(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        with self._lock:
+            self._queue.clear()
+            self._queued.clear()
+
+    def _reconcile(self, folders, files):
+        """Import what changed while the app wasn't watching and drop what was deleted"""
+        known = {source: (name, mtime) for name, source, mtime in self.library.sourced_entries()}
+        imports = []
+        for path, (mtime, _) in files.items():
+            entry = known.get(path)
+            if entry is None or entry[1] != mtime:
+                imports.append((path, mtime))
+        removed = []
+        for source, (name, _) in known.items():
+            inside = any(source.startswith(folder + os.sep) for folder in folders)
+            if inside and source not in files:
+                removed.append(name)
+        self._remove_then_import(removed, imports)
+
+    def _apply_changes(self, changed, removed):
+        removed_names = []
+        if removed:
+            known = {source: name for name, source, _ in self.library.sourced_entries()}
+            for path in removed:
+                name = known.get(path)
+                if name is not None:
+                    print(f"[DEBUG] Watched file deleted: {path}")
+                    removed_names.append(name)
+        self._remove_then_import(removed_names, [(path, mtime) for path, (mtime, _) in changed.items()])
+
+    def _remove_then_import(self, names, imports):
+        """
+        Drop the entries in names on the UI thread, then queue imports.
+
+        A file moved within the watched tree shows up as a removal and an
+        addition in the same batch; the old entry has to be gone before the
+        import checks for name clashes and duplicates.
+        """
+        if not names:
+            for path, mtime in imports:
+                self._enqueue(path, mtime)
+            return
+
+        def apply():
+            for name in names:
+                self.on_removed(name)
+            for path, mtime in imports:
+                self._enqueue(path, mtime)
+        self.dispatch(apply)
+
+    def _enqueue(self, path, mtime):
+        with self._lock:
+            if path in self._queued:
+                return
+            self._queued.add(path)
+            self._queue.append((path, mtime))
+        self._pump()
+
+    def _pump(self):
+        """Start queued imports while fewer than MAX_ACTIVE are running"""
+        while True:
+            with self._lock:
+                if self._active >= self.MAX_ACTIVE or not self._queue:
+                    return
+                path, mtime = self._queue.popleft()
+                self._active += 1
+            try:
+                ffmpeg_registry.submit(self._import, path, mtime)
+            except RuntimeError:
+                # Shutting down
+                self._finished(path)
+                return
+
+    def _finished(self, path):
+        with self._lock:
+            self._active -= 1
+            self._queued.discard(path)
+        self._pump()
+
+    def _import(self, path, mtime):
+        name = os.path.basename(path)
+        try:
+            source = self.library.source_of(name)
+            if source is not None and source != path:
+                print(f"[DEBUG] Not importing {path}: '{name}' is already in the library from elsewhere")
+                self._finished(path)
+                return
+
+            identity = identify_file(path)
+            duplicate, kind = find_duplicate(self.library, identity, exclude=name)
+            if duplicate is not None:
+                print(f"[DEBUG] Not importing {path}: {kind} to '{duplicate}'")
+                self._finished(path)
+                return
+        except Exception as e:
+            print(f"[ERROR] Could not import watched file {path}: {e}")
+            self._finished(path)
+            return
+
+        cache_path = str(self.config_manager.cache_dir / name)
+        temp_path = cache_path + ".part"
+        fields = {
+            "hash": identity.file_hash,
+            "duration": identity.duration,
+            "fingerprint": identity.fingerprint_bytes(),
+            "source": path,
+            "source_mtime": mtime
+        }
+
+        def on_conversion_complete(success, error_msg):
+            if success:
+                print(f"[DEBUG] Converted watched file {path}")
+                self.dispatch(lambda: self.on_imported(name, temp_path, cache_path, fields))
+            else:
+                print(f"[ERROR] Could not convert watched file {path}: {error_msg}")
+                for leftover in (temp_path, metadata_path(temp_path)):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+            self._finished(path)
+
+        # update_metadata merges, so nothing from an earlier failed attempt may linger
+        delete_metadata(temp_path)
+        process_audio_in_thread(
+            input_path=path,
+            output_path=temp_path,
+            format=self.settings.get("cache_codec", "wav"),
+            callback=on_conversion_complete,
+            compression_level=self.settings.get("flac_compression_level", 5),
+            post_process=prepare_cached_file
+        )
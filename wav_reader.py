@@ -0,0 +1,153 @@
+import os
+import struct
+import numpy as np
+
+# Format tags from the WAVEFORMATEX header
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+class WavFormatError(ValueError):
+    """Raised when a file is not a WAV layout this reader understands"""
+
+class WavInfo:
+    """Header information for a RIFF/WAVE file"""
+    
+    def __init__(self, format_tag, channels, sample_rate, bits_per_sample, block_align, data_offset, data_size):
+        self.format_tag = format_tag  # Resolved through WAVE_FORMAT_EXTENSIBLE's sub-format
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.bits_per_sample = bits_per_sample
+        self.block_align = block_align
+        self.data_offset = data_offset
+        self.data_size = data_size
+    
+    @property
+    def frames(self):
+        return self.data_size // self.block_align if self.block_align else 0
+    
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate if self.sample_rate else 0
+
+def is_wav_file(file_path):
+    """Cheap check on the RIFF/WAVE magic without parsing the rest of the header"""
+    try:
+        with open(file_path, 'rb') as f:
+            header = f.read(12)
+        return len(header) == 12 and header[:4] == b'RIFF' and header[8:12] == b'WAVE'
+    except OSError:
+        return False
+
+def read_wav_info(file_path):
+    """
+    Parse the RIFF chunk list of a WAV file.
+    
+    Supports plain PCM, IEEE float and WAVE_FORMAT_EXTENSIBLE headers, skips
+    unknown chunks (LIST, fact, ...) and tolerates a data chunk whose size was
+    never patched by the writer.
+    
+    Returns:
+        WavInfo instance
+    """
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            raise WavFormatError(f"Not a RIFF/WAVE file: {file_path}")
+        
+        fmt = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise WavFormatError(f"No data chunk in {file_path}")
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+            
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                if len(fmt) < 16:
+                    raise WavFormatError(f"Truncated fmt chunk in {file_path}")
+                if chunk_size % 2:
+                    f.seek(1, os.SEEK_CUR)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise WavFormatError(f"data chunk before fmt chunk in {file_path}")
+                data_offset = f.tell()
+                # Writers that stream (or crashed) leave 0 or 0xFFFFFFFF here
+                available = file_size - data_offset
+                data_size = chunk_size if 0 < chunk_size <= available else available
+                break
+            else:
+                # Chunks are word aligned
+                f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+    
+    format_tag, channels, sample_rate, _, block_align, bits_per_sample = struct.unpack('<HHIIHH', fmt[:16])
+    if format_tag == WAVE_FORMAT_EXTENSIBLE:
+        if len(fmt) < 40:
+            raise WavFormatError(f"Truncated WAVE_FORMAT_EXTENSIBLE header in {file_path}")
+        # The sub-format GUID starts with the real format tag
+        format_tag = struct.unpack('<H', fmt[24:26])[0]
+    
+    if channels < 1 or sample_rate < 1 or block_align != channels * ((bits_per_sample + 7) // 8):
+        raise WavFormatError(f"Inconsistent fmt chunk in {file_path}")
+    
+    return WavInfo(format_tag, channels, sample_rate, bits_per_sample, block_align, data_offset, data_size)
+
+def read_wav(file_path, info=None, mono=True):
+    """
+    Read WAV samples straight into a float32 NumPy array in [-1, 1).
+    
+    Integer PCM is scaled by 2**(bits - 1) (8-bit is unsigned and offset by 128),
+    float data is used as is. There is no subprocess and only the unavoidable
+    int-to-float conversion copy.
+    
+    Args:
+        file_path: Path to the WAV file
+        info: WavInfo from read_wav_info, to avoid parsing the header twice
+        mono: Average all channels down to one
+    
+    Returns:
+        float32 array, 1-D when mono (or single channel), else (frames, channels)
+    """
+    if info is None:
+        info = read_wav_info(file_path)
+    
+    count = info.frames * info.channels
+    bits = info.bits_per_sample
+    
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        raw = np.fromfile(file_path, dtype='<f4' if bits == 32 else '<f8', count=count, offset=info.data_offset)
+        samples = raw if raw.dtype == np.float32 else raw.astype(np.float32)
+    elif info.format_tag == WAVE_FORMAT_PCM and bits == 8:
+        raw = np.fromfile(file_path, dtype=np.uint8, count=count, offset=info.data_offset)
+        samples = raw.astype(np.float32)
+        samples -= 128.0
+        samples *= 1.0 / 128
+    elif info.format_tag == WAVE_FORMAT_PCM and bits == 16:
+        raw = np.fromfile(file_path, dtype='<i2', count=count, offset=info.data_offset)
+        samples = raw.astype(np.float32)
+        samples *= 1.0 / 32768
+    elif info.format_tag == WAVE_FORMAT_PCM and bits == 24:
+        raw = np.fromfile(file_path, dtype=np.uint8, count=count * 3, offset=info.data_offset)
+        # Place each 3-byte sample in the top of an int32 so the sign comes for free
+        widened = np.zeros((count, 4), dtype=np.uint8)
+        widened[:, 1:] = raw[:count * 3].reshape(-1, 3)
+        samples = widened.view('<i4').reshape(-1).astype(np.float32)
+        samples *= 1.0 / 2147483648
+    elif info.format_tag == WAVE_FORMAT_PCM and bits == 32:
+        raw = np.fromfile(file_path, dtype='<i4', count=count, offset=info.data_offset)
+        samples = raw.astype(np.float32)
+        samples *= 1.0 / 2147483648
+    else:
+        raise WavFormatError(f"Unsupported WAV encoding (format {info.format_tag:#06x}, {bits} bit) in {file_path}")
+    
+    # A truncated file can end mid-frame
+    frames = len(samples) // info.channels
+    samples = samples[:frames * info.channels]
+    
+    if info.channels == 1:
+        return samples
+    samples = samples.reshape(frames, info.channels)
+    if mono:
+        return samples.mean(axis=1, dtype=np.float32)
+    return samples